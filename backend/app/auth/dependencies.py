@@ -2,7 +2,7 @@ from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
-from app.database import get_db
+from app.database import get_db, current_shard
 from app.models import User
 from app.auth.utils import verify_token
 from app.schemas.user import TokenData
@@ -51,6 +51,8 @@ async def get_current_user(
         raise credentials_exception
 
     print(f"DEBUG: User found: {user.username}")
+    # The rest of the request reads and writes this user's shard
+    current_shard.set(user.shard)
     return user
 
 
@@ -4,8 +4,6 @@ from jose import JWTError, jwt
 from passlib.context import CryptContext
 from app.config import get_settings
 
-settings = get_settings()
-
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 
@@ -18,6 +16,7 @@ def get_password_hash(password: str) -> str:
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
+    settings = get_settings()
     to_encode = data.copy()
     if expires_delta:
         expire = datetime.utcnow() + expires_delta
@@ -30,6 +29,7 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
 
 
 def verify_token(token: str) -> Optional[dict]:
+    settings = get_settings()
     try:
         print(f"DEBUG verify_token: Attempting to decode token")
         print(f"DEBUG verify_token: SECRET_KEY = {settings.SECRET_KEY[:10]}...")
@@ -7,6 +7,62 @@ class Settings(BaseSettings):
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
     DATABASE_URL: str
+    # Apply pending migrations on startup; disable to run ``python -m app.migrate`` on deploy instead
+    DB_AUTO_MIGRATE: bool = True
+
+    # Sharded storage: "off", "fixed" (users spread over SHARD_COUNT databases)
+    # or "per_user" (a database per user). DATABASE_URL is then the directory
+    # database holding users, jobs and charge rates; {shard} in the template
+    # is replaced by the shard number (the user id with per_user)
+    SHARDING: str = "off"
+    SHARD_COUNT: int = 4
+    SHARD_URL_TEMPLATE: str = "sqlite+aiosqlite:///./data/shards/shard_{shard}.db"
+
+    ENVIRONMENT: str = "development"
+    # Per-request query count and DB time: "log" writes one line per request,
+    # "header" returns them as X-DB-Query-Count/Server-Timing (never in production)
+    QUERY_SUMMARY: str = "log"
+    SQL_ECHO: bool = False
+    SLOW_QUERY_THRESHOLD_MS: float = 200.0
+
+    # Local price store for mark-to-market (CSV files dropped into <dir>/incoming)
+    PRICE_DATA_DIR: str = "data/prices"
+    PRICE_REFRESH_SECONDS: int = 60
+
+    # Background jobs: worker tasks per process, how long finished jobs are
+    # kept, where job output files are written, and how long a running job
+    # may go without a heartbeat before another process runs it again
+    JOB_WORKERS: int = 2
+    JOB_RESULT_RETENTION_HOURS: int = 24
+    JOB_RESULTS_DIR: str = "data/jobs"
+    JOB_LEASE_SECONDS: int = 60
+
+    # Processes for Monte Carlo simulations (0 = one per CPU core)
+    SIMULATION_WORKERS: int = 0
+
+    # WebSocket updates: open connections per process and per user, and
+    # messages queued per connection before a slow client is told to resync
+    WS_MAX_CONNECTIONS: int = 1000
+    WS_MAX_CONNECTIONS_PER_USER: int = 5
+    WS_QUEUE_SIZE: int = 100
+    WS_SEND_TIMEOUT_SECONDS: float = 10.0
+
+    # On-demand request profiles (X-Profile: 1 from an admin): where reports
+    # are written, how many are kept, and the sampling interval
+    PROFILE_DIR: str = "data/profiles"
+    PROFILE_MAX_REPORTS: int = 100
+    PROFILE_INTERVAL_MS: float = 1.0
+
+    # Portfolio analytics results: how long one is served without a
+    # recompute (unrealized P&L may lag prices by this much) and how many
+    # are kept per process
+    ANALYTICS_CACHE_TTL_SECONDS: float = 30.0
+    ANALYTICS_CACHE_MAX_ENTRIES: int = 1000
+
+    # Idempotency-Key on POST requests: how long a key's stored response is
+    # replayed, and the largest response body that is stored
+    IDEMPOTENCY_KEY_TTL_HOURS: int = 24
+    IDEMPOTENCY_MAX_RESPONSE_BYTES: int = 1_048_576
 
     class Config:
         env_file = ".env"
@@ -0,0 +1,323 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, and_, func, case, asc, desc
+from sqlalchemy.sql.elements import ColumnElement
+from typing import Dict, Any, List, Optional, Tuple, Callable, Awaitable, Hashable
+import numpy as np
+from app.database import current_shard, get_sessionmaker
+from app.models import Trade, Portfolio
+from app.crud import trade_event as trade_event_crud
+from app.models.trade import TradeStatus, TradeType
+from app.services.market_time import ist_dates
+from app.services.pnl import unrealized_profit_loss
+from app.services.price_store import get_price_store
+from app.services.result_cache import get_analytics_cache
+
+
+async def get_unrealized_summary(db: AsyncSession, portfolio_id: int) -> Dict[str, Any]:
+    """Mark all open trades to the latest stored prices in one vectorized pass"""
+    result = await db.execute(
+        select(
+            Trade.symbol,
+            Trade.trade_type,
+            Trade.entry_price,
+            Trade.quantity,
+            Trade.open_quantity,
+            Trade.open_avg_price,
+        ).where(
+            and_(
+                Trade.portfolio_id == portfolio_id,
+                Trade.status == TradeStatus.OPEN
+            )
+        )
+    )
+    open_trades = result.all()
+    if not open_trades:
+        return {"open_trades": 0, "priced_open_trades": 0, "unrealized_profit_loss": 0.0}
+
+    prices = get_price_store().latest_prices(t.symbol for t in open_trades)
+    pl, _ = unrealized_profit_loss(open_trades, prices)
+    return {
+        "open_trades": len(open_trades),
+        "priced_open_trades": int(np.count_nonzero(~np.isnan(pl))),
+        "unrealized_profit_loss": round(float(np.nansum(pl)), 2),
+    }
+
+
+async def get_closed_trade_returns(db: AsyncSession, portfolio_id: int) -> np.ndarray:
+    """P&L percentages of closed trades in exit order"""
+    result = await db.execute(
+        select(Trade.profit_loss_percentage).where(
+            and_(
+                Trade.portfolio_id == portfolio_id,
+                Trade.status == TradeStatus.CLOSED,
+                Trade.profit_loss_percentage.is_not(None)
+            )
+        ).order_by(Trade.exit_date, Trade.id)
+    )
+    return np.fromiter(result.scalars(), dtype=np.float64)
+
+
+async def get_closed_trade_arrays(
+    db: AsyncSession,
+    portfolio_id: int
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Entry price, exit price, is-long flag and realized P&L of closed trades in entry order"""
+    result = await db.execute(
+        select(Trade.entry_price, Trade.exit_price, Trade.trade_type, Trade.profit_loss).where(
+            and_(
+                Trade.portfolio_id == portfolio_id,
+                Trade.status == TradeStatus.CLOSED,
+                Trade.exit_price.is_not(None)
+            )
+        ).order_by(Trade.entry_date, Trade.id)
+    )
+    rows = result.all()
+    if not rows:
+        empty = np.empty(0)
+        return empty, empty, np.empty(0, dtype=bool), empty
+    entry_price, exit_price, trade_type, profit_loss = zip(*rows)
+    return (
+        np.array(entry_price, dtype=np.float64),
+        np.array(exit_price, dtype=np.float64),
+        np.array([t == TradeType.LONG for t in trade_type], dtype=bool),
+        np.array([pl or 0.0 for pl in profit_loss], dtype=np.float64),
+    )
+
+
+async def get_closed_trade_pl_columns(
+    db: AsyncSession,
+    portfolio_id: int
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Symbol, IST exit day and net P&L (gross when charges are unknown) of every closed trade"""
+    net_pl = func.coalesce(Trade.net_profit_loss, Trade.profit_loss, 0)
+    result = await db.execute(
+        select(Trade.symbol, Trade.exit_date, net_pl.label("net_profit_loss")).where(
+            and_(
+                Trade.portfolio_id == portfolio_id,
+                Trade.status == TradeStatus.CLOSED,
+                Trade.exit_date.is_not(None)
+            )
+        )
+    )
+    rows = result.all()
+    if not rows:
+        return np.empty(0, dtype=object), np.empty(0, dtype="datetime64[D]"), np.empty(0)
+    symbols, exit_dates, pl = zip(*rows)
+    return np.array(symbols, dtype=object), ist_dates(exit_dates), np.array(pl, dtype=np.float64)
+
+
+async def _extreme_trade(db: AsyncSession, portfolio_id: int, order) -> Dict[str, Any]:
+    pl = func.coalesce(Trade.profit_loss, 0)
+    row = (await db.execute(
+        select(Trade.id, Trade.symbol, pl.label("profit_loss"))
+        .where(and_(Trade.portfolio_id == portfolio_id, Trade.status == TradeStatus.CLOSED))
+        .order_by(order(pl), Trade.id)
+        .limit(1)
+    )).one()
+    return {"id": row.id, "symbol": row.symbol, "profit_loss": round(row.profit_loss, 2)}
+
+
+async def get_portfolio_analytics(db: AsyncSession, portfolio: Portfolio) -> Dict[str, Any]:
+    """Summary statistics over a portfolio's closed trades plus unrealized P&L"""
+    # Sums over the fixed-point money columns are exact integers in the database
+    pl = func.coalesce(Trade.profit_loss, 0)
+    net_pl = func.coalesce(Trade.net_profit_loss, Trade.profit_loss, 0)
+    won = pl > 0
+    totals = (await db.execute(
+        select(
+            func.count().label("total_trades"),
+            func.coalesce(func.sum(pl), 0).label("total_pl"),
+            func.count(case((won, 1))).label("total_wins"),
+            func.coalesce(func.sum(case((won, pl))), 0).label("total_win_amount"),
+            func.coalesce(func.sum(case((~won, pl))), 0).label("total_loss_amount"),
+            func.coalesce(func.sum(Trade.charges), 0).label("total_charges"),
+            func.coalesce(func.sum(net_pl), 0).label("total_net_pl"),
+            func.count(case((net_pl > 0, 1))).label("net_wins"),
+        ).where(
+            and_(
+                Trade.portfolio_id == portfolio.id,
+                Trade.status == TradeStatus.CLOSED
+            )
+        )
+    )).one()
+    unrealized = await get_unrealized_summary(db, portfolio.id)
+
+    total_trades = totals.total_trades
+    if total_trades == 0:
+        return {
+            "portfolio_id": portfolio.id,
+            "portfolio_name": portfolio.name,
+            "total_trades": 0,
+            "total_profit_loss": 0.0,
+            "win_rate": 0.0,
+            "average_profit_loss": 0.0,
+            "best_trade": None,
+            "worst_trade": None,
+            "total_wins": 0,
+            "total_losses": 0,
+            "average_win": 0.0,
+            "average_loss": 0.0,
+            "profit_factor": 0.0,
+            "total_charges": 0.0,
+            "total_net_profit_loss": 0.0,
+            "net_win_rate": 0.0,
+            **unrealized,
+        }
+
+    total_wins = totals.total_wins
+    total_losses = total_trades - total_wins
+    win_rate = (total_wins / total_trades) * 100
+
+    avg_pl = totals.total_pl / total_trades
+    avg_win = totals.total_win_amount / total_wins if total_wins > 0 else 0
+    avg_loss = totals.total_loss_amount / total_losses if total_losses > 0 else 0
+
+    # Profit factor: total wins / abs(total losses)
+    total_loss_amount = abs(totals.total_loss_amount)
+    profit_factor = totals.total_win_amount / total_loss_amount if total_loss_amount > 0 else 0
+
+    # Gross vs net of charges (trades without computed charges count at gross)
+    net_win_rate = totals.net_wins / total_trades * 100
+
+    return {
+        "portfolio_id": portfolio.id,
+        "portfolio_name": portfolio.name,
+        "total_trades": total_trades,
+        "total_profit_loss": round(totals.total_pl, 2),
+        "win_rate": round(win_rate, 2),
+        "average_profit_loss": round(avg_pl, 2),
+        "best_trade": await _extreme_trade(db, portfolio.id, desc),
+        "worst_trade": await _extreme_trade(db, portfolio.id, asc),
+        "total_wins": total_wins,
+        "total_losses": total_losses,
+        "average_win": round(avg_win, 2),
+        "average_loss": round(avg_loss, 2),
+        "profit_factor": round(profit_factor, 2),
+        "total_charges": round(totals.total_charges, 2),
+        "total_net_profit_loss": round(totals.total_net_pl, 2),
+        "net_win_rate": round(net_win_rate, 2),
+        **unrealized,
+    }
+
+
+# Sort keys of per-symbol analytics; ties are broken by symbol
+SYMBOL_SORT_KEYS = ("profit_loss", "net_profit_loss", "win_rate", "trades", "average_profit_loss")
+
+
+def _prefix_match(column, prefix: str) -> ColumnElement:
+    """Range comparison equivalent to ``column LIKE 'prefix%'`` that can use the column's index"""
+    return and_(column >= prefix, column < prefix + "\U0010ffff")
+
+
+def _symbol_totals(portfolio_id: int, prefix: Optional[str]):
+    """Closed-trade aggregates per symbol, as a subquery"""
+    pl = func.coalesce(Trade.profit_loss, 0)
+    net_pl = func.coalesce(Trade.net_profit_loss, Trade.profit_loss, 0)
+    won = pl > 0
+    conditions = [Trade.portfolio_id == portfolio_id, Trade.status == TradeStatus.CLOSED]
+    if prefix:
+        conditions.append(_prefix_match(Trade.symbol, prefix))
+    return select(
+        Trade.symbol,
+        func.count().label("total_trades"),
+        func.count(case((won, 1))).label("wins"),
+        func.coalesce(func.sum(pl), 0).label("total_pl"),
+        func.coalesce(func.sum(case((won, pl))), 0).label("win_amount"),
+        func.coalesce(func.sum(case((~won, pl))), 0).label("loss_amount"),
+        func.coalesce(func.sum(Trade.charges), 0).label("total_charges"),
+        func.coalesce(func.sum(net_pl), 0).label("net_pl"),
+        func.max(Trade.exit_date).label("last_traded"),
+    ).where(and_(*conditions)).group_by(Trade.symbol).subquery()
+
+
+def _symbol_stats(row) -> Dict[str, Any]:
+    total, wins = row.total_trades, row.wins
+    losses = total - wins
+    loss_amount = abs(row.loss_amount)
+    return {
+        "symbol": row.symbol,
+        "total_trades": total,
+        "total_profit_loss": round(row.total_pl, 2),
+        "total_charges": round(row.total_charges, 2),
+        "net_profit_loss": round(row.net_pl, 2),
+        "wins": wins,
+        "losses": losses,
+        "win_rate": round(wins / total * 100, 2),
+        "average_profit_loss": round(row.total_pl / total, 2),
+        "average_win": round(row.win_amount / wins, 2) if wins else 0.0,
+        "average_loss": round(row.loss_amount / losses, 2) if losses else 0.0,
+        "profit_factor": round(row.win_amount / loss_amount, 2) if loss_amount > 0 else 0.0,
+        "last_traded": row.last_traded,
+    }
+
+
+async def get_analytics_by_symbol(
+    db: AsyncSession,
+    portfolio_id: int,
+    sort_by: str = "profit_loss",
+    descending: bool = True,
+    skip: int = 0,
+    limit: Optional[int] = None,
+    prefix: Optional[str] = None,
+    top: Optional[int] = None,
+    bottom: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Closed-trade statistics grouped by symbol, aggregated in the database.
+
+    ``symbols`` is one page of all symbols (optionally only those starting
+    with ``prefix``) ordered by ``sort_by``; ``top`` and ``bottom`` add the
+    highest and lowest symbols by the same key regardless of the page.
+    """
+    totals = _symbol_totals(portfolio_id, prefix)
+    sort_keys = {
+        # Money sums are exact integers, so ordering by them is exact too
+        "profit_loss": totals.c.total_pl,
+        "net_profit_loss": totals.c.net_pl,
+        "win_rate": totals.c.wins / totals.c.total_trades,
+        "trades": totals.c.total_trades,
+        "average_profit_loss": totals.c.total_pl / totals.c.total_trades,
+    }
+    key = sort_keys[sort_by]
+
+    async def ranked(high_first: bool, offset: int, count: Optional[int]) -> List[Dict[str, Any]]:
+        query = select(totals).order_by(desc(key) if high_first else asc(key), totals.c.symbol)
+        if count is not None:
+            query = query.limit(count)
+        if offset:
+            query = query.offset(offset)
+        return [_symbol_stats(row) for row in await db.execute(query)]
+
+    result = {
+        "total_symbols": (await db.execute(select(func.count()).select_from(totals))).scalar_one(),
+        "symbols": await ranked(descending, skip, limit) if limit != 0 else [],
+    }
+    if top:
+        result["top"] = await ranked(True, 0, top)
+    if bottom:
+        result["bottom"] = await ranked(False, 0, bottom)
+    return result
+
+
+async def cached(
+    db: AsyncSession,
+    endpoint: str,
+    portfolio: Portfolio,
+    compute: Callable[[AsyncSession], Awaitable[Dict[str, Any]]],
+    params: Hashable = ()
+) -> Dict[str, Any]:
+    """
+    ``compute`` for a portfolio through the analytics cache.
+
+    Keyed by the portfolio's latest trade event and last edit, so any write
+    to it makes the next request recompute. Identical concurrent requests
+    share one run, in its own session.
+    """
+    version = await trade_event_crud.last_event_id(db, portfolio.id)
+    key = (current_shard.get(), portfolio.id, params, version, portfolio.updated_at)
+
+    async def run() -> Dict[str, Any]:
+        async with get_sessionmaker()() as session:
+            return await compute(session)
+
+    return await get_analytics_cache().get_or_compute(endpoint, key, run)
@@ -0,0 +1,166 @@
+import time
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, update, and_
+from dataclasses import asdict
+from typing import Optional, Dict, Sequence, Tuple
+import numpy as np
+from app.models import Trade, ChargeRate
+from app.models.trade import TradeSegment, TradeType
+from app.models.types import round_money
+from app.schemas.charges import ChargeRatesUpdate
+from app.crud import snapshot as snapshot_crud
+from app.crud import trade_event as trade_event_crud
+from app.services import events
+from app.services.charges import (
+    DEFAULT_RATES, RATE_FIELDS, RateTable, compute_charges, order_values, rate_matrix, segment_codes
+)
+
+# Rate tables rarely change; other processes pick up edits within this window
+RATE_CACHE_SECONDS = 60
+
+_rate_cache: Optional[Tuple[float, Dict[TradeSegment, RateTable]]] = None
+
+
+def invalidate_rate_cache() -> None:
+    global _rate_cache
+    _rate_cache = None
+
+
+async def get_rate_tables(db: AsyncSession) -> Dict[TradeSegment, RateTable]:
+    """Stored rate tables, with built-in defaults for segments never edited"""
+    global _rate_cache
+    if _rate_cache is not None and time.monotonic() - _rate_cache[0] < RATE_CACHE_SECONDS:
+        return _rate_cache[1]
+
+    result = await db.execute(select(ChargeRate))
+    tables = dict(DEFAULT_RATES)
+    for row in result.scalars():
+        tables[row.segment] = RateTable(**{name: getattr(row, name) for name in RATE_FIELDS})
+    _rate_cache = (time.monotonic(), tables)
+    return tables
+
+
+async def update_rate_table(
+    db: AsyncSession,
+    segment: TradeSegment,
+    rates_update: ChargeRatesUpdate
+) -> RateTable:
+    tables = await get_rate_tables(db)
+    values = {**asdict(tables[segment]), **rates_update.model_dump(exclude_unset=True, exclude_none=True)}
+
+    result = await db.execute(select(ChargeRate).where(ChargeRate.segment == segment))
+    db_rate = result.scalar_one_or_none()
+    if db_rate is None:
+        db.add(ChargeRate(segment=segment, **values))
+    else:
+        for field, value in values.items():
+            setattr(db_rate, field, value)
+    await db.commit()
+    invalidate_rate_cache()
+    return RateTable(**values)
+
+
+def _exit_quantity(quantity: float, open_quantity: Optional[float]) -> float:
+    return quantity - (open_quantity or 0.0)
+
+
+def trade_charge_breakdown(trade: Trade, tables: Dict[TradeSegment, RateTable]) -> Dict[str, float]:
+    """Charge components of a single trade (exit leg only counts what has been closed)"""
+    buy_value, sell_value = order_values(
+        [trade.entry_price],
+        [trade.quantity],
+        [trade.exit_price if trade.exit_price is not None else np.nan],
+        [_exit_quantity(trade.quantity, trade.open_quantity)],
+        [trade.trade_type == TradeType.LONG]
+    )
+    components = compute_charges(
+        segment_codes([trade.segment]), buy_value, sell_value, rate_matrix(tables)
+    )
+    breakdown = {name: round(float(values[0]), 2) for name, values in components.items()}
+    breakdown["buy_value"] = round(float(buy_value[0]), 2)
+    breakdown["sell_value"] = round(float(sell_value[0]), 2)
+    return breakdown
+
+
+def total_charges(trades: Sequence, tables: Dict[TradeSegment, RateTable]) -> np.ndarray:
+    """
+    Total charges per trade, rounded to paise.
+
+    ``trades`` may be ORM trades, result rows or anything else with
+    ``segment``, ``trade_type``, ``entry_price``, ``quantity``,
+    ``exit_price`` and ``open_quantity`` attributes.
+    """
+    quantity = np.array([t.quantity for t in trades], dtype=np.float64)
+    exit_quantity = quantity - np.array([t.open_quantity or 0.0 for t in trades], dtype=np.float64)
+    buy_value, sell_value = order_values(
+        np.array([t.entry_price for t in trades], dtype=np.float64),
+        quantity,
+        np.array([np.nan if t.exit_price is None else t.exit_price for t in trades], dtype=np.float64),
+        exit_quantity,
+        np.array([t.trade_type == TradeType.LONG for t in trades], dtype=bool)
+    )
+    components = compute_charges(
+        segment_codes([t.segment for t in trades]), buy_value, sell_value, rate_matrix(tables)
+    )
+    return np.round(components["total"], 2)
+
+
+async def apply_trade_charges(db: AsyncSession, trade: Trade) -> None:
+    """Set charges and net P&L on a trade; trades with no realized P&L have neither"""
+    if trade.profit_loss is None:
+        trade.charges = None
+        trade.net_profit_loss = None
+        return
+    tables = await get_rate_tables(db)
+    trade.charges = trade_charge_breakdown(trade, tables)["total"]
+    trade.net_profit_loss = round_money(trade.profit_loss - trade.charges)
+
+
+async def recompute_charges(
+    db: AsyncSession,
+    portfolio_id: Optional[int] = None,
+    segment: Optional[TradeSegment] = None
+) -> int:
+    """Recompute charges and net P&L for every realized trade in one vectorized pass"""
+    conditions = [Trade.profit_loss.is_not(None)]
+    if portfolio_id is not None:
+        conditions.append(Trade.portfolio_id == portfolio_id)
+    if segment is not None:
+        conditions.append(Trade.segment == segment)
+
+    # Every tracked column, so changed trades can be logged with their full state
+    result = await db.execute(
+        select(Trade.id, *(getattr(Trade, c) for c in trade_event_crud.TRACKED_FIELDS)).where(and_(*conditions))
+    )
+    rows = result.all()
+    if not rows:
+        await db.commit()
+        return 0
+
+    tables = await get_rate_tables(db)
+    charges = total_charges(rows, tables)
+    net = np.array([row.profit_loss for row in rows], dtype=np.float64) - charges
+
+    values = [
+        {"id": row.id, "charges": c, "net_profit_loss": round_money(n)}
+        for row, c, n in zip(rows, charges.tolist(), net.tolist())
+    ]
+    await db.execute(update(Trade), values)
+    logged = []
+    for row, v in zip(rows, values):
+        before = trade_event_crud.trade_state(row)
+        after = {**before, **trade_event_crud.trade_state_values(v)}
+        logged.append(trade_event_crud.event_values("charges_recomputed", row.id, row.portfolio_id, before, after))
+    # Unchanged trades produce no event
+    await trade_event_crud.record_events(db, logged)
+    # Daily NAV counts net P&L from the day a trade closes
+    exit_dates: Dict[int, list] = {}
+    for row in rows:
+        if row.exit_date is not None:
+            exit_dates.setdefault(row.portfolio_id, []).append(row.exit_date)
+    for pid, dates in exit_dates.items():
+        await snapshot_crud.invalidate_snapshots(db, [pid], snapshot_crud.first_day(*dates))
+    await db.commit()
+    for pid in exit_dates:
+        await events.publish_portfolio_events(db, pid, [events.portfolio_refresh_event(pid)])
+    return len(rows)
@@ -0,0 +1,250 @@
+from itertools import groupby
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, update
+from app.models import Fill, Trade, Portfolio
+from app.models.fill import FillSide
+from app.models.portfolio import CostBasisMethod
+from app.models.trade import TradeType, TradeStatus
+from app.models.types import round_price, round_money
+from app.schemas.fill import FillCreate
+from app.crud import charges as charges_crud
+from app.crud import snapshot as snapshot_crud
+from app.crud import trade_event as trade_event_crud
+from app.services.lot_matching import match_fills, PositionResult
+from app.services import events
+from typing import Optional, List
+
+
+async def get_fill_by_id(db: AsyncSession, fill_id: int) -> Optional[Fill]:
+    result = await db.execute(select(Fill).where(Fill.id == fill_id))
+    return result.scalar_one_or_none()
+
+
+async def get_trade_fills(db: AsyncSession, trade_id: int) -> List[Fill]:
+    result = await db.execute(
+        select(Fill)
+        .where(Fill.trade_id == trade_id)
+        .order_by(Fill.executed_at, Fill.id)
+    )
+    return list(result.scalars().all())
+
+
+async def get_cost_basis_method(db: AsyncSession, portfolio_id: int) -> CostBasisMethod:
+    result = await db.execute(
+        select(Portfolio.cost_basis_method).where(Portfolio.id == portfolio_id)
+    )
+    return result.scalar_one_or_none() or CostBasisMethod.FIFO
+
+
+def opening_side(trade: Trade) -> FillSide:
+    return FillSide.BUY if trade.trade_type == TradeType.LONG else FillSide.SELL
+
+
+def closing_side(trade: Trade) -> FillSide:
+    return FillSide.SELL if trade.trade_type == TradeType.LONG else FillSide.BUY
+
+
+def position_values(trade_id: int, position: PositionResult, entry_date, exit_date) -> dict:
+    """Trade column values derived from a matched position"""
+    values = {
+        "id": trade_id,
+        "entry_price": round_price(position.avg_entry_price),
+        "entry_date": entry_date,
+        "quantity": position.entry_quantity,
+        "exit_price": round_price(position.avg_exit_price),
+        "exit_date": exit_date if position.is_flat else None,
+        "status": TradeStatus.CLOSED if position.is_flat else TradeStatus.OPEN,
+        "open_quantity": position.open_quantity,
+        "open_avg_price": round_price(position.open_avg_price),
+        "profit_loss": None,
+        "profit_loss_percentage": None,
+    }
+    if position.exit_quantity > 0:
+        values["profit_loss"] = round_money(position.realized_pl)
+        values["profit_loss_percentage"] = position.realized_pl_percentage
+    return values
+
+
+def _apply_position(trade: Trade, fills: List[Fill], method: CostBasisMethod) -> PositionResult:
+    position = match_fills(fills, is_long=trade.trade_type == TradeType.LONG, method=method)
+    values = position_values(trade.id, position, fills[0].executed_at, fills[-1].executed_at)
+    values.pop("id")
+    for field, value in values.items():
+        setattr(trade, field, value)
+    return position
+
+
+async def _seed_fills_from_trade(db: AsyncSession, trade: Trade) -> None:
+    """Convert a single entry/exit trade into equivalent fills"""
+    fills = [Fill(
+        trade_id=trade.id,
+        side=opening_side(trade),
+        price=trade.entry_price,
+        quantity=trade.quantity,
+        executed_at=trade.entry_date
+    )]
+    if trade.exit_price is not None:
+        fills.append(Fill(
+            trade_id=trade.id,
+            side=closing_side(trade),
+            price=trade.exit_price,
+            quantity=trade.quantity,
+            executed_at=trade.exit_date or trade.entry_date
+        ))
+    db.add_all(fills)
+    await db.flush()
+
+
+async def add_fill(db: AsyncSession, trade: Trade, fill: FillCreate) -> Trade:
+    """
+    Add a fill to a position and re-match its lots.
+
+    Trades recorded before they had fills are first converted into an
+    opening (and, if closed, a closing) fill so their history is preserved.
+    Raises OverfillError if the fill would close more than is open.
+    """
+    fills = await get_trade_fills(db, trade.id)
+    if not fills:
+        await _seed_fills_from_trade(db, trade)
+    previous_entry_date, previous_status = trade.entry_date, trade.status
+    before = trade_event_crud.trade_state(trade)
+
+    db.add(Fill(**fill.model_dump(), trade_id=trade.id))
+    await db.flush()
+
+    # Let the database order the fills so stored and new timestamps compare consistently
+    fills = await get_trade_fills(db, trade.id)
+    method = await get_cost_basis_method(db, trade.portfolio_id)
+    try:
+        _apply_position(trade, fills, method)
+    except ValueError:
+        await db.rollback()
+        raise
+    await charges_crud.apply_trade_charges(db, trade)
+    await trade_event_crud.record_event(db, "fill_added", trade, before, {"fill": [None, fill.model_dump()]})
+    # Open quantity and cost apply to every day the position has been open
+    await snapshot_crud.invalidate_snapshots(
+        db, [trade.portfolio_id], snapshot_crud.first_day(previous_entry_date, trade.entry_date)
+    )
+
+    await db.commit()
+    await db.refresh(trade)
+    await events.publish_portfolio_events(db, trade.portfolio_id, [events.trade_event(trade, previous_status)])
+    return trade
+
+
+async def delete_fill(db: AsyncSession, trade: Trade, fill_id: int) -> Optional[Trade]:
+    fills = await get_trade_fills(db, trade.id)
+    db_fill = next((f for f in fills if f.id == fill_id), None)
+    if db_fill is None:
+        return None
+
+    remaining = [f for f in fills if f.id != fill_id]
+    previous_entry_date, previous_status = trade.entry_date, trade.status
+    before = trade_event_crud.trade_state(trade)
+    if remaining:
+        method = await get_cost_basis_method(db, trade.portfolio_id)
+        _apply_position(trade, remaining, method)
+    else:
+        # Without fills the trade falls back to its own entry/exit fields
+        trade.status = TradeStatus.OPEN
+        trade.exit_price = None
+        trade.exit_date = None
+        trade.open_quantity = None
+        trade.open_avg_price = None
+        trade.profit_loss = None
+        trade.profit_loss_percentage = None
+    await charges_crud.apply_trade_charges(db, trade)
+    removed = FillCreate.model_validate(db_fill, from_attributes=True).model_dump()
+    await trade_event_crud.record_event(db, "fill_removed", trade, before, {"fill": [{"id": fill_id, **removed}, None]})
+    await snapshot_crud.invalidate_snapshots(
+        db, [trade.portfolio_id], snapshot_crud.first_day(previous_entry_date, trade.entry_date)
+    )
+
+    await db.delete(db_fill)
+    await db.commit()
+    await db.refresh(trade)
+    await events.publish_portfolio_events(db, trade.portfolio_id, [events.trade_event(trade, previous_status)])
+    return trade
+
+
+async def get_trade_lots(db: AsyncSession, trade: Trade):
+    fills = await get_trade_fills(db, trade.id)
+    method = await get_cost_basis_method(db, trade.portfolio_id)
+    position = match_fills(fills, is_long=trade.trade_type == TradeType.LONG, method=method)
+    return position.lots
+
+
+async def rematch_portfolio(
+    db: AsyncSession,
+    portfolio_id: int,
+    method: Optional[CostBasisMethod] = None
+) -> int:
+    """
+    Re-match every multi-fill position in a portfolio.
+
+    Fills are read with a single ordered query, matched per trade without
+    loading ORM objects, and written back with one bulk UPDATE.
+    A ``method`` other than the portfolio's is saved as its cost basis
+    method, so later fills and closes keep matching that way. Raises
+    OverfillError (before writing anything) if a position can't be matched.
+    Returns the number of trades updated.
+    """
+    if method is None:
+        method = await get_cost_basis_method(db, portfolio_id)
+
+    result = await db.execute(
+        select(
+            Fill.trade_id,
+            Fill.id,
+            Fill.side,
+            Fill.price,
+            Fill.quantity,
+            Fill.executed_at,
+            Trade.trade_type,
+        )
+        .join(Trade, Trade.id == Fill.trade_id)
+        .where(Trade.portfolio_id == portfolio_id)
+        .order_by(Fill.trade_id, Fill.executed_at, Fill.id)
+    )
+
+    updates = []
+    for trade_id, rows in groupby(result.all(), key=lambda row: row.trade_id):
+        rows = list(rows)
+        position = match_fills(
+            rows,
+            is_long=rows[0].trade_type == TradeType.LONG,
+            method=method,
+            keep_lots=False
+        )
+        updates.append(
+            position_values(trade_id, position, rows[0].executed_at, rows[-1].executed_at)
+        )
+
+    await db.execute(
+        update(Portfolio)
+        .where(Portfolio.id == portfolio_id, Portfolio.cost_basis_method != method)
+        .values(cost_basis_method=method)
+    )
+    if updates:
+        result = await db.execute(
+            select(Trade.id, *(getattr(Trade, c) for c in trade_event_crud.TRACKED_FIELDS))
+            .where(Trade.id.in_([u["id"] for u in updates]))
+        )
+        before = {row.id: trade_event_crud.trade_state(row) for row in result}
+        await db.execute(update(Trade), updates)
+        await trade_event_crud.record_events(db, (
+            trade_event_crud.event_values(
+                "rematched", u["id"], portfolio_id, before[u["id"]],
+                {**before[u["id"]], **trade_event_crud.trade_state_values(u)}
+            )
+            for u in updates
+        ))
+        await snapshot_crud.invalidate_snapshots(
+            db, [portfolio_id], snapshot_crud.first_day(*(u["entry_date"] for u in updates))
+        )
+    # Realized P&L changed, so net P&L has to follow (this commits)
+    await charges_crud.recompute_charges(db, portfolio_id=portfolio_id)
+    if updates:
+        await events.publish_portfolio_events(db, portfolio_id, [events.portfolio_refresh_event(portfolio_id)])
+    return len(updates)
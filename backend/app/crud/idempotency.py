@@ -0,0 +1,90 @@
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Tuple
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, update, delete, and_, or_
+from app.database import upsert
+from app.models import IdempotencyKey
+
+# A claim whose request never completed (the process died) can be taken over after this
+IN_FLIGHT_TIMEOUT = timedelta(minutes=5)
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+async def claim_key(
+    db: AsyncSession, user_id: int, key: str, request_hash: str, ttl: timedelta
+) -> Optional[IdempotencyKey]:
+    """
+    Claim ``key`` for a request about to run.
+
+    Returns None when the caller should run the request: the key is new, or
+    its record has expired or was abandoned in flight. Otherwise returns the
+    existing record, whose response is replayed. Both the insert
+    (ON CONFLICT DO NOTHING) and the takeover are single statements, so two
+    concurrent retries can't both run.
+    """
+    now = _utcnow()
+    claimed = (await db.execute(
+        upsert(IdempotencyKey)
+        .values(user_id=user_id, key=key, request_hash=request_hash, created_at=now)
+        .on_conflict_do_nothing(index_elements=[IdempotencyKey.user_id, IdempotencyKey.key])
+        .returning(IdempotencyKey.id)
+    )).scalar_one_or_none()
+    if claimed is None:
+        result = await db.execute(
+            update(IdempotencyKey)
+            .where(
+                and_(
+                    IdempotencyKey.user_id == user_id,
+                    IdempotencyKey.key == key,
+                    or_(
+                        IdempotencyKey.created_at < now - ttl,
+                        and_(IdempotencyKey.status_code.is_(None), IdempotencyKey.created_at < now - IN_FLIGHT_TIMEOUT)
+                    )
+                )
+            )
+            .values(
+                request_hash=request_hash, created_at=now, status_code=None,
+                response_headers=None, response_body=None, completed_at=None
+            )
+            .execution_options(synchronize_session=False)
+        )
+        claimed = result.rowcount == 1
+    await db.commit()
+    if claimed:
+        return None
+    result = await db.execute(
+        select(IdempotencyKey).where(and_(IdempotencyKey.user_id == user_id, IdempotencyKey.key == key))
+    )
+    return result.scalar_one()
+
+
+async def complete_key(
+    db: AsyncSession, user_id: int, key: str, status_code: int, headers: List[Tuple[str, str]], body: bytes
+) -> None:
+    """Store the response to replay for ``key``"""
+    await db.execute(
+        update(IdempotencyKey)
+        .where(and_(IdempotencyKey.user_id == user_id, IdempotencyKey.key == key))
+        .values(
+            status_code=status_code, response_headers=[list(h) for h in headers], response_body=body,
+            completed_at=_utcnow()
+        )
+    )
+    await db.commit()
+
+
+async def release_key(db: AsyncSession, user_id: int, key: str) -> None:
+    """Forget a claim whose response is not replayed (server errors), so a retry runs again"""
+    await db.execute(
+        delete(IdempotencyKey).where(and_(IdempotencyKey.user_id == user_id, IdempotencyKey.key == key))
+    )
+    await db.commit()
+
+
+async def purge_expired(db: AsyncSession, ttl: timedelta) -> int:
+    result = await db.execute(delete(IdempotencyKey).where(IdempotencyKey.created_at < _utcnow() - ttl))
+    await db.commit()
+    return result.rowcount
@@ -0,0 +1,45 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+from datetime import datetime, timezone
+from typing import Optional, List
+from app.models.job import Job, JobStatus
+from app.schemas.job import JobCreate
+
+
+async def get_job_by_id(db: AsyncSession, job_id: int) -> Optional[Job]:
+    result = await db.execute(select(Job).where(Job.id == job_id))
+    return result.scalar_one_or_none()
+
+
+async def get_user_jobs(
+    db: AsyncSession,
+    user_id: int,
+    status: Optional[JobStatus] = None,
+    limit: int = 50
+) -> List[Job]:
+    query = select(Job).where(Job.user_id == user_id)
+    if status is not None:
+        query = query.where(Job.status == status)
+    result = await db.execute(query.order_by(Job.id.desc()).limit(limit))
+    return list(result.scalars().all())
+
+
+async def create_job(db: AsyncSession, job: JobCreate, user_id: int) -> Job:
+    db_job = Job(kind=job.kind, params=job.params, user_id=user_id)
+    db.add(db_job)
+    await db.commit()
+    await db.refresh(db_job)
+    return db_job
+
+
+async def request_cancel(db: AsyncSession, job: Job) -> Job:
+    """Pending jobs are cancelled immediately; running ones stop at their next progress report"""
+    if job.status == JobStatus.PENDING:
+        job.status = JobStatus.CANCELLED
+        job.message = "Cancelled"
+        job.finished_at = datetime.now(timezone.utc)
+    elif job.status == JobStatus.RUNNING:
+        job.cancel_requested = True
+    await db.commit()
+    await db.refresh(job)
+    return job
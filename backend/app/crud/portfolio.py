@@ -1,7 +1,11 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from app.models import Portfolio
+from sqlalchemy import select, delete
+from sqlalchemy.sql.elements import ColumnElement
+from app.models import Portfolio, Trade, Fill
 from app.schemas.portfolio import PortfolioCreate, PortfolioUpdate
+from app.crud import fill as fill_crud
+from app.crud import snapshot as snapshot_crud
+from app.services.files import remove_files_async
 from typing import Optional, List
 
 
@@ -38,21 +42,57 @@ async def update_portfolio(
         return None
 
     update_data = portfolio_update.model_dump(exclude_unset=True)
+    method_changed = (
+        update_data.get("cost_basis_method") is not None
+        and update_data["cost_basis_method"] != db_portfolio.cost_basis_method
+    )
     for field, value in update_data.items():
         setattr(db_portfolio, field, value)
+    # Cash and NAV start from the initial balance
+    if "initial_balance" in update_data:
+        await snapshot_crud.invalidate_snapshots(db, [portfolio_id])
+
+    # Realized P&L of partially closed positions depends on the cost basis
+    # method; re-matching commits the change with the new P&L
+    if method_changed:
+        await fill_crud.rematch_portfolio(db, portfolio_id, db_portfolio.cost_basis_method)
+    else:
+        await db.commit()
 
-    await db.commit()
     await db.refresh(db_portfolio)
     return db_portfolio
 
 
-async def delete_portfolio(db: AsyncSession, portfolio_id: int) -> bool:
-    result = await db.execute(select(Portfolio).where(Portfolio.id == portfolio_id))
-    db_portfolio = result.scalar_one_or_none()
+async def delete_portfolio_rows(db: AsyncSession, condition: ColumnElement) -> List[str]:
+    """
+    Bulk-delete the portfolios matching ``condition`` with their trades and fills.
 
-    if db_portfolio is None:
+    The foreign keys cascade, but children are deleted explicitly as well so
+    databases created before the constraints existed are cleaned up the same
+    way. Returns the screenshot paths of the deleted trades; the caller commits.
+    """
+    portfolio_ids = select(Portfolio.id).where(condition)
+    trade_ids = select(Trade.id).where(Trade.portfolio_id.in_(portfolio_ids))
+    result = await db.execute(
+        select(Trade.screenshot_path).where(
+            Trade.portfolio_id.in_(portfolio_ids), Trade.screenshot_path.is_not(None)
+        )
+    )
+    screenshots = list(result.scalars())
+
+    no_sync = {"synchronize_session": False}
+    await db.execute(delete(Fill).where(Fill.trade_id.in_(trade_ids)).execution_options(**no_sync))
+    await db.execute(delete(Trade).where(Trade.portfolio_id.in_(portfolio_ids)).execution_options(**no_sync))
+    await db.execute(delete(Portfolio).where(condition).execution_options(**no_sync))
+    return screenshots
+
+
+async def delete_portfolio(db: AsyncSession, portfolio_id: int) -> bool:
+    exists = await db.scalar(select(Portfolio.id).where(Portfolio.id == portfolio_id))
+    if exists is None:
         return False
 
-    await db.delete(db_portfolio)
+    screenshots = await delete_portfolio_rows(db, Portfolio.id == portfolio_id)
     await db.commit()
+    await remove_files_async(screenshots)
     return True
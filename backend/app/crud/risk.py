@@ -0,0 +1,168 @@
+from datetime import timedelta
+from typing import Any, Dict, List, Optional, Tuple
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, delete, insert, func, and_, or_
+from app.database import current_shard
+from app.models import RiskRule, Trade, TradeEvent
+from app.models.trade import TradeStatus
+from app.schemas.risk import RiskRuleBase
+from app.schemas.trade import TradeCreate
+from app.crud import trade_event as trade_event_crud
+from app.services import risk
+from app.services.market_time import ist_day_start, ist_today
+
+# Trade columns the counters are seeded from
+_COUNTER_COLUMNS = [
+    "symbol", "status", "entry_price", "entry_date", "quantity", "open_quantity", "open_avg_price",
+    "exit_date", "profit_loss", "net_profit_loss",
+]
+
+
+async def get_rules(db: AsyncSession, portfolio_id: int) -> List[RiskRule]:
+    result = await db.execute(select(RiskRule).where(RiskRule.portfolio_id == portfolio_id).order_by(RiskRule.id))
+    return list(result.scalars().all())
+
+
+async def replace_rules(db: AsyncSession, portfolio_id: int, rules: List[RiskRuleBase]) -> List[RiskRule]:
+    await db.execute(delete(RiskRule).where(RiskRule.portfolio_id == portfolio_id))
+    if rules:
+        await db.execute(insert(RiskRule), [{"portfolio_id": portfolio_id, **rule.model_dump()} for rule in rules])
+    await db.commit()
+    return await get_rules(db, portfolio_id)
+
+
+async def _rules_and_last_event(db: AsyncSession, portfolio_id: int) -> Tuple[List[risk.Rule], int]:
+    """The portfolio's rules and latest trade event id, in one query"""
+    last_event = (
+        select(func.coalesce(func.max(TradeEvent.id), 0))
+        .where(TradeEvent.portfolio_id == portfolio_id)
+        .scalar_subquery()
+    )
+    result = await db.execute(
+        select(RiskRule.kind, RiskRule.limit, RiskRule.action, last_event.label("last_event_id"))
+        .where(RiskRule.portfolio_id == portfolio_id)
+    )
+    rows = result.all()
+    return [risk.Rule(row.kind, row.limit, row.action) for row in rows], (rows[0].last_event_id if rows else 0)
+
+
+async def seed_counters(db: AsyncSession, portfolio_id: int, last_event_id: int) -> risk.DayCounters:
+    """Counters from the open trades and those entered or exited today"""
+    day = ist_today()
+    start, end = ist_day_start(day), ist_day_start(day + timedelta(days=1))
+    result = await db.execute(
+        select(*(getattr(Trade, c) for c in _COUNTER_COLUMNS)).where(
+            and_(
+                Trade.portfolio_id == portfolio_id,
+                or_(
+                    Trade.status == TradeStatus.OPEN,
+                    and_(Trade.entry_date >= start, Trade.entry_date < end),
+                    and_(Trade.exit_date >= start, Trade.exit_date < end),
+                )
+            )
+        )
+    )
+    counters = risk.DayCounters(day=day, last_event_id=last_event_id)
+    for row in result:
+        counters.add(risk.contribution(row, day))
+    return counters
+
+
+async def load_counters(
+    db: AsyncSession, portfolio_id: int
+) -> Optional[Tuple[List[risk.Rule], risk.DayCounters]]:
+    """Rules and current counters of a portfolio, or None when it has no rules"""
+    rules, last_event_id = await _rules_and_last_event(db, portfolio_id)
+    if not rules:
+        return None
+    store, key = risk.get_counter_store(), risk.counter_key(current_shard.get(), portfolio_id)
+    counters = store.get(key, ist_today(), last_event_id)
+    if counters is None:
+        counters = await seed_counters(db, portfolio_id, last_event_id)
+        store.put(key, counters)
+    return rules, counters
+
+
+def portfolio_lock(portfolio_id: int):
+    return risk.get_counter_store().lock(risk.counter_key(current_shard.get(), portfolio_id))
+
+
+def counter_state(trade: Trade) -> Dict[str, Any]:
+    """The fields counters are computed from, copied before a write changes them"""
+    return {c: getattr(trade, c) for c in _COUNTER_COLUMNS}
+
+
+async def check_entry(db: AsyncSession, trade: TradeCreate) -> Optional[risk.Check]:
+    """Check a new trade against the portfolio's rules; raises RiskRuleViolation to reject it"""
+    loaded = await load_counters(db, trade.portfolio_id)
+    if loaded is None:
+        return None
+    rules, counters = loaded
+    violations = risk.check_entry(rules, counters, risk.contribution(trade.model_dump(), counters.day))
+    rejected = risk.rejections(violations)
+    if rejected:
+        raise risk.RiskRuleViolation(rejected)
+    return risk.Check(trade.portfolio_id, rules, counters, None, violations)
+
+
+async def check_close(db: AsyncSession, trade: Trade) -> Optional[risk.Check]:
+    """Start a close; its warnings are known once the close has been counted"""
+    loaded = await load_counters(db, trade.portfolio_id)
+    if loaded is None:
+        return None
+    rules, counters = loaded
+    return risk.Check(trade.portfolio_id, rules, counters, counter_state(trade), [])
+
+
+async def finish_check(db: AsyncSession, check: Optional[risk.Check], trade: Trade) -> List[risk.Violation]:
+    """
+    Move the counters by the committed write and return its warnings.
+
+    The counters are moved only when the write's trade event is the
+    portfolio's single new event; if anything else was written meanwhile they
+    are seeded again instead.
+    """
+    if check is None:
+        return []
+    counters = check.counters
+    result = await db.execute(
+        select(func.count(TradeEvent.id), func.max(TradeEvent.id)).where(
+            and_(TradeEvent.portfolio_id == check.portfolio_id, TradeEvent.id > counters.last_event_id)
+        )
+    )
+    new_events, last_event_id = result.one()
+    if new_events == 1 and counters.day == ist_today():
+        if check.before is not None:
+            counters.remove(risk.contribution(check.before, counters.day))
+        counters.add(risk.contribution(trade, counters.day))
+        counters.last_event_id = last_event_id
+    else:
+        risk.get_counter_store().discard(risk.counter_key(current_shard.get(), check.portfolio_id))
+        if check.before is not None:
+            loaded = await load_counters(db, check.portfolio_id)
+            counters = loaded[1] if loaded is not None else counters
+
+    if check.before is None:
+        return check.warnings
+    return risk.check_close(check.rules, counters)
+
+
+async def get_risk_status(db: AsyncSession, portfolio_id: int) -> Dict[str, Any]:
+    rules = await get_rules(db, portfolio_id)
+    loaded = await load_counters(db, portfolio_id)
+    if loaded is None:
+        counters = await seed_counters(db, portfolio_id, await trade_event_crud.last_event_id(db, portfolio_id))
+        breached = []
+    else:
+        counters = loaded[1]
+        breached = risk.breached(loaded[0], counters)
+    return {
+        "portfolio_id": portfolio_id,
+        "day": counters.day,
+        "realized_profit_loss": round(counters.realized_profit_loss, 2),
+        "trades_entered": counters.trades_entered,
+        "open_positions": counters.open_positions,
+        "exposure": {symbol: round(value, 2) for symbol, value in sorted(counters.exposure.items())},
+        "rules": rules,
+        "breached": breached,
+    }
@@ -0,0 +1,219 @@
+from datetime import date, datetime, timedelta
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, delete, func, or_, and_
+from typing import Optional, List, Dict, Any, Iterable
+import numpy as np
+from app.database import upsert
+from app.models import Trade, Portfolio, PortfolioSnapshot
+from app.services import nav as nav_service
+from app.services.market_time import ist_day_start, ist_today, financial_year_of
+from app.services.price_store import get_price_store
+
+SNAPSHOT_COLUMNS = ["realized_profit_loss", "unrealized_profit_loss", "open_positions", "cash", "nav"]
+
+# Rows per INSERT batch when writing snapshots
+INSERT_BATCH = 5000
+
+
+def _realized_value():
+    return func.coalesce(Trade.net_profit_loss, Trade.profit_loss, 0.0)
+
+
+async def compute_series(db: AsyncSession, portfolio: Portfolio, start: date, end: date) -> nav_service.NavSeries:
+    """NAV for the trading days from ``start`` to ``end`` with two queries"""
+    days = nav_service.trading_days(start, end)
+    start_at = ist_day_start(start)
+    end_at = ist_day_start(end + timedelta(days=1))
+
+    realized_before = await db.scalar(
+        select(func.coalesce(func.sum(_realized_value()), 0.0)).where(
+            Trade.portfolio_id == portfolio.id,
+            Trade.exit_date.is_not(None),
+            Trade.exit_date < start_at
+        )
+    )
+    result = await db.execute(
+        select(
+            Trade.symbol,
+            Trade.trade_type,
+            Trade.entry_price,
+            Trade.quantity,
+            Trade.open_quantity,
+            Trade.open_avg_price,
+            Trade.entry_date,
+            Trade.exit_date,
+            Trade.profit_loss,
+            Trade.net_profit_loss,
+        ).where(
+            Trade.portfolio_id == portfolio.id,
+            Trade.entry_date < end_at,
+            or_(Trade.exit_date.is_(None), Trade.exit_date >= start_at)
+        )
+    )
+    return nav_service.compute_nav(
+        days,
+        portfolio.initial_balance or 0.0,
+        float(realized_before or 0.0),
+        result.all(),
+        get_price_store().prices_at
+    )
+
+
+def _snapshot_rows(portfolio_id: int, series: nav_service.NavSeries) -> List[Dict[str, Any]]:
+    columns = {
+        "realized_profit_loss": np.round(series.realized_profit_loss, 2).tolist(),
+        "unrealized_profit_loss": np.round(series.unrealized_profit_loss, 2).tolist(),
+        "open_positions": series.open_positions.tolist(),
+        "cash": np.round(series.cash, 2).tolist(),
+        "nav": np.round(series.nav, 2).tolist(),
+    }
+    return [
+        {"portfolio_id": portfolio_id, "day": day, **{name: values[i] for name, values in columns.items()}}
+        for i, day in enumerate(series.days.astype(date).tolist())
+    ]
+
+
+async def _insert_rows(db: AsyncSession, rows: List[Dict[str, Any]]) -> None:
+    # Concurrent reads of the same portfolio compute the same missing days;
+    # rows another request stored first are kept
+    statement = upsert(PortfolioSnapshot).on_conflict_do_nothing(index_elements=["portfolio_id", "day"])
+    for i in range(0, len(rows), INSERT_BATCH):
+        await db.execute(statement, rows[i:i + INSERT_BATCH])
+
+
+async def _first_trade_day(db: AsyncSession, portfolio_id: int) -> Optional[date]:
+    first_entry = await db.scalar(select(func.min(Trade.entry_date)).where(Trade.portfolio_id == portfolio_id))
+    return ist_today(first_entry) if first_entry is not None else None
+
+
+async def extend_snapshots(db: AsyncSession, portfolio: Portfolio) -> int:
+    """
+    Store snapshots for completed trading days that don't have one yet.
+
+    Only days after the latest stored snapshot are computed, so this is cheap
+    when called on every read. Today's value changes with prices and is never
+    stored. Does not commit.
+    """
+    last_day = await db.scalar(
+        select(func.max(PortfolioSnapshot.day)).where(PortfolioSnapshot.portfolio_id == portfolio.id)
+    )
+    start = last_day + timedelta(days=1) if last_day else await _first_trade_day(db, portfolio.id)
+    end = nav_service.last_completed_trading_day()
+    if start is None or start > end:
+        return 0
+
+    series = await compute_series(db, portfolio, start, end)
+    rows = _snapshot_rows(portfolio.id, series)
+    await _insert_rows(db, rows)
+    return len(rows)
+
+
+def first_day(*values: Optional[datetime]) -> Optional[date]:
+    """Earliest IST day of the given timestamps, ignoring None"""
+    days = [ist_today(v) for v in values if v is not None]
+    return min(days) if days else None
+
+
+async def invalidate_snapshots(
+    db: AsyncSession,
+    portfolio_ids: Optional[Iterable[int]] = None,
+    since: Optional[date] = None
+) -> None:
+    """
+    Drop stored snapshots of the given (default: every) portfolio from ``since`` on.
+
+    Called in the transaction that changes trades, from the first day the
+    change affects; the dropped days are recomputed by the next read. Does
+    not commit.
+    """
+    conditions = []
+    if portfolio_ids is not None:
+        conditions.append(PortfolioSnapshot.portfolio_id.in_(list(portfolio_ids)))
+    if since is not None:
+        conditions.append(PortfolioSnapshot.day >= since)
+    await db.execute(delete(PortfolioSnapshot).where(*conditions))
+
+
+async def get_nav_series(
+    db: AsyncSession,
+    portfolio: Portfolio,
+    start: Optional[date] = None,
+    end: Optional[date] = None
+) -> List[Dict[str, Any]]:
+    """Stored daily snapshots in [start, end], with today's live value appended when in range"""
+    if await extend_snapshots(db, portfolio):
+        await db.commit()
+
+    conditions = [PortfolioSnapshot.portfolio_id == portfolio.id]
+    if start is not None:
+        conditions.append(PortfolioSnapshot.day >= start)
+    if end is not None:
+        conditions.append(PortfolioSnapshot.day <= end)
+    result = await db.execute(
+        select(PortfolioSnapshot.day, *(getattr(PortfolioSnapshot, c) for c in SNAPSHOT_COLUMNS))
+        .where(and_(*conditions))
+        .order_by(PortfolioSnapshot.day)
+    )
+    points = [dict(row._mapping) for row in result]
+
+    today = ist_today()
+    in_range = (start is None or start <= today) and (end is None or today <= end)
+    if in_range and await _first_trade_day(db, portfolio.id) is not None:
+        live = _snapshot_rows(portfolio.id, await compute_series(db, portfolio, today, today))
+        if live:
+            points.append({k: v for k, v in live[0].items() if k != "portfolio_id"})
+    return points
+
+
+async def get_period_returns(db: AsyncSession, portfolio: Portfolio) -> Dict[str, Any]:
+    """Month-, calendar-year- and financial-year-to-date returns from the snapshots"""
+    if await extend_snapshots(db, portfolio):
+        await db.commit()
+
+    today = ist_today()
+    latest = await compute_series(db, portfolio, today, today)
+    if len(latest):
+        nav_now = float(latest.nav[-1])
+    else:
+        # Weekend: the last trading day's close is the current value
+        stored = await db.scalar(
+            select(PortfolioSnapshot.nav)
+            .where(PortfolioSnapshot.portfolio_id == portfolio.id)
+            .order_by(PortfolioSnapshot.day.desc())
+            .limit(1)
+        )
+        nav_now = stored if stored is not None else portfolio.initial_balance or 0.0
+
+    period_starts = {
+        "mtd": today.replace(day=1),
+        "ytd": today.replace(month=1, day=1),
+        "fy": date(financial_year_of(ist_day_start(today)), 4, 1),
+    }
+    returns = {"portfolio_id": portfolio.id, "as_of": today, "nav": round(nav_now, 2)}
+    for name, period_start in period_starts.items():
+        # Value at the close before the period; a portfolio with no history yet starts at its balance
+        nav_before = await db.scalar(
+            select(PortfolioSnapshot.nav)
+            .where(PortfolioSnapshot.portfolio_id == portfolio.id, PortfolioSnapshot.day < period_start)
+            .order_by(PortfolioSnapshot.day.desc())
+            .limit(1)
+        )
+        if nav_before is None:
+            nav_before = portfolio.initial_balance
+        returns[f"{name}_return_percentage"] = nav_service.period_return(nav_now, nav_before)
+    return returns
+
+
+async def backfill_snapshots(db: AsyncSession, portfolio_ids: Optional[List[int]] = None) -> Dict[str, int]:
+    """Rebuild all stored snapshots of the given (default: every) portfolio and commit"""
+    query = select(Portfolio)
+    if portfolio_ids is not None:
+        query = query.where(Portfolio.id.in_(portfolio_ids))
+    portfolios = list((await db.execute(query.order_by(Portfolio.id))).scalars())
+
+    written = 0
+    for portfolio in portfolios:
+        await invalidate_snapshots(db, [portfolio.id])
+        written += await extend_snapshots(db, portfolio)
+        await db.commit()
+    return {"portfolios": len(portfolios), "snapshots": written}
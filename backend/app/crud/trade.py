@@ -1,23 +1,36 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, and_
-from app.models import Trade
-from app.models.trade import TradeStatus
-from app.schemas.trade import TradeCreate, TradeUpdate, TradeClose
-from typing import Optional, List
+from sqlalchemy import select, update, delete, and_
+from app.models import Trade, Fill, Portfolio
+from app.models.trade import TradeStatus, TradeType
+from app.models.types import to_decimal, quantize, round_money
+from app.database import upsert
+from app.schemas.trade import TradeCreate, TradeUpdate, TradeClose, BatchClose, BatchUpdate, BatchOperation
+from app.schemas.fill import FillCreate
+from app.crud import fill as fill_crud
+from app.crud import charges as charges_crud
+from app.crud import snapshot as snapshot_crud
+from app.crud import trade_event as trade_event_crud
+from app.services.lot_matching import match_fills, OverfillError
+from app.services.pnl import profit_loss_arrays
+from app.services.files import remove_files_async
+from app.services import events
+from types import SimpleNamespace
+from typing import Optional, List, Dict, Tuple
 
 
 def calculate_profit_loss(trade: Trade) -> tuple[float, float]:
-    """Calculate profit/loss and percentage for a trade"""
+    """Calculate profit/loss (exact, to the paisa) and percentage for a trade"""
     if trade.exit_price is None:
         return 0.0, 0.0
 
+    entry_price, exit_price, quantity = (to_decimal(v) for v in (trade.entry_price, trade.exit_price, trade.quantity))
     if trade.trade_type == "long":
-        pl = (trade.exit_price - trade.entry_price) * trade.quantity
+        pl = (exit_price - entry_price) * quantity
     else:  # short
-        pl = (trade.entry_price - trade.exit_price) * trade.quantity
+        pl = (entry_price - exit_price) * quantity
 
-    pl_percentage = (pl / (trade.entry_price * trade.quantity)) * 100
-    return pl, pl_percentage
+    pl_percentage = (pl / (entry_price * quantity)) * 100
+    return float(quantize(pl)), float(pl_percentage)
 
 
 async def get_trade_by_id(db: AsyncSession, trade_id: int) -> Optional[Trade]:
@@ -37,12 +50,43 @@ async def get_portfolio_trades(
     return list(result.scalars().all())
 
 
-async def create_trade(db: AsyncSession, trade: TradeCreate) -> Trade:
-    db_trade = Trade(**trade.model_dump())
-    db.add(db_trade)
+async def get_trade_by_external_id(db: AsyncSession, portfolio_id: int, external_id: str) -> Optional[Trade]:
+    result = await db.execute(
+        select(Trade).where(and_(Trade.portfolio_id == portfolio_id, Trade.external_id == external_id))
+    )
+    return result.scalar_one_or_none()
+
+
+async def create_trade(db: AsyncSession, trade: TradeCreate) -> Tuple[Trade, bool]:
+    """
+    Insert a trade; returns it and whether it was created.
+
+    A trade with an ``external_id`` the portfolio already has is inserted
+    with ON CONFLICT DO NOTHING, so re-imports (even concurrent ones) return
+    the existing trade without writing anything.
+    """
+    if trade.external_id is None:
+        db_trade = Trade(**trade.model_dump())
+        db.add(db_trade)
+        await db.flush()
+    else:
+        result = await db.execute(
+            upsert(Trade)
+            .values(**trade.model_dump())
+            .on_conflict_do_nothing(index_elements=[Trade.portfolio_id, Trade.external_id])
+            .returning(Trade.id)
+        )
+        trade_id = result.scalar_one_or_none()
+        if trade_id is None:
+            return await get_trade_by_external_id(db, trade.portfolio_id, trade.external_id), False
+        db_trade = await db.get(Trade, trade_id)
+    await trade_event_crud.record_event(db, "created", db_trade, None)
+    # Backdated trades change the history
+    await snapshot_crud.invalidate_snapshots(db, [db_trade.portfolio_id], snapshot_crud.first_day(db_trade.entry_date))
     await db.commit()
     await db.refresh(db_trade)
-    return db_trade
+    await events.publish_portfolio_events(db, db_trade.portfolio_id, [events.trade_event(db_trade)])
+    return db_trade, True
 
 
 async def update_trade(
@@ -56,6 +100,8 @@ async def update_trade(
     if db_trade is None:
         return None
 
+    previous_entry_date, previous_status = db_trade.entry_date, db_trade.status
+    before = trade_event_crud.trade_state(db_trade)
     update_data = trade_update.model_dump(exclude_unset=True)
     for field, value in update_data.items():
         setattr(db_trade, field, value)
@@ -65,9 +111,34 @@ async def update_trade(
         pl, pl_pct = calculate_profit_loss(db_trade)
         db_trade.profit_loss = pl
         db_trade.profit_loss_percentage = pl_pct
+    await charges_crud.apply_trade_charges(db, db_trade)
+    await trade_event_crud.record_event(db, trade_event_crud.change_kind(before, db_trade.status), db_trade, before)
+    await snapshot_crud.invalidate_snapshots(
+        db, [db_trade.portfolio_id], snapshot_crud.first_day(previous_entry_date, db_trade.entry_date)
+    )
+
+    await db.commit()
+    await db.refresh(db_trade)
+    await events.publish_portfolio_events(db, db_trade.portfolio_id, [events.trade_event(db_trade, previous_status)])
+    return db_trade
+
 
+async def set_screenshot(db: AsyncSession, db_trade: Trade, path: str) -> Trade:
+    """
+    Point a trade at its uploaded screenshot and commit.
+
+    Not part of ``TradeUpdate``: clients upload the file, they don't set the
+    path. A screenshot this replaces is removed after the commit.
+    """
+    previous_path, previous_status = db_trade.screenshot_path, db_trade.status
+    before = trade_event_crud.trade_state(db_trade)
+    db_trade.screenshot_path = path
+    await trade_event_crud.record_event(db, "updated", db_trade, before)
     await db.commit()
     await db.refresh(db_trade)
+    if previous_path and previous_path != path:
+        await remove_files_async([previous_path])
+    await events.publish_portfolio_events(db, db_trade.portfolio_id, [events.trade_event(db_trade, previous_status)])
     return db_trade
 
 
@@ -78,6 +149,23 @@ async def close_trade(db: AsyncSession, trade_id: int, trade_close: TradeClose)
     if db_trade is None:
         return None
 
+    # Multi-fill positions are closed by a fill for the remaining open quantity
+    fills = await fill_crud.get_trade_fills(db, trade_id)
+    if fills:
+        method = await fill_crud.get_cost_basis_method(db, db_trade.portfolio_id)
+        position = match_fills(
+            fills, is_long=db_trade.trade_type == TradeType.LONG, method=method, keep_lots=False
+        )
+        closing_fill = FillCreate(
+            side=fill_crud.closing_side(db_trade),
+            price=trade_close.exit_price,
+            quantity=position.open_quantity,
+            executed_at=trade_close.exit_date
+        )
+        return await fill_crud.add_fill(db, db_trade, closing_fill)
+
+    previous_status = db_trade.status
+    before = trade_event_crud.trade_state(db_trade)
     db_trade.exit_price = trade_close.exit_price
     db_trade.exit_date = trade_close.exit_date
     db_trade.status = TradeStatus.CLOSED
@@ -86,9 +174,15 @@ async def close_trade(db: AsyncSession, trade_id: int, trade_close: TradeClose)
     pl, pl_pct = calculate_profit_loss(db_trade)
     db_trade.profit_loss = pl
     db_trade.profit_loss_percentage = pl_pct
+    await charges_crud.apply_trade_charges(db, db_trade)
+    await trade_event_crud.record_event(db, "closed", db_trade, before)
+    await snapshot_crud.invalidate_snapshots(
+        db, [db_trade.portfolio_id], snapshot_crud.first_day(db_trade.exit_date)
+    )
 
     await db.commit()
     await db.refresh(db_trade)
+    await events.publish_portfolio_events(db, db_trade.portfolio_id, [events.trade_event(db_trade, previous_status)])
     return db_trade
 
 
@@ -99,6 +193,183 @@ async def delete_trade(db: AsyncSession, trade_id: int) -> bool:
     if db_trade is None:
         return False
 
-    await db.delete(db_trade)
+    # Fills are removed explicitly too, for databases created before ON DELETE CASCADE
+    await db.execute(delete(Fill).where(Fill.trade_id == trade_id))
+    await db.execute(delete(Trade).where(Trade.id == trade_id).execution_options(synchronize_session=False))
+    await trade_event_crud.record_events(db, [trade_event_crud.event_values(
+        "deleted", trade_id, db_trade.portfolio_id, trade_event_crud.trade_state(db_trade), None
+    )])
+    await snapshot_crud.invalidate_snapshots(db, [db_trade.portfolio_id], snapshot_crud.first_day(db_trade.entry_date))
     await db.commit()
+    await remove_files_async([db_trade.screenshot_path])
+    await events.publish_portfolio_events(
+        db, db_trade.portfolio_id, [events.trade_deleted_event(db_trade.portfolio_id, trade_id)]
+    )
     return True
+
+
+# Columns a batch writes back for every trade it changed
+_BATCH_COLUMNS = [
+    "symbol", "trade_type", "segment", "status", "entry_price", "entry_date", "quantity",
+    "exit_price", "exit_date", "open_quantity", "profit_loss", "profit_loss_percentage",
+    "charges", "net_profit_loss", "notes", "tags",
+]
+
+
+def _batch_error(index: int, operation: BatchOperation, status_code: int, detail: str) -> dict:
+    return {
+        "index": index, "op": operation.op, "trade_id": operation.trade_id,
+        "status_code": status_code, "detail": detail, "trade": None,
+    }
+
+
+async def _apply_single(db: AsyncSession, operation: BatchOperation) -> Optional[Trade]:
+    """Apply one operation through the per-trade functions (used for multi-fill positions)"""
+    if isinstance(operation, BatchClose):
+        trade_close = TradeClose(exit_price=operation.exit_price, exit_date=operation.exit_date)
+        return await close_trade(db, operation.trade_id, trade_close)
+    if isinstance(operation, BatchUpdate):
+        return await update_trade(db, operation.trade_id, operation.changes)
+    await delete_trade(db, operation.trade_id)
+    return None
+
+
+async def apply_batch(db: AsyncSession, user_id: int, operations: List[BatchOperation]) -> List[dict]:
+    """
+    Apply close/update/delete operations to many trades with one commit.
+
+    Ownership of every referenced trade is checked with a single query.
+    Operations run in order against in-memory state, P&L and charges are then
+    recalculated for all changed trades at once and written back with one
+    bulk UPDATE and one DELETE. Multi-fill positions need lot matching, so
+    their operations go through the per-trade functions afterwards. Each
+    operation gets its own result; a failed one does not stop the others.
+    """
+    trade_ids = {op.trade_id for op in operations}
+    result = await db.execute(
+        select(Trade.id, Portfolio.user_id, *(getattr(Trade, c) for c in trade_event_crud.TRACKED_FIELDS))
+        .join(Portfolio, Trade.portfolio_id == Portfolio.id)
+        .where(Trade.id.in_(trade_ids))
+    )
+    states: Dict[int, dict] = {row.id: row._asdict() for row in result}
+    previous_entry_dates = {trade_id: state["entry_date"] for trade_id, state in states.items()}
+    previous_statuses = {trade_id: state["status"] for trade_id, state in states.items()}
+    before = {trade_id: trade_event_crud.trade_state(SimpleNamespace(**state)) for trade_id, state in states.items()}
+    result = await db.execute(select(Fill.trade_id).where(Fill.trade_id.in_(states)).distinct())
+    with_fills = set(result.scalars())
+
+    results: List[dict] = []
+    changed, deleted = set(), set()
+    deferred = []
+    for index, operation in enumerate(operations):
+        state = states.get(operation.trade_id)
+        if state is None or operation.trade_id in deleted:
+            results.append(_batch_error(index, operation, 404, "Trade not found"))
+            continue
+        if state["user_id"] != user_id:
+            results.append(_batch_error(index, operation, 403, "Not authorized to access this portfolio"))
+            continue
+        if isinstance(operation, BatchClose):
+            if state["status"] == TradeStatus.CLOSED:
+                results.append(_batch_error(index, operation, 400, "Trade is already closed"))
+                continue
+            state.update(exit_price=operation.exit_price, exit_date=operation.exit_date, status=TradeStatus.CLOSED)
+        elif isinstance(operation, BatchUpdate):
+            state.update(operation.changes.model_dump(exclude_unset=True))
+        else:
+            deleted.add(operation.trade_id)
+
+        results.append({
+            "index": index, "op": operation.op, "trade_id": operation.trade_id,
+            "status_code": 204 if operation.op == "delete" else 200, "detail": None, "trade": None,
+        })
+        if operation.trade_id in with_fills:
+            deferred.append((results[-1], operation))
+        elif operation.op != "delete":
+            changed.add(operation.trade_id)
+
+    changed -= deleted
+    if changed:
+        rows = [SimpleNamespace(**states[trade_id]) for trade_id in changed]
+        # P&L follows the exit price, as in update_trade; trades without one keep theirs
+        exited = [r for r in rows if r.exit_price is not None]
+        if exited:
+            pl, pl_pct = profit_loss_arrays(
+                [r.entry_price for r in exited],
+                [r.exit_price for r in exited],
+                [r.quantity for r in exited],
+                [r.trade_type == TradeType.LONG for r in exited]
+            )
+            for r, value, pct in zip(exited, pl.tolist(), pl_pct.tolist()):
+                r.profit_loss = round_money(value)
+                r.profit_loss_percentage = pct if pct == pct else None
+
+        for r in rows:
+            r.charges = r.net_profit_loss = None
+        realized = [r for r in rows if r.profit_loss is not None]
+        if realized:
+            tables = await charges_crud.get_rate_tables(db)
+            for r, value in zip(realized, charges_crud.total_charges(realized, tables).tolist()):
+                r.charges = value
+                r.net_profit_loss = round_money(r.profit_loss - value)
+
+        await db.execute(update(Trade), [
+            {"id": r.id, **{c: getattr(r, c) for c in _BATCH_COLUMNS}} for r in rows
+        ])
+        await trade_event_crud.record_events(db, (
+            trade_event_crud.event_values(
+                trade_event_crud.change_kind(before[r.id], r.status), r.id, r.portfolio_id,
+                before[r.id], trade_event_crud.trade_state(r)
+            )
+            for r in rows
+        ))
+
+    plain_deletes = deleted - with_fills
+    if plain_deletes:
+        await db.execute(delete(Trade).where(Trade.id.in_(plain_deletes)))
+        await trade_event_crud.record_events(db, (
+            trade_event_crud.event_values("deleted", trade_id, states[trade_id]["portfolio_id"], before[trade_id], None)
+            for trade_id in plain_deletes
+        ))
+
+    # Snapshots are dropped from the earliest day any trade of a portfolio was open
+    affected: Dict[int, list] = {}
+    for trade_id in changed | plain_deletes:
+        state = states[trade_id]
+        affected.setdefault(state["portfolio_id"], []).extend([previous_entry_dates[trade_id], state["entry_date"]])
+    for portfolio_id, entry_dates in affected.items():
+        await snapshot_crud.invalidate_snapshots(db, [portfolio_id], snapshot_crud.first_day(*entry_dates))
+    await db.commit()
+    await remove_files_async(states[trade_id]["screenshot_path"] for trade_id in plain_deletes)
+
+    for item, operation in deferred:
+        try:
+            item["trade"] = await _apply_single(db, operation)
+        except OverfillError as e:
+            await db.rollback()
+            item.update(status_code=400, detail=str(e))
+
+    trades: Dict[int, Trade] = {}
+    if changed:
+        result = await db.execute(select(Trade).where(Trade.id.in_(changed)))
+        trades = {trade.id: trade for trade in result.scalars()}
+    for item in results:
+        if item["status_code"] == 200 and item["trade"] is None:
+            if item["trade_id"] in trades:
+                item["trade"] = trades[item["trade_id"]]
+            else:
+                # Applied, but a later operation of the batch deleted the trade
+                item["detail"] = "Trade was deleted later in this batch"
+
+    # Multi-fill positions were published by the per-trade functions
+    portfolio_events: Dict[int, list] = {}
+    for trade in trades.values():
+        portfolio_events.setdefault(trade.portfolio_id, []).append(
+            events.trade_event(trade, previous_statuses[trade.id])
+        )
+    for trade_id in plain_deletes:
+        portfolio_id = states[trade_id]["portfolio_id"]
+        portfolio_events.setdefault(portfolio_id, []).append(events.trade_deleted_event(portfolio_id, trade_id))
+    for portfolio_id, batch_events in portfolio_events.items():
+        await events.publish_portfolio_events(db, portfolio_id, batch_events)
+    return results
@@ -0,0 +1,119 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, insert, func
+from fastapi.encoders import jsonable_encoder
+from datetime import datetime, timezone
+from typing import Optional, List, Dict, Any, Iterable
+from app.models import Trade, TradeEvent
+
+# Every trade column except the ones the database maintains
+TRACKED_FIELDS = [
+    c.name for c in Trade.__table__.columns if c.name not in ("id", "created_at", "updated_at")
+]
+
+
+def _normalize(value: Any) -> Any:
+    # Stored timestamps come back naive (UTC) and request ones aware; compare them as UTC
+    if isinstance(value, datetime):
+        return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+    return value
+
+
+def trade_state(trade: Any) -> Dict[str, Any]:
+    """JSON-ready tracked fields of a trade (an ORM object or anything with the same attributes)"""
+    return jsonable_encoder({field: _normalize(getattr(trade, field)) for field in TRACKED_FIELDS})
+
+
+def trade_state_values(values: Dict[str, Any]) -> Dict[str, Any]:
+    """JSON-ready tracked fields out of a dict of column values, e.g. a bulk UPDATE row"""
+    return jsonable_encoder({field: _normalize(v) for field, v in values.items() if field in TRACKED_FIELDS})
+
+
+def change_kind(before: Dict[str, Any], status: Any) -> str:
+    """``closed`` for a change that closed the trade, otherwise ``updated``"""
+    closed = getattr(status, "value", status) == "closed"
+    return "closed" if closed and before.get("status") != "closed" else "updated"
+
+
+def event_values(
+    kind: str,
+    trade_id: int,
+    portfolio_id: int,
+    before: Optional[Dict[str, Any]],
+    after: Optional[Dict[str, Any]],
+    extra_changes: Optional[Dict[str, list]] = None
+) -> Optional[Dict[str, Any]]:
+    """
+    Row values for an event from the trade's state before and after it.
+
+    ``extra_changes`` records what changed besides the trade's own fields
+    (e.g. ``{"fill": [None, {...}]}``). Returns None for a change that
+    changed nothing, so no-op updates leave no trace.
+    """
+    changes = None
+    if before is not None and after is not None:
+        changes = {f: [before.get(f), after.get(f)] for f in TRACKED_FIELDS if before.get(f) != after.get(f)}
+        changes.update(jsonable_encoder(extra_changes or {}))
+        if not changes:
+            return None
+    return {
+        "trade_id": trade_id,
+        "portfolio_id": portfolio_id,
+        "kind": kind,
+        "changes": changes,
+        "state": after if after is not None else before,
+    }
+
+
+async def record_events(db: AsyncSession, values: Iterable[Optional[Dict[str, Any]]]) -> None:
+    """Append events with one INSERT; runs in the caller's transaction, which commits"""
+    rows = [v for v in values if v is not None]
+    if rows:
+        await db.execute(insert(TradeEvent), rows)
+
+
+async def record_event(
+    db: AsyncSession,
+    kind: str,
+    trade: Trade,
+    before: Optional[Dict[str, Any]],
+    extra_changes: Optional[Dict[str, list]] = None
+) -> None:
+    """Append one event for a trade whose current attributes are the new state"""
+    await record_events(
+        db, [event_values(kind, trade.id, trade.portfolio_id, before, trade_state(trade), extra_changes)]
+    )
+
+
+async def get_trade_history(db: AsyncSession, trade_id: int, portfolio_id: int) -> List[TradeEvent]:
+    """
+    Events of the trade that has (or last had) this id in the portfolio.
+
+    Databases created before trade ids stopped being reused can hold events
+    of an earlier, deleted trade with the same id, so only events from the
+    latest ``created`` event on are returned.
+    """
+    result = await db.execute(
+        select(TradeEvent)
+        .where(TradeEvent.trade_id == trade_id, TradeEvent.portfolio_id == portfolio_id)
+        .order_by(TradeEvent.id)
+    )
+    history = list(result.scalars().all())
+    created = [i for i, event in enumerate(history) if event.kind == "created"]
+    return history[created[-1]:] if created else history
+
+
+async def last_portfolio_id(db: AsyncSession, trade_id: int) -> Optional[int]:
+    """Portfolio of the latest event recorded for a trade id, e.g. of a deleted trade"""
+    result = await db.execute(
+        select(TradeEvent.portfolio_id).where(TradeEvent.trade_id == trade_id)
+        .order_by(TradeEvent.id.desc()).limit(1)
+    )
+    return result.scalar_one_or_none()
+
+
+async def last_event_id(db: AsyncSession, portfolio_id: int) -> int:
+    """Id of the portfolio's latest trade event: changes with every write to its trades"""
+    result = await db.execute(
+        select(func.coalesce(func.max(TradeEvent.id), 0)).where(TradeEvent.portfolio_id == portfolio_id)
+    )
+    return result.scalar_one()
@@ -1,9 +1,14 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func
-from app.models import User
+from sqlalchemy import select, delete, func, or_, and_
+from sqlalchemy.sql.elements import ColumnElement
+from app.models import User, Portfolio, Trade, Job
 from app.schemas.user import UserCreate, UserUpdate
 from app.auth.utils import get_password_hash
-from typing import Optional, List
+from app.crud.portfolio import delete_portfolio_rows
+from app.services.files import remove_files_async
+from app.services import shards
+from app.database import use_shard
+from typing import Optional, List, Dict, Any
 
 
 async def get_user_by_email(db: AsyncSession, email: str) -> Optional[User]:
@@ -21,11 +26,87 @@ async def get_user_by_id(db: AsyncSession, user_id: int) -> Optional[User]:
     return result.scalar_one_or_none()
 
 
-async def get_users(db: AsyncSession, skip: int = 0, limit: int = 100) -> List[User]:
-    result = await db.execute(select(User).offset(skip).limit(limit))
+def _prefix_match(column, prefix: str) -> ColumnElement:
+    """
+    Case-insensitive range comparison equivalent to ``column ILIKE 'prefix%'``.
+
+    LIKE can't use an index on SQLite (or on PostgreSQL outside the C
+    collation); a range on ``lower(column)`` uses the ``ix_users_*_lower``
+    expression indexes on both.
+    """
+    column, prefix = func.lower(column), prefix.lower()
+    return and_(column >= prefix, column < prefix + "\U0010ffff")
+
+
+async def get_users(
+    db: AsyncSession,
+    skip: int = 0,
+    limit: int = 100,
+    after_id: Optional[int] = None,
+    search: Optional[str] = None,
+    is_active: Optional[bool] = None
+) -> List[User]:
+    """
+    Users ordered by id.
+
+    Pass the last id of the previous page as ``after_id`` (keyset pagination);
+    ``skip`` is kept for older clients but gets slower the deeper it goes.
+    """
+    query = select(User)
+    if after_id is not None:
+        query = query.where(User.id > after_id)
+    if search:
+        query = query.where(or_(
+            _prefix_match(User.username, search),
+            _prefix_match(User.email, search)
+        ))
+    if is_active is not None:
+        query = query.where(User.is_active == is_active)
+    query = query.order_by(User.id).limit(limit)
+    if after_id is None and skip:
+        query = query.offset(skip)
+
+    result = await db.execute(query)
     return list(result.scalars().all())
 
 
+async def get_user_rollups(db: AsyncSession, user_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+    """Portfolio count, trade count and last activity per user, one grouped query per shard"""
+    if not user_ids:
+        return {}
+
+    result = await db.execute(select(User.id, User.shard).where(User.id.in_(user_ids)))
+    by_shard: Dict[Optional[int], List[int]] = {}
+    for user_id, shard in result:
+        by_shard.setdefault(shard, []).append(user_id)
+
+    last_trade_activity = func.max(func.coalesce(Trade.updated_at, Trade.created_at))
+    rollups = {}
+    for shard, shard_user_ids in by_shard.items():
+        with use_shard(shard):
+            result = await db.execute(
+                select(
+                    Portfolio.user_id,
+                    func.count(func.distinct(Portfolio.id)),
+                    func.count(Trade.id),
+                    last_trade_activity,
+                    func.max(func.coalesce(Portfolio.updated_at, Portfolio.created_at))
+                )
+                .outerjoin(Trade, Trade.portfolio_id == Portfolio.id)
+                .where(Portfolio.user_id.in_(shard_user_ids))
+                .group_by(Portfolio.user_id)
+            )
+
+        for user_id, portfolio_count, trade_count, last_trade, last_portfolio in result:
+            activity = [value for value in (last_trade, last_portfolio) if value is not None]
+            rollups[user_id] = {
+                "portfolio_count": portfolio_count,
+                "trade_count": trade_count,
+                "last_activity_at": max(activity) if activity else None,
+            }
+    return rollups
+
+
 async def get_user_count(db: AsyncSession) -> int:
     result = await db.execute(select(func.count(User.id)))
     return result.scalar_one()
@@ -41,6 +122,10 @@ async def create_user(db: AsyncSession, user: UserCreate, is_admin: bool = False
         is_admin=is_admin
     )
     db.add(db_user)
+    await db.flush()
+    # With sharding on, the user's shard gets its stub row before the user exists
+    db_user.shard = await shards.choose_shard(db, db_user.id)
+    await shards.add_user_to_shard(db_user)
     await db.commit()
     await db.refresh(db_user)
     return db_user
@@ -63,12 +148,22 @@ async def update_user(db: AsyncSession, user_id: int, user_update: UserUpdate) -
 
 
 async def delete_user(db: AsyncSession, user_id: int) -> bool:
-    result = await db.execute(select(User).where(User.id == user_id))
-    db_user = result.scalar_one_or_none()
-
-    if db_user is None:
+    """Delete a user with all portfolios, trades, fills and jobs in a few bulk statements"""
+    user = await db.scalar(select(User).where(User.id == user_id))
+    if user is None:
         return False
 
-    await db.delete(db_user)
+    with use_shard(user.shard):
+        files = await delete_portfolio_rows(db, Portfolio.user_id == user_id)
+        if user.shard is not None:
+            # The stub row in the shard; cascades whatever delete_portfolio_rows left
+            await db.execute(delete(User.__table__).where(User.__table__.c.id == user_id))
+    result = await db.execute(
+        select(Job.result_path).where(Job.user_id == user_id, Job.result_path.is_not(None))
+    )
+    files.extend(result.scalars())
+    await db.execute(delete(Job).where(Job.user_id == user_id).execution_options(synchronize_session=False))
+    await db.execute(delete(User).where(User.id == user_id).execution_options(synchronize_session=False))
     await db.commit()
+    await remove_files_async(files)
     return True
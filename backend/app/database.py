@@ -1,32 +1,149 @@
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
-from sqlalchemy.orm import declarative_base
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Dict, Iterator, Optional
+from sqlalchemy import event
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncEngine, AsyncSession, async_sessionmaker
+from sqlalchemy.orm import declarative_base, Session
+from sqlalchemy.pool import NullPool
 from app.config import get_settings
+from app.metrics import record_query, register_pool_metrics
+from app import query_log
 
-settings = get_settings()
+Base = declarative_base()
 
-engine = create_async_engine(
-    settings.DATABASE_URL,
-    echo=True,
-    future=True
-)
 
-AsyncSessionLocal = async_sessionmaker(
-    engine,
-    class_=AsyncSession,
-    expire_on_commit=False
-)
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    duration = time.perf_counter() - conn.info["query_start_time"].pop()
+    record_query(duration)
+    query_log.observe(statement, duration)
+
+
+def _enable_sqlite_foreign_keys(dbapi_connection, connection_record):
+    # SQLite ignores foreign keys (and so ON DELETE CASCADE) unless enabled per connection
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
+
+
+def _create_engine(url: str, **kwargs) -> AsyncEngine:
+    settings = get_settings()
+    engine = create_async_engine(url, echo=settings.SQL_ECHO, future=True, **kwargs)
+    event.listen(engine.sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine.sync_engine, "after_cursor_execute", _after_cursor_execute)
+    if engine.dialect.name == "sqlite":
+        event.listen(engine.sync_engine, "connect", _enable_sqlite_foreign_keys)
+    return engine
+
+
+@lru_cache()
+def get_engine() -> AsyncEngine:
+    """The application engine, created from settings on first use rather than at import"""
+    settings = get_settings()
+    engine = _create_engine(settings.DATABASE_URL)
+    register_pool_metrics(engine.pool)
+    query_log.configure(settings.SLOW_QUERY_THRESHOLD_MS)
+    return engine
+
+
+# Sharded storage (SHARDING=fixed or per_user): users, jobs and charge rates
+# live in the directory database (DATABASE_URL); each user's portfolios and
+# everything under them live in the user's shard (``users.shard``). Users
+# without a shard keep their data in the directory database.
+DIRECTORY_TABLES = frozenset({"users", "jobs", "charge_rates", "idempotency_keys"})
+
+# The shard of the user being served; set by ``get_current_user`` and the job runner
+current_shard: ContextVar[Optional[int]] = ContextVar("current_shard", default=None)
+
+_shard_engines: Dict[int, AsyncEngine] = {}
+
+
+def get_shard_engine(shard: int) -> AsyncEngine:
+    engine = _shard_engines.get(shard)
+    if engine is None:
+        settings = get_settings()
+        # One file per user can mean thousands of engines: don't keep idle connections for them
+        kwargs = {"poolclass": NullPool} if settings.SHARDING == "per_user" else {}
+        engine = _create_engine(settings.SHARD_URL_TEMPLATE.format(shard=shard), **kwargs)
+        _shard_engines[shard] = engine
+    return engine
 
-Base = declarative_base()
+
+def engine_for_shard(shard: Optional[int]) -> AsyncEngine:
+    return get_engine() if shard is None else get_shard_engine(shard)
+
+
+@contextmanager
+def use_shard(shard: Optional[int]) -> Iterator[None]:
+    """Route user-owned tables to ``shard`` (None: the directory database) inside the block"""
+    token = current_shard.set(shard)
+    try:
+        yield
+    finally:
+        current_shard.reset(token)
+
+
+def upsert(target):
+    """INSERT with ON CONFLICT clauses (SQLite and PostgreSQL; shards use the directory's dialect)"""
+    return (postgresql.insert if get_engine().dialect.name == "postgresql" else sqlite.insert)(target)
+
+
+class RoutingSession(Session):
+    """Sends directory tables to the directory database and everything else to the current shard"""
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        shard = current_shard.get()
+        if shard is None or (mapper is not None and mapper.local_table.name in DIRECTORY_TABLES):
+            return get_engine().sync_engine
+        return get_shard_engine(shard).sync_engine
+
+
+@lru_cache()
+def get_sessionmaker() -> async_sessionmaker:
+    return async_sessionmaker(
+        get_engine(),
+        class_=AsyncSession,
+        sync_session_class=RoutingSession,
+        expire_on_commit=False
+    )
 
 
 async def get_db():
-    async with AsyncSessionLocal() as session:
+    async with get_sessionmaker()() as session:
         try:
             yield session
         finally:
             await session.close()
 
 
+async def upgrade_database(engine: AsyncEngine) -> None:
+    from app.migrate import upgrade_schema
+
+    async with engine.connect() as conn:
+        await conn.run_sync(upgrade_schema)
+
+
 async def init_db():
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+    """Bring the schema of the directory database and every shard up to date (see ``app.migrate``)"""
+    await upgrade_database(get_engine())
+    from app.services.shards import known_shards, prepare_shard
+
+    for shard in await known_shards():
+        await prepare_shard(shard)
+
+
+async def dispose_engine():
+    """Close pooled connections; the next use creates a fresh engine from settings"""
+    if get_engine.cache_info().currsize:
+        await get_engine().dispose()
+    for engine in _shard_engines.values():
+        await engine.dispose()
+    _shard_engines.clear()
+    get_sessionmaker.cache_clear()
+    get_engine.cache_clear()
@@ -1,17 +1,57 @@
-from fastapi import FastAPI
+import asyncio
+import logging
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
-from app.database import init_db
-from app.routers import auth, users, portfolios, trades, analytics
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+from app.database import init_db, dispose_engine
+from app.routers import auth, users, portfolios, trades, analytics, prices, exports, jobs, charges, updates, profiles, risk
 from app.middleware.csrf import CSRFProtectMiddleware
+from app.middleware.metrics import MetricsMiddleware
+from app.middleware.profiling import ProfilingMiddleware
+from app.middleware.idempotency import IdempotencyMiddleware
+from app.metrics import monitor_event_loop_lag
+from app.services.price_store import get_price_store
+from app.services.jobs import get_job_runner
+from app.services.monte_carlo import shutdown_process_pool
+from app.config import get_settings
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Startup: Initialize database
-    await init_db()
+    # Make slow query and request summary logs visible under uvicorn
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    # Startup: Apply pending schema migrations
+    if get_settings().DB_AUTO_MIGRATE:
+        await init_db()
+    trades.UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+    # Pick up any price files dropped in while the server was down and load
+    # the latest-price cache; bad files are skipped, and nothing here may
+    # keep the API from starting
+    price_store = get_price_store()
+    try:
+        await asyncio.to_thread(price_store.ingest_directory)
+        await asyncio.to_thread(price_store.refresh)
+    except Exception:
+        logging.getLogger("app.prices").exception("Price ingest on startup failed")
+    price_refresher = asyncio.create_task(price_store.refresh_periodically())
+    lag_monitor = asyncio.create_task(monitor_event_loop_lag())
+    job_runner = get_job_runner()
+    await job_runner.start()
     yield
-    # Shutdown: Cleanup (if needed)
+    # Shutdown: Cleanup
+    await job_runner.stop()
+    shutdown_process_pool()
+    lag_monitor.cancel()
+    price_refresher.cancel()
+    await dispose_engine()
+
+
+def query_summary_mode() -> str:
+    settings = get_settings()
+    if settings.QUERY_SUMMARY == "header" and settings.ENVIRONMENT != "production":
+        return "header"
+    return "log"
 
 
 app = FastAPI(
@@ -21,6 +61,9 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+# Idempotency-Key replays (innermost, so replayed responses still get CORS and CSRF headers)
+app.add_middleware(IdempotencyMiddleware)
+
 # CORS middleware - Configure for production
 app.add_middleware(
     CORSMiddleware,
@@ -33,18 +76,35 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
-    expose_headers=["X-CSRF-Token"],  # Expose CSRF token header
+    expose_headers=["X-CSRF-Token", "X-Next-Cursor", "X-Profile-Id", "X-Risk-Warning", "Idempotent-Replayed"]  # Expose CSRF token, pagination, profile, risk and idempotency headers
+    + (["X-DB-Query-Count"] if query_summary_mode() == "header" else []),  # and query counts when enabled
 )
 
+# On-demand profiling of single requests (admin only, see app.middleware.profiling)
+app.add_middleware(ProfilingMiddleware)
+
 # CSRF Protection Middleware
 app.add_middleware(CSRFProtectMiddleware)
 
+# Prometheus metrics (outermost, so it times the full request)
+app.add_middleware(
+    MetricsMiddleware,
+    query_summary=query_summary_mode
+)
+
 # Include routers
 app.include_router(auth.router, prefix="/api")
 app.include_router(users.router, prefix="/api")
 app.include_router(portfolios.router, prefix="/api")
 app.include_router(trades.router, prefix="/api")
 app.include_router(analytics.router, prefix="/api")
+app.include_router(prices.router, prefix="/api")
+app.include_router(exports.router, prefix="/api")
+app.include_router(jobs.router, prefix="/api")
+app.include_router(charges.router, prefix="/api")
+app.include_router(updates.router, prefix="/api")
+app.include_router(profiles.router, prefix="/api")
+app.include_router(risk.router, prefix="/api")
 
 
 @app.get("/")
@@ -59,3 +119,8 @@ async def root():
 @app.get("/health")
 async def health_check():
     return {"status": "healthy"}
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
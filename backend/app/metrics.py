@@ -0,0 +1,114 @@
+"""
+Prometheus metrics.
+
+Request metrics are recorded by ``app.middleware.metrics.MetricsMiddleware``;
+database metrics by the SQLAlchemy engine hooks in ``app.database``, which
+add each statement to the ``QueryStats`` of the request being served.
+"""
+import asyncio
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Optional
+
+from prometheus_client import Counter, Gauge, Histogram
+from sqlalchemy.pool import QueuePool
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+
+REQUEST_COUNT = Counter(
+    "http_requests_total",
+    "HTTP requests by route and status code",
+    ["method", "route", "status"],
+)
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route",
+    ["method", "route"],
+    buckets=LATENCY_BUCKETS,
+)
+REQUESTS_IN_PROGRESS = Gauge(
+    "http_requests_in_progress",
+    "HTTP requests currently being served",
+    ["method"],
+)
+
+REQUEST_DB_QUERIES = Histogram(
+    "http_request_db_queries",
+    "Database queries issued per request",
+    ["method", "route"],
+    buckets=QUERY_COUNT_BUCKETS,
+)
+REQUEST_DB_DURATION = Histogram(
+    "http_request_db_duration_seconds",
+    "Time spent in database queries per request",
+    ["method", "route"],
+    buckets=LATENCY_BUCKETS,
+)
+DB_QUERY_DURATION = Histogram(
+    "db_query_duration_seconds",
+    "Duration of individual database statements",
+    buckets=LATENCY_BUCKETS,
+)
+
+DB_POOL_SIZE = Gauge("db_pool_size", "Configured size of the connection pool")
+DB_POOL_CHECKED_OUT = Gauge("db_pool_checked_out", "Connections currently checked out")
+DB_POOL_OVERFLOW = Gauge("db_pool_overflow", "Connections open beyond the pool size")
+
+EVENT_LOOP_LAG = Gauge("event_loop_lag_seconds", "Most recent event loop scheduling delay")
+EVENT_LOOP_LAG_HISTOGRAM = Histogram(
+    "event_loop_lag_seconds_distribution",
+    "Event loop scheduling delay",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0),
+)
+
+WS_CONNECTIONS = Gauge("websocket_connections", "Open WebSocket update connections")
+WS_MESSAGES_DROPPED = Counter(
+    "websocket_messages_dropped_total",
+    "Update messages discarded because a client fell behind",
+)
+
+ANALYTICS_CACHE_REQUESTS = Counter(
+    "analytics_cache_requests_total",
+    "Analytics requests by endpoint and outcome: hit (cached), coalesced (joined an in-flight run) or miss",
+    ["endpoint", "result"],
+)
+ANALYTICS_CACHE_ENTRIES = Gauge("analytics_cache_entries", "Analytics results held in the cache")
+
+
+@dataclass
+class QueryStats:
+    count: int = 0
+    duration: float = 0.0
+
+
+# Set per request by the metrics middleware; None outside of requests
+current_query_stats: ContextVar[Optional[QueryStats]] = ContextVar("current_query_stats", default=None)
+
+
+def record_query(duration: float) -> None:
+    DB_QUERY_DURATION.observe(duration)
+    stats = current_query_stats.get()
+    if stats is not None:
+        stats.count += 1
+        stats.duration += duration
+
+
+def register_pool_metrics(pool) -> None:
+    """Report pool usage at scrape time; pools that don't keep connections (NullPool) are skipped"""
+    if not isinstance(pool, QueuePool):
+        return
+    DB_POOL_SIZE.set_function(pool.size)
+    DB_POOL_CHECKED_OUT.set_function(pool.checkedout)
+    DB_POOL_OVERFLOW.set_function(lambda: max(pool.overflow(), 0))
+
+
+async def monitor_event_loop_lag(interval: float = 0.5) -> None:
+    """Measure how late the loop wakes a sleeping task; run as a background task"""
+    loop = asyncio.get_running_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(interval)
+        lag = max(loop.time() - start - interval, 0.0)
+        EVENT_LOOP_LAG.set(lag)
+        EVENT_LOOP_LAG_HISTOGRAM.observe(lag)
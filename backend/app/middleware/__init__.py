@@ -1,3 +1,4 @@
 from .csrf import CSRFProtectMiddleware, generate_csrf_token
+from .metrics import MetricsMiddleware
 
-__all__ = ["CSRFProtectMiddleware", "generate_csrf_token"]
+__all__ = ["CSRFProtectMiddleware", "generate_csrf_token", "MetricsMiddleware"]
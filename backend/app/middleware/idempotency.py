@@ -0,0 +1,176 @@
+import hashlib
+import logging
+import time
+from datetime import timedelta
+from typing import List, Optional, Tuple
+
+from fastapi.responses import JSONResponse
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.auth.utils import verify_token
+from app.config import get_settings
+from app.crud import idempotency as idempotency_crud
+from app.database import get_sessionmaker
+
+logger = logging.getLogger("app.idempotency")
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+MAX_KEY_LENGTH = 255
+
+# Expired records are deleted at most this often per process
+PURGE_INTERVAL_SECONDS = 3600
+
+# Set by the outer middlewares on every response; not part of what is replayed
+_NOT_STORED = {b"set-cookie", b"content-length"}
+
+
+def _token_user_id(headers: Headers) -> Optional[int]:
+    """User id of a valid bearer token; the endpoint itself still authenticates"""
+    scheme, _, token = headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    payload = verify_token(token)
+    try:
+        return int(payload["sub"]) if payload else None
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+async def _read_body(receive: Receive) -> bytes:
+    chunks = []
+    while True:
+        message = await receive()
+        if message["type"] != "http.request":
+            break
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body", False):
+            break
+    return b"".join(chunks)
+
+
+def _request_hash(scope: Scope, body: bytes) -> str:
+    digest = hashlib.sha256()
+    for part in (scope["method"].encode(), scope["path"].encode(), scope.get("query_string", b""), body):
+        digest.update(len(part).to_bytes(8, "big"))
+        digest.update(part)
+    return digest.hexdigest()
+
+
+class IdempotencyMiddleware:
+    """
+    Make POST requests safe to retry with an ``Idempotency-Key`` header
+
+    The first request with a key runs and its response (status, headers and
+    body) is stored; retries with the same key get that response back with
+    ``Idempotent-Replayed: true`` instead of running again. Keys are scoped
+    to the user of the bearer token and kept for ``IDEMPOTENCY_KEY_TTL_HOURS``.
+    A retry while the first request is still running gets 409, and reusing a
+    key for a different request (method, path, query or body) gets 422.
+    Server errors and responses over ``IDEMPOTENCY_MAX_RESPONSE_BYTES`` are
+    not stored, so retrying them runs the request again.
+
+    Requests without the header, other methods and requests without a valid
+    token pass straight through.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        settings = get_settings()
+        self.ttl = timedelta(hours=settings.IDEMPOTENCY_KEY_TTL_HOURS)
+        self.max_response_bytes = settings.IDEMPOTENCY_MAX_RESPONSE_BYTES
+        self._last_purge = 0.0
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] != "POST":
+            await self.app(scope, receive, send)
+            return
+        headers = Headers(scope=scope)
+        key = headers.get(IDEMPOTENCY_HEADER)
+        user_id = _token_user_id(headers) if key is not None else None
+        if user_id is None:
+            await self.app(scope, receive, send)
+            return
+        if not key or len(key) > MAX_KEY_LENGTH:
+            response = JSONResponse(
+                {"detail": f"{IDEMPOTENCY_HEADER} must be 1 to {MAX_KEY_LENGTH} characters"}, status_code=400
+            )
+            await response(scope, receive, send)
+            return
+
+        body = await _read_body(receive)
+        request_hash = _request_hash(scope, body)
+        async with get_sessionmaker()() as db:
+            existing = await idempotency_crud.claim_key(db, user_id, key, request_hash, self.ttl)
+            if time.monotonic() - self._last_purge > PURGE_INTERVAL_SECONDS:
+                self._last_purge = time.monotonic()
+                await idempotency_crud.purge_expired(db, self.ttl)
+
+        if existing is not None:
+            await self._replay(existing, request_hash, scope, receive, send)
+            return
+
+        body_sent = False
+
+        async def replay_receive() -> Message:
+            nonlocal body_sent
+            if not body_sent:
+                body_sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+
+        status_code: Optional[int] = None
+        stored_headers: List[Tuple[str, str]] = []
+        chunks: List[bytes] = []
+        size = 0
+
+        async def capture_send(message: Message) -> None:
+            nonlocal status_code, size
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                stored_headers.extend(
+                    (name.decode("latin-1"), value.decode("latin-1"))
+                    for name, value in message.get("headers", []) if name.lower() not in _NOT_STORED
+                )
+            elif message["type"] == "http.response.body" and size <= self.max_response_bytes:
+                chunk = message.get("body", b"")
+                size += len(chunk)
+                chunks.append(chunk)
+            await send(message)
+
+        completed = False
+        try:
+            await self.app(scope, replay_receive, capture_send)
+            if status_code is not None and status_code < 500 and size <= self.max_response_bytes:
+                async with get_sessionmaker()() as db:
+                    await idempotency_crud.complete_key(db, user_id, key, status_code, stored_headers, b"".join(chunks))
+                completed = True
+        finally:
+            if not completed:
+                try:
+                    async with get_sessionmaker()() as db:
+                        await idempotency_crud.release_key(db, user_id, key)
+                except Exception:
+                    logger.exception("Could not release idempotency key %r", key)
+
+    async def _replay(self, record, request_hash: str, scope: Scope, receive: Receive, send: Send) -> None:
+        if record.request_hash != request_hash:
+            response = JSONResponse(
+                {"detail": f"{IDEMPOTENCY_HEADER} was already used for a different request"}, status_code=422
+            )
+        elif record.status_code is None:
+            response = JSONResponse(
+                {"detail": f"A request with this {IDEMPOTENCY_HEADER} is still in progress"}, status_code=409
+            )
+        else:
+            body = record.response_body or b""
+            await send({
+                "type": "http.response.start",
+                "status": record.status_code,
+                "headers": [(name.encode("latin-1"), value.encode("latin-1")) for name, value in record.response_headers]
+                + [(b"content-length", str(len(body)).encode()), (REPLAYED_HEADER.lower().encode(), b"true")],
+            })
+            await send({"type": "http.response.body", "body": body})
+            return
+        await response(scope, receive, send)
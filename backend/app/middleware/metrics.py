@@ -0,0 +1,96 @@
+import time
+from typing import Callable, Dict, Optional, Union
+from starlette.routing import Match
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.query_log import log_request_summary
+from app.metrics import (
+    QueryStats,
+    current_query_stats,
+    REQUEST_COUNT,
+    REQUEST_LATENCY,
+    REQUESTS_IN_PROGRESS,
+    REQUEST_DB_QUERIES,
+    REQUEST_DB_DURATION,
+)
+
+UNMATCHED_ROUTE = "<unmatched>"
+
+QUERY_COUNT_HEADER = "X-DB-Query-Count"
+
+
+class MetricsMiddleware:
+    """
+    Prometheus request metrics as a plain ASGI middleware
+
+    Requests are labelled by route template (e.g. ``/api/trades/{trade_id}``)
+    rather than raw path to keep label cardinality bounded. The database query
+    count and time of each request are collected through ``current_query_stats``
+    and, depending on ``query_summary``, returned to the client as
+    ``X-DB-Query-Count`` and ``Server-Timing`` headers ("header") or written
+    as one log line per request ("log"). ``query_summary`` may be a callable,
+    which is resolved when the middleware stack is built rather than at import.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        excluded_paths: tuple = ("/metrics",),
+        query_summary: Union[str, Callable[[], Optional[str]], None] = None
+    ):
+        self.app = app
+        self.excluded_paths = set(excluded_paths)
+        self.query_summary = query_summary() if callable(query_summary) else query_summary
+        self._route_templates: Dict[Callable, str] = {}
+
+    def _route_template(self, scope: Scope) -> str:
+        # The router records the matched endpoint in the (shared) scope
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return UNMATCHED_ROUTE
+        template = self._route_templates.get(endpoint)
+        if template is None:
+            template = UNMATCHED_ROUTE
+            for route in scope["app"].router.routes:
+                if getattr(route, "endpoint", None) is endpoint and route.matches(scope)[0] == Match.FULL:
+                    template = route.path
+                    break
+            self._route_templates[endpoint] = template
+        return template
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"] in self.excluded_paths:
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status_code = 500
+        stats = QueryStats()
+        token = current_query_stats.set(stats)
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if self.query_summary == "header":
+                    headers = MutableHeaders(scope=message)
+                    headers[QUERY_COUNT_HEADER] = str(stats.count)
+                    headers.append("Server-Timing", f'db;desc="{stats.count} queries";dur={stats.duration * 1000:.1f}')
+            await send(message)
+
+        REQUESTS_IN_PROGRESS.labels(method).inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            REQUESTS_IN_PROGRESS.labels(method).dec()
+            current_query_stats.reset(token)
+
+            route = self._route_template(scope)
+            REQUEST_COUNT.labels(method, route, str(status_code)).inc()
+            REQUEST_LATENCY.labels(method, route).observe(elapsed)
+            REQUEST_DB_QUERIES.labels(method, route).observe(stats.count)
+            REQUEST_DB_DURATION.labels(method, route).observe(stats.duration)
+            if self.query_summary == "log":
+                log_request_summary(method, scope["path"], status_code, stats.count, stats.duration)
@@ -0,0 +1,123 @@
+import asyncio
+import logging
+import time
+from urllib.parse import parse_qs
+
+from fastapi import HTTPException, status
+from fastapi.responses import JSONResponse
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.config import get_settings
+from app.auth.dependencies import get_current_user, get_current_active_user, get_current_admin_user
+from app.database import get_sessionmaker
+from app.metrics import current_query_stats
+from app.services.profiling import get_profile_store, new_profile_id
+
+logger = logging.getLogger("app.profiling")
+
+PROFILE_HEADER = "X-Profile"
+PROFILE_QUERY_PARAM = "profile"
+PROFILE_ID_HEADER = "X-Profile-Id"
+
+_HEADER_KEY = PROFILE_HEADER.lower().encode("latin-1")
+_QUERY_MARKER = f"{PROFILE_QUERY_PARAM}=".encode("latin-1")
+
+_FLAG_VALUES = {"1", "true", "yes"}
+
+
+def profiling_requested(scope: Scope) -> bool:
+    """``X-Profile: 1`` header or ``?profile=1``; cheap enough to run on every request"""
+    for name, value in scope["headers"]:
+        if name == _HEADER_KEY:
+            return value.decode("latin-1").lower() in _FLAG_VALUES
+    query = scope.get("query_string", b"")
+    if _QUERY_MARKER not in query:
+        return False
+    values = parse_qs(query.decode("latin-1")).get(PROFILE_QUERY_PARAM, [])
+    return any(v.lower() in _FLAG_VALUES for v in values)
+
+
+async def _check_admin(scope: Scope) -> None:
+    """The same checks as ``get_current_admin_user``; raises its HTTPException"""
+    scheme, _, token = Headers(scope=scope).get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    async with get_sessionmaker()() as db:
+        user = await get_current_user(token=token, db=db)
+    await get_current_admin_user(await get_current_active_user(user))
+
+
+class ProfilingMiddleware:
+    """
+    Profile single requests on demand with pyinstrument
+
+    An admin adds ``X-Profile: 1`` (or ``?profile=1``) to a request; it is
+    sampled from the first middleware below this one to the last byte of the
+    response, so the report covers dependencies, the handler, SQL (as time
+    awaiting the driver), and Pydantic validation and serialization. Other
+    requests only pay for the flag check: the profiler isn't imported or
+    started for them. Non-admins asking for a profile get the 401/403 that
+    ``get_current_admin_user`` gives.
+
+    Only the request's own task is sampled; time spent in other requests
+    or in threads (e.g. ``asyncio.to_thread``) shows as awaiting.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        # Built with the middleware stack on the first request, not at import
+        self.interval = get_settings().PROFILE_INTERVAL_MS / 1000
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not profiling_requested(scope):
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            await _check_admin(scope)
+        except HTTPException as exc:
+            response = JSONResponse({"detail": exc.detail}, status_code=exc.status_code, headers=exc.headers)
+            await response(scope, receive, send)
+            return
+
+        from pyinstrument import Profiler
+
+        profile_id = new_profile_id()
+        status_code = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                MutableHeaders(scope=message)[PROFILE_ID_HEADER] = profile_id
+            await send(message)
+
+        # Set by the metrics middleware; the admin check's query is left out
+        stats = current_query_stats.get()
+        queries_before, db_before = (stats.count, stats.duration) if stats else (0, 0.0)
+        profiler = Profiler(interval=self.interval, async_mode="enabled")
+        start = time.perf_counter()
+        profiler.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            profiler.stop()
+            meta = {
+                "method": scope["method"],
+                "path": scope["path"],
+                "query": scope.get("query_string", b"").decode("latin-1"),
+                "status_code": status_code,
+                "duration_ms": round((time.perf_counter() - start) * 1000, 1),
+                "db_queries": stats.count - queries_before if stats else None,
+                "db_duration_ms": round((stats.duration - db_before) * 1000, 1) if stats else None,
+                "created_at": time.time(),
+            }
+            try:
+                await asyncio.to_thread(get_profile_store().save, profile_id, profiler.last_session, meta)
+            except Exception:
+                logger.exception("Could not save profile %s", profile_id)
@@ -0,0 +1,123 @@
+"""
+Schema migrations.
+
+The schema is managed by Alembic; revisions live in ``backend/migrations``.
+Databases created before migrations existed (by ``create_all``) have tables
+but no ``alembic_version``; they are stamped at the baseline revision first
+so the catch-up revision can bring them forward.
+
+Usage (from the backend directory):
+    python -m app.migrate                 # upgrade to the latest revision
+    python -m app.migrate current         # show the current revision
+    python -m app.migrate downgrade <rev>
+
+With sharded storage the directory database and every shard are migrated.
+
+The ``alembic`` command works as well, e.g. ``alembic revision --autogenerate``.
+"""
+import argparse
+from contextlib import contextmanager
+from pathlib import Path
+
+from alembic import command
+from alembic.config import Config
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from sqlalchemy import inspect
+from sqlalchemy.engine import Connection
+
+MIGRATIONS_DIR = Path(__file__).resolve().parent.parent / "migrations"
+BASELINE_REVISION = "0001_baseline"
+
+
+def alembic_config(connection: Connection = None) -> Config:
+    config = Config()
+    config.set_main_option("script_location", str(MIGRATIONS_DIR))
+    # env.py runs on this connection instead of opening its own
+    config.attributes["connection"] = connection
+    return config
+
+
+@contextmanager
+def foreign_keys_disabled(connection: Connection):
+    """
+    Turn off SQLite foreign key enforcement around a migration.
+
+    SQLite alters tables by copying them and dropping the original; with
+    enforcement on, that drop would cascade into (or be refused by) child
+    tables. The pragma is ignored inside a transaction, so callers commit
+    before this context exits.
+    """
+    if connection.dialect.name != "sqlite":
+        yield
+        return
+    connection.exec_driver_sql("PRAGMA foreign_keys=OFF")
+    try:
+        yield
+    finally:
+        connection.exec_driver_sql("PRAGMA foreign_keys=ON")
+
+
+def upgrade_schema(connection: Connection, revision: str = "head") -> None:
+    """Upgrade and commit on a connection; a no-op (one query) when already current"""
+    config = alembic_config(connection)
+    with foreign_keys_disabled(connection):
+        current = MigrationContext.configure(connection).get_current_revision()
+        if current is None and inspect(connection).has_table("users"):
+            command.stamp(config, BASELINE_REVISION)
+            current = BASELINE_REVISION
+
+        heads = ScriptDirectory.from_config(config).get_heads()
+        if revision != "head" or current not in heads:
+            command.upgrade(config, revision)
+        connection.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the database schema")
+    parser.add_argument("action", nargs="?", default="upgrade", choices=["upgrade", "downgrade", "current"])
+    parser.add_argument("revision", nargs="?", default="head")
+    args = parser.parse_args()
+
+    import asyncio
+    from app.database import get_engine, get_shard_engine, dispose_engine
+    from app.services.shards import ensure_shard_directory, known_shards
+
+    def run(connection: Connection):
+        if args.action == "upgrade":
+            upgrade_schema(connection, args.revision)
+        elif args.action == "downgrade":
+            with foreign_keys_disabled(connection):
+                command.downgrade(alembic_config(connection), args.revision)
+                connection.commit()
+        print(MigrationContext.configure(connection).get_current_revision())
+
+    def has_shards(connection: Connection) -> bool:
+        inspector = inspect(connection)
+        return inspector.has_table("users") and "shard" in {c["name"] for c in inspector.get_columns("users")}
+
+    async def run_shards():
+        async with get_engine().connect() as conn:
+            if not await conn.run_sync(has_shards):
+                return
+        for shard in await known_shards():
+            ensure_shard_directory(shard)
+            print(f"shard {shard}: ", end="")
+            async with get_shard_engine(shard).connect() as conn:
+                await conn.run_sync(run)
+
+    async def execute():
+        # Shards are listed from the directory, so they go down before it and up after it
+        if args.action == "downgrade":
+            await run_shards()
+        async with get_engine().connect() as conn:
+            await conn.run_sync(run)
+        if args.action != "downgrade":
+            await run_shards()
+        await dispose_engine()
+
+    asyncio.run(execute())
+
+
+if __name__ == "__main__":
+    main()
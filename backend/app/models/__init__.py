@@ -1,5 +1,17 @@
 from app.models.user import User
-from app.models.portfolio import Portfolio
-from app.models.trade import Trade, TradeType, TradeStatus
+from app.models.portfolio import Portfolio, CostBasisMethod
+from app.models.trade import Trade, TradeType, TradeStatus, TradeSegment
+from app.models.fill import Fill, FillSide
+from app.models.job import Job, JobStatus
+from app.models.charge_rate import ChargeRate
+from app.models.snapshot import PortfolioSnapshot
+from app.models.trade_event import TradeEvent, ProjectionCheckpoint
+from app.models.risk_rule import RiskRule, RiskRuleKind, RiskAction
+from app.models.idempotency_key import IdempotencyKey
 
-__all__ = ["User", "Portfolio", "Trade", "TradeType", "TradeStatus"]
+__all__ = [
+    "User", "Portfolio", "CostBasisMethod", "Trade", "TradeType", "TradeStatus",
+    "TradeSegment", "Fill", "FillSide", "Job", "JobStatus", "ChargeRate", "PortfolioSnapshot",
+    "TradeEvent", "ProjectionCheckpoint", "RiskRule", "RiskRuleKind", "RiskAction",
+    "IdempotencyKey",
+]
@@ -0,0 +1,27 @@
+from sqlalchemy import Column, Integer, Float, DateTime, Enum
+from sqlalchemy.sql import func
+from app.database import Base
+from app.models.trade import TradeSegment
+
+
+class ChargeRate(Base):
+    """Charge rates for one segment; segments without a row use the built-in defaults"""
+    __tablename__ = "charge_rates"
+
+    id = Column(Integer, primary_key=True, index=True)
+    segment = Column(Enum(TradeSegment), unique=True, nullable=False)
+
+    # Percentages of order value unless noted
+    brokerage_percentage = Column(Float, nullable=False)
+    brokerage_flat_per_order = Column(Float, nullable=False)
+    brokerage_max_per_order = Column(Float, nullable=False)
+    stt_buy_percentage = Column(Float, nullable=False)
+    stt_sell_percentage = Column(Float, nullable=False)
+    exchange_percentage = Column(Float, nullable=False)
+    sebi_percentage = Column(Float, nullable=False)
+    stamp_duty_buy_percentage = Column(Float, nullable=False)
+    dp_charge_per_sell = Column(Float, nullable=False)
+    gst_percentage = Column(Float, nullable=False)
+
+    # Metadata
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
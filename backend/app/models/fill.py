@@ -0,0 +1,30 @@
+from sqlalchemy import Column, Integer, Float, DateTime, ForeignKey, Enum
+from sqlalchemy.orm import relationship
+from sqlalchemy.sql import func
+import enum
+from app.database import Base
+from app.models.types import Price
+
+
+class FillSide(str, enum.Enum):
+    BUY = "buy"
+    SELL = "sell"
+
+
+class Fill(Base):
+    __tablename__ = "fills"
+
+    id = Column(Integer, primary_key=True, index=True)
+    trade_id = Column(Integer, ForeignKey("trades.id", ondelete="CASCADE"), nullable=False, index=True)
+
+    # Execution details
+    side = Column(Enum(FillSide), nullable=False)
+    price = Column(Price(), nullable=False)
+    quantity = Column(Float, nullable=False)
+    executed_at = Column(DateTime(timezone=True), nullable=False)
+
+    # Metadata
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    # Relationships
+    trade = relationship("Trade", back_populates="fills")
@@ -0,0 +1,28 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, JSON, LargeBinary, UniqueConstraint
+from app.database import Base
+
+
+class IdempotencyKey(Base):
+    """
+    A POST made with an ``Idempotency-Key`` header and the response it got.
+
+    Claimed before the request runs (``status_code`` is NULL while it is in
+    flight) so a concurrent retry can't run it twice, then completed with the
+    response that is replayed to later retries (see
+    ``app.middleware.idempotency``).
+    """
+    __tablename__ = "idempotency_keys"
+    __table_args__ = (UniqueConstraint("user_id", "key", name="uq_idempotency_keys_user_key"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    key = Column(String(255), nullable=False)
+    # SHA-256 of method, path, query and body; a key can't be reused for another request
+    request_hash = Column(String(64), nullable=False)
+
+    status_code = Column(Integer, nullable=True)
+    response_headers = Column(JSON, nullable=True)
+    response_body = Column(LargeBinary, nullable=True)
+
+    created_at = Column(DateTime(timezone=True), nullable=False, index=True)
+    completed_at = Column(DateTime(timezone=True), nullable=True)
@@ -0,0 +1,49 @@
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Enum, Boolean, Text, JSON
+from sqlalchemy.orm import relationship
+from sqlalchemy.sql import func
+import enum
+from app.database import Base
+
+
+class JobStatus(str, enum.Enum):
+    PENDING = "pending"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+
+class Job(Base):
+    __tablename__ = "jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+
+    # What to run
+    kind = Column(String, nullable=False)
+    params = Column(JSON, nullable=False, default=dict)
+
+    # Progress
+    status = Column(Enum(JobStatus), default=JobStatus.PENDING, nullable=False, index=True)
+    progress = Column(Float, default=0.0, nullable=False)
+    message = Column(String, nullable=True)
+    cancel_requested = Column(Boolean, default=False, nullable=False)
+
+    # Outcome
+    result = Column(JSON, nullable=True)
+    result_path = Column(String, nullable=True)  # File produced by the job, e.g. an export
+    error = Column(Text, nullable=True)
+
+    # Metadata
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+    # Renewed by the process running the job; a stale one means that process is gone
+    heartbeat_at = Column(DateTime(timezone=True), nullable=True)
+
+    # Relationships
+    owner = relationship("User", back_populates="jobs")
+
+    @property
+    def has_file(self) -> bool:
+        return self.result_path is not None
@@ -1,7 +1,15 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Enum
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
+import enum
 from app.database import Base
+from app.models.types import Money
+
+
+class CostBasisMethod(str, enum.Enum):
+    FIFO = "fifo"
+    LIFO = "lifo"
+    AVERAGE = "average"
 
 
 class Portfolio(Base):
@@ -10,11 +18,12 @@ class Portfolio(Base):
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, nullable=False)
     description = Column(String, nullable=True)
-    initial_balance = Column(Float, default=0.0)
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    initial_balance = Column(Money(), default=0.0)
+    cost_basis_method = Column(Enum(CostBasisMethod), default=CostBasisMethod.FIFO, nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
     # Relationships
     owner = relationship("User", back_populates="portfolios")
-    trades = relationship("Trade", back_populates="portfolio", cascade="all, delete-orphan")
+    trades = relationship("Trade", back_populates="portfolio", cascade="all, delete-orphan", passive_deletes=True)
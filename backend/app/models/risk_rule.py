@@ -0,0 +1,30 @@
+from sqlalchemy import Column, Integer, Float, DateTime, ForeignKey, Enum, UniqueConstraint
+from sqlalchemy.sql import func
+import enum
+from app.database import Base
+
+
+class RiskRuleKind(str, enum.Enum):
+    MAX_DAILY_LOSS = "max_daily_loss"
+    MAX_OPEN_POSITIONS = "max_open_positions"
+    MAX_SYMBOL_EXPOSURE = "max_symbol_exposure"
+    MAX_TRADES_PER_DAY = "max_trades_per_day"
+
+
+class RiskAction(str, enum.Enum):
+    WARN = "warn"
+    REJECT = "reject"
+
+
+class RiskRule(Base):
+    """One discipline rule of a portfolio, checked when trades are entered or closed (see ``app.services.risk``)"""
+    __tablename__ = "risk_rules"
+    __table_args__ = (UniqueConstraint("portfolio_id", "kind", name="uq_risk_rules_portfolio_kind"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    portfolio_id = Column(Integer, ForeignKey("portfolios.id", ondelete="CASCADE"), nullable=False)
+    kind = Column(Enum(RiskRuleKind), nullable=False)
+    # Rupees for loss and exposure (at cost), a count for the others
+    limit = Column(Float, nullable=False)
+    action = Column(Enum(RiskAction), default=RiskAction.REJECT, nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
@@ -0,0 +1,20 @@
+from sqlalchemy import Column, Integer, Date, ForeignKey, UniqueConstraint
+from app.database import Base
+from app.models.types import Money
+
+
+class PortfolioSnapshot(Base):
+    """Portfolio value at the close of one IST trading day (see ``app.services.nav``)"""
+    __tablename__ = "portfolio_snapshots"
+    __table_args__ = (UniqueConstraint("portfolio_id", "day", name="uq_portfolio_snapshots_portfolio_day"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    portfolio_id = Column(Integer, ForeignKey("portfolios.id", ondelete="CASCADE"), nullable=False)
+    day = Column(Date, nullable=False)
+
+    # Cumulative realized P&L (net of charges) and mark-to-market of open positions
+    realized_profit_loss = Column(Money(), nullable=False)
+    unrealized_profit_loss = Column(Money(), nullable=False)
+    open_positions = Column(Integer, nullable=False)
+    cash = Column(Money(), nullable=False)
+    nav = Column(Money(), nullable=False)
@@ -1,8 +1,9 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Text, Enum
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Text, Enum, UniqueConstraint
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 import enum
 from app.database import Base
+from app.models.types import Money, Price
 
 
 class TradeType(str, enum.Enum):
@@ -15,30 +16,55 @@ class TradeStatus(str, enum.Enum):
     CLOSED = "closed"
 
 
+class TradeSegment(str, enum.Enum):
+    INTRADAY = "intraday"
+    DELIVERY = "delivery"
+    FUTURES = "futures"
+    OPTIONS = "options"
+
+
 class Trade(Base):
     __tablename__ = "trades"
+    # Broker order/trade ids are unique per portfolio; trades entered by hand have none.
+    # Ids are never reused on SQLite either, since trade history outlives the trade.
+    __table_args__ = (
+        UniqueConstraint("portfolio_id", "external_id", name="uq_trades_portfolio_external_id"),
+        {"sqlite_autoincrement": True},
+    )
 
     id = Column(Integer, primary_key=True, index=True)
-    portfolio_id = Column(Integer, ForeignKey("portfolios.id"), nullable=False)
+    portfolio_id = Column(Integer, ForeignKey("portfolios.id", ondelete="CASCADE"), nullable=False, index=True)
 
     # Trade details
     symbol = Column(String, nullable=False, index=True)
     trade_type = Column(Enum(TradeType), nullable=False)
+    segment = Column(Enum(TradeSegment), default=TradeSegment.DELIVERY, nullable=False)
     status = Column(Enum(TradeStatus), default=TradeStatus.OPEN)
 
     # Entry details
-    entry_price = Column(Float, nullable=False)
+    entry_price = Column(Price(), nullable=False)
     entry_date = Column(DateTime(timezone=True), nullable=False)
     quantity = Column(Float, nullable=False)
 
     # Exit details (nullable for open trades)
-    exit_price = Column(Float, nullable=True)
+    exit_price = Column(Price(), nullable=True)
     exit_date = Column(DateTime(timezone=True), nullable=True)
 
+    # Remaining position for multi-fill trades (NULL means the full entry is open)
+    open_quantity = Column(Float, nullable=True)
+    open_avg_price = Column(Price(), nullable=True)
+
     # P&L
-    profit_loss = Column(Float, nullable=True)
+    profit_loss = Column(Money(), nullable=True)
     profit_loss_percentage = Column(Float, nullable=True)
 
+    # Transaction charges (STT, fees, GST, stamp duty) and P&L after them
+    charges = Column(Money(), nullable=True)
+    net_profit_loss = Column(Money(), nullable=True)
+
+    # Broker order/trade id, so re-imports don't create duplicates
+    external_id = Column(String(128), nullable=True)
+
     # Additional info
     notes = Column(Text, nullable=True)
     tags = Column(String, nullable=True)  # Comma-separated tags
@@ -50,3 +76,10 @@ class Trade(Base):
 
     # Relationships
     portfolio = relationship("Portfolio", back_populates="trades")
+    fills = relationship(
+        "Fill",
+        back_populates="trade",
+        cascade="all, delete-orphan",
+        passive_deletes=True,
+        order_by="Fill.executed_at"
+    )
@@ -0,0 +1,32 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, JSON
+from sqlalchemy.sql import func
+from app.database import Base
+
+
+class TradeEvent(Base):
+    """
+    One change to a trade, appended in the transaction that made it.
+
+    ``changes`` maps each changed field to ``[old, new]``; ``state`` is the
+    trade's fields after the change (before it, for deletions). Rows are never
+    updated, and outlive the trade so deletions stay auditable; they go away
+    only with the portfolio.
+    """
+    __tablename__ = "trade_events"
+
+    id = Column(Integer, primary_key=True, index=True)
+    trade_id = Column(Integer, nullable=False, index=True)
+    portfolio_id = Column(Integer, ForeignKey("portfolios.id", ondelete="CASCADE"), nullable=False, index=True)
+    kind = Column(String, nullable=False)
+    changes = Column(JSON, nullable=True)
+    state = Column(JSON, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class ProjectionCheckpoint(Base):
+    """Last trade event a derived-state projection has applied (see ``app.services.replay``)"""
+    __tablename__ = "projection_checkpoints"
+
+    name = Column(String, primary_key=True)
+    last_event_id = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
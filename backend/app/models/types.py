@@ -0,0 +1,79 @@
+"""
+Fixed-point column types for money and prices.
+
+Values are stored as integers in a fixed number of decimal places (paise for
+money, 1/10000 of a rupee for prices) so the database adds them exactly:
+``SUM`` over an integer column has no float drift however many rows it
+covers. Python code keeps working with floats; binding rounds half-up to the
+column's scale, and results come back as the nearest float to the exact
+stored value.
+"""
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Any, Optional
+
+from sqlalchemy import BigInteger
+from sqlalchemy.types import TypeDecorator
+
+MONEY_SCALE = 2
+PRICE_SCALE = 4
+
+
+def to_decimal(value: Any) -> Decimal:
+    """A float as the decimal it was written as (``0.1`` is ``Decimal("0.1")``, not its binary value)"""
+    return value if isinstance(value, Decimal) else Decimal(repr(float(value)))
+
+
+def quantize(value: Any, scale: int = MONEY_SCALE) -> Decimal:
+    """Round half-up to ``scale`` decimal places"""
+    return to_decimal(value).quantize(Decimal(1).scaleb(-scale), rounding=ROUND_HALF_UP)
+
+
+def round_money(value: Any) -> Optional[float]:
+    """A value as it will be stored in a ``Money`` column"""
+    return None if value is None else float(quantize(value, MONEY_SCALE))
+
+
+def round_price(value: Any) -> Optional[float]:
+    """A value as it will be stored in a ``Price`` column"""
+    return None if value is None else float(quantize(value, PRICE_SCALE))
+
+
+class ScaledInteger(TypeDecorator):
+    """A decimal amount stored as an integer count of ``10 ** -scale`` units"""
+    impl = BigInteger
+    cache_ok = True
+
+    def __init__(self, scale: int):
+        super().__init__()
+        self.scale = scale
+        self.factor = 10 ** scale
+
+    def process_bind_param(self, value: Any, dialect) -> Optional[int]:
+        if value is None:
+            return None
+        return int(quantize(value, self.scale).scaleb(self.scale))
+
+    def process_result_value(self, value: Any, dialect) -> Optional[float]:
+        if value is None:
+            return None
+        if isinstance(value, int):
+            # Correctly rounded: int / int is exact before the final rounding to float
+            return value / self.factor
+        # Aggregates that aren't integers (AVG, or NUMERIC sums on PostgreSQL)
+        return float(Decimal(value).scaleb(-self.scale))
+
+
+class Money(ScaledInteger):
+    """Rupee amount stored in paise"""
+    cache_ok = True
+
+    def __init__(self):
+        super().__init__(MONEY_SCALE)
+
+
+class Price(ScaledInteger):
+    """Price stored in 1/10000 rupee ticks, fine enough for option premiums and averaged costs"""
+    cache_ok = True
+
+    def __init__(self):
+        super().__init__(PRICE_SCALE)
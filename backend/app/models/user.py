@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.database import Base
@@ -14,8 +14,16 @@ class User(Base):
     full_name = Column(String, nullable=True)
     is_active = Column(Boolean, default=True)
     is_admin = Column(Boolean, default=False)
+    # Database holding the user's portfolios when sharding is on (see app.database); NULL: the directory
+    shard = Column(Integer, nullable=True, index=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
     # Relationships
-    portfolios = relationship("Portfolio", back_populates="owner", cascade="all, delete-orphan")
+    portfolios = relationship("Portfolio", back_populates="owner", cascade="all, delete-orphan", passive_deletes=True)
+    jobs = relationship("Job", back_populates="owner", cascade="all, delete-orphan", passive_deletes=True)
+
+
+# Case-insensitive prefix search (see app.crud.user.get_users)
+Index("ix_users_username_lower", func.lower(User.username))
+Index("ix_users_email_lower", func.lower(User.email))
@@ -0,0 +1,99 @@
+"""
+Slow query logging and query budgets.
+
+Every statement is timed by the engine hooks in ``app.database``. Statements
+slower than ``SLOW_QUERY_THRESHOLD_MS`` are logged with their normalized SQL
+(literals replaced by ``?``), and ``query_budget`` lets tests fail when an
+endpoint issues more queries than it should:
+
+    with query_budget(3):
+        client.get(f"/api/trades/portfolio/{portfolio_id}")
+"""
+import logging
+import re
+import threading
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Iterator, List, Optional, Tuple
+
+logger = logging.getLogger("app.sql")
+request_logger = logging.getLogger("app.requests")
+
+_slow_threshold: Optional[float] = None
+_budget_lock = threading.Lock()
+_budgets: List[List[Tuple[str, float]]] = []
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER = re.compile(r"(?:\$\d+|%\(\w+\)s|(?<!:):\w+|%s)")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def configure(slow_threshold_ms: Optional[float]) -> None:
+    """Set the slow query threshold; None or a negative value disables the log"""
+    global _slow_threshold
+    if slow_threshold_ms is None or slow_threshold_ms < 0:
+        _slow_threshold = None
+    else:
+        _slow_threshold = slow_threshold_ms / 1000
+
+
+@lru_cache(maxsize=1024)
+def normalize_sql(statement: str) -> str:
+    """Replace literals and bind parameters with ``?`` and collapse whitespace"""
+    sql = _STRING_LITERAL.sub("?", statement)
+    sql = _PLACEHOLDER.sub("?", sql)
+    sql = _NUMBER_LITERAL.sub("?", sql)
+    sql = _IN_LIST.sub("(?...)", sql)
+    return _WHITESPACE.sub(" ", sql).strip()
+
+
+def observe(statement: str, duration: float) -> None:
+    """Called by the engine hooks after each statement"""
+    if _slow_threshold is not None and duration >= _slow_threshold:
+        logger.warning("Slow query (%.1f ms): %s", duration * 1000, normalize_sql(statement))
+    if _budgets:
+        with _budget_lock:
+            for captured in _budgets:
+                captured.append((statement, duration))
+
+
+def log_request_summary(method: str, path: str, status_code: int, count: int, duration: float) -> None:
+    request_logger.info(
+        "%s %s %s db_queries=%d db_time_ms=%.1f",
+        method, path, status_code, count, duration * 1000
+    )
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+@contextmanager
+def query_budget(max_queries: int, max_duration_ms: Optional[float] = None) -> Iterator[List[Tuple[str, float]]]:
+    """
+    Fail if the block issues more than ``max_queries`` statements.
+
+    Statements are captured process-wide, so this also works when the app runs
+    on another thread (e.g. under ``TestClient``). Yields the captured
+    ``(statement, duration)`` list for further assertions.
+    """
+    captured: List[Tuple[str, float]] = []
+    with _budget_lock:
+        _budgets.append(captured)
+    try:
+        yield captured
+    finally:
+        with _budget_lock:
+            _budgets.remove(captured)
+
+    total_ms = sum(duration for _, duration in captured) * 1000
+    problems = []
+    if len(captured) > max_queries:
+        problems.append(f"{len(captured)} queries issued, budget is {max_queries}")
+    if max_duration_ms is not None and total_ms > max_duration_ms:
+        problems.append(f"{total_ms:.1f} ms spent in queries, budget is {max_duration_ms} ms")
+    if problems:
+        statements = "\n".join(f"  {normalize_sql(s)}" for s, _ in captured)
+        raise QueryBudgetExceeded("; ".join(problems) + "\n" + statements)
@@ -1,13 +1,19 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+import asyncio
+import numpy as np
+from datetime import date
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from pydantic import ValidationError
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, and_
-from typing import Dict, Any
+from typing import Dict, Any, Literal, Optional
 from app.database import get_db
-from app.models import Trade, Portfolio
-from app.models.trade import TradeStatus
 from app.crud import portfolio as portfolio_crud
+from app.crud import analytics as analytics_crud
+from app.crud import snapshot as snapshot_crud
 from app.auth.dependencies import get_current_active_user
 from app.models import User
+from app.schemas.analytics import MonteCarloParams, WhatIfRequest
+from app.services.monte_carlo import MAX_SIMULATIONS, MAX_TRADES, SimulationConfig, simulate, get_process_pool
+from app.services import concentration, what_if
 
 router = APIRouter(prefix="/analytics", tags=["analytics"])
 
@@ -36,128 +42,162 @@ async def get_portfolio_analytics(
 ):
     """Get comprehensive analytics for a portfolio"""
     portfolio = await verify_portfolio_ownership(portfolio_id, current_user.id, db)
-
-    # Get all closed trades for calculations
-    result = await db.execute(
-        select(Trade).where(
-            and_(
-                Trade.portfolio_id == portfolio_id,
-                Trade.status == TradeStatus.CLOSED
-            )
-        )
+    return await analytics_crud.cached(
+        db, "portfolio", portfolio, lambda session: analytics_crud.get_portfolio_analytics(session, portfolio)
     )
-    closed_trades = list(result.scalars().all())
-
-    # Calculate statistics
-    total_trades = len(closed_trades)
-    if total_trades == 0:
-        return {
-            "portfolio_id": portfolio_id,
-            "portfolio_name": portfolio.name,
-            "total_trades": 0,
-            "total_profit_loss": 0.0,
-            "win_rate": 0.0,
-            "average_profit_loss": 0.0,
-            "best_trade": None,
-            "worst_trade": None,
-            "total_wins": 0,
-            "total_losses": 0,
-            "average_win": 0.0,
-            "average_loss": 0.0,
-            "profit_factor": 0.0,
-        }
-
-    total_pl = sum(t.profit_loss or 0 for t in closed_trades)
-    winning_trades = [t for t in closed_trades if (t.profit_loss or 0) > 0]
-    losing_trades = [t for t in closed_trades if (t.profit_loss or 0) <= 0]
-
-    total_wins = len(winning_trades)
-    total_losses = len(losing_trades)
-    win_rate = (total_wins / total_trades) * 100 if total_trades > 0 else 0
-
-    avg_pl = total_pl / total_trades if total_trades > 0 else 0
-    avg_win = sum(t.profit_loss for t in winning_trades) / total_wins if total_wins > 0 else 0
-    avg_loss = sum(t.profit_loss for t in losing_trades) / total_losses if total_losses > 0 else 0
-
-    # Profit factor: total wins / abs(total losses)
-    total_win_amount = sum(t.profit_loss for t in winning_trades)
-    total_loss_amount = abs(sum(t.profit_loss for t in losing_trades))
-    profit_factor = total_win_amount / total_loss_amount if total_loss_amount > 0 else 0
-
-    # Best and worst trades
-    best_trade = max(closed_trades, key=lambda t: t.profit_loss or 0)
-    worst_trade = min(closed_trades, key=lambda t: t.profit_loss or 0)
-
-    return {
-        "portfolio_id": portfolio_id,
-        "portfolio_name": portfolio.name,
-        "total_trades": total_trades,
-        "total_profit_loss": round(total_pl, 2),
-        "win_rate": round(win_rate, 2),
-        "average_profit_loss": round(avg_pl, 2),
-        "best_trade": {
-            "id": best_trade.id,
-            "symbol": best_trade.symbol,
-            "profit_loss": round(best_trade.profit_loss or 0, 2),
-        },
-        "worst_trade": {
-            "id": worst_trade.id,
-            "symbol": worst_trade.symbol,
-            "profit_loss": round(worst_trade.profit_loss or 0, 2),
-        },
-        "total_wins": total_wins,
-        "total_losses": total_losses,
-        "average_win": round(avg_win, 2),
-        "average_loss": round(avg_loss, 2),
-        "profit_factor": round(profit_factor, 2),
-    }
 
 
 @router.get("/portfolio/{portfolio_id}/by-symbol", response_model=Dict[str, Any])
 async def get_analytics_by_symbol(
     portfolio_id: int,
+    sort_by: Literal[analytics_crud.SYMBOL_SORT_KEYS] = "profit_loss",
+    order: Literal["asc", "desc"] = "desc",
+    skip: int = Query(0, ge=0),
+    limit: Optional[int] = Query(None, ge=0, le=1000, description="Symbols per page (default: all)"),
+    prefix: Optional[str] = Query(None, min_length=1, max_length=64, description="Symbol prefix"),
+    top: Optional[int] = Query(None, ge=1, le=100, description="Also return the N highest symbols by sort_by"),
+    bottom: Optional[int] = Query(None, ge=1, le=100, description="Also return the N lowest symbols by sort_by"),
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
-    """Get analytics grouped by trading symbol"""
-    await verify_portfolio_ownership(portfolio_id, current_user.id, db)
-
-    # Get all closed trades
-    result = await db.execute(
-        select(Trade).where(
-            and_(
-                Trade.portfolio_id == portfolio_id,
-                Trade.status == TradeStatus.CLOSED
-            )
-        )
+    """Get analytics grouped by trading symbol, sorted and optionally paginated"""
+    portfolio = await verify_portfolio_ownership(portfolio_id, current_user.id, db)
+    params = dict(
+        sort_by=sort_by, descending=order == "desc", skip=skip, limit=limit, prefix=prefix, top=top, bottom=bottom
+    )
+    return await analytics_crud.cached(
+        db, "by_symbol", portfolio,
+        lambda session: analytics_crud.get_analytics_by_symbol(session, portfolio_id, **params),
+        tuple(params.items())
     )
-    closed_trades = list(result.scalars().all())
-
-    # Group by symbol
-    symbol_stats = {}
-    for trade in closed_trades:
-        symbol = trade.symbol
-        if symbol not in symbol_stats:
-            symbol_stats[symbol] = {
-                "symbol": symbol,
-                "total_trades": 0,
-                "total_profit_loss": 0.0,
-                "wins": 0,
-                "losses": 0,
-            }
-
-        symbol_stats[symbol]["total_trades"] += 1
-        symbol_stats[symbol]["total_profit_loss"] += trade.profit_loss or 0
-        if (trade.profit_loss or 0) > 0:
-            symbol_stats[symbol]["wins"] += 1
-        else:
-            symbol_stats[symbol]["losses"] += 1
-
-    # Calculate win rates
-    for symbol in symbol_stats:
-        total = symbol_stats[symbol]["total_trades"]
-        wins = symbol_stats[symbol]["wins"]
-        symbol_stats[symbol]["win_rate"] = round((wins / total) * 100, 2) if total > 0 else 0
-        symbol_stats[symbol]["total_profit_loss"] = round(symbol_stats[symbol]["total_profit_loss"], 2)
-
-    return {"symbols": list(symbol_stats.values())}
+
+
+@router.get("/portfolio/{portfolio_id}/concentration", response_model=Dict[str, Any])
+async def get_symbol_concentration(
+    portfolio_id: int,
+    top_k: int = Query(20, ge=2, le=200, description="Symbols in the correlation matrix and drawdown breakdown"),
+    top_n: int = Query(5, ge=1, le=100, description="Symbols counted in top_n_share"),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Concentration of realized P&L across symbols, their daily P&L correlation and drawdown contributions"""
+    portfolio = await verify_portfolio_ownership(portfolio_id, current_user.id, db)
+
+    async def compute(session: AsyncSession) -> Dict[str, Any]:
+        columns = await analytics_crud.get_closed_trade_pl_columns(session, portfolio_id)
+        return {"portfolio_id": portfolio_id, **concentration.analyze(*columns, top_k=top_k, top_n=top_n)}
+
+    return await analytics_crud.cached(db, "concentration", portfolio, compute, (top_k, top_n))
+
+
+@router.get("/portfolio/{portfolio_id}/nav", response_model=Dict[str, Any])
+async def get_nav_series(
+    portfolio_id: int,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Daily NAV, cash, realized/unrealized P&L and open positions at each IST trading day close"""
+    portfolio = await verify_portfolio_ownership(portfolio_id, current_user.id, db)
+    if start and end and start > end:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="start must not be after end"
+        )
+    points = await snapshot_crud.get_nav_series(db, portfolio, start, end)
+    return {"portfolio_id": portfolio_id, "initial_balance": portfolio.initial_balance, "points": points}
+
+
+@router.get("/portfolio/{portfolio_id}/returns", response_model=Dict[str, Any])
+async def get_period_returns(
+    portfolio_id: int,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Month-, year- and financial-year-to-date returns from the daily NAV"""
+    portfolio = await verify_portfolio_ownership(portfolio_id, current_user.id, db)
+    return await snapshot_crud.get_period_returns(db, portfolio)
+
+
+@router.get("/portfolio/{portfolio_id}/monte-carlo", response_model=Dict[str, Any])
+async def get_monte_carlo_simulation(
+    portfolio_id: int,
+    simulations: int = Query(1000, ge=1, le=MAX_SIMULATIONS),
+    trades: Optional[int] = Query(None, ge=1, le=MAX_TRADES, description="Trades per simulation (default: realized count)"),
+    method: Literal["bootstrap", "shuffle"] = "bootstrap",
+    position_fraction: float = Query(1.0, gt=0, le=10, description="Fraction of equity committed per trade"),
+    ruin_threshold: float = Query(0.5, gt=0, le=1, description="Drawdown from starting equity counted as ruin"),
+    seed: Optional[int] = Query(None, ge=0),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Bootstrap or reshuffle closed-trade returns into equity, drawdown and ruin distributions"""
+    portfolio = await verify_portfolio_ownership(portfolio_id, current_user.id, db)
+    try:
+        params = MonteCarloParams(
+            simulations=simulations,
+            trades=trades,
+            method=method,
+            position_fraction=position_fraction,
+            ruin_threshold=ruin_threshold,
+            seed=seed
+        )
+    except ValidationError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=e.errors(include_url=False, include_context=False)
+        )
+    returns = await analytics_crud.get_closed_trade_returns(db, portfolio_id)
+    config = SimulationConfig(starting_equity=portfolio.initial_balance or 1.0, **params.model_dump())
+    try:
+        result = await asyncio.to_thread(simulate, returns, config, get_process_pool())
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    return {"portfolio_id": portfolio_id, **result}
+
+
+@router.post("/portfolio/{portfolio_id}/what-if", response_model=Dict[str, Any])
+async def get_sizing_what_if(
+    portfolio_id: int,
+    request: WhatIfRequest,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Replay closed trades from the initial balance under alternative position sizing rules"""
+    portfolio = await verify_portfolio_ownership(portfolio_id, current_user.id, db)
+    entry_price, exit_price, is_long, actual_pl = await analytics_crud.get_closed_trade_arrays(db, portfolio_id)
+    if len(entry_price) == 0:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Portfolio has no closed trades to replay"
+        )
+
+    initial_balance = portfolio.initial_balance or 0.0
+    if initial_balance <= 0 and any(rule.rule != what_if.FIXED_QUANTITY for rule in request.rules):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Equity-based sizing rules need a portfolio with a positive initial balance"
+        )
+    actual_equity = initial_balance + np.cumsum(actual_pl)
+    variants = [
+        what_if.replay(
+            entry_price, exit_price, is_long, initial_balance,
+            what_if.SizingRule(**rule.model_dump()), request.curve_points
+        )
+        for rule in request.rules
+    ]
+    return {
+        "portfolio_id": portfolio_id,
+        "initial_balance": initial_balance,
+        "trades": len(entry_price),
+        "actual": {
+            "final_equity": round(float(actual_equity[-1]), 2),
+            "total_profit_loss": round(float(actual_pl.sum()), 2),
+            "equity_curve": what_if.sample_curve(actual_equity, request.curve_points),
+        },
+        "variants": variants,
+    }
@@ -9,7 +9,6 @@ from app.auth.utils import verify_password, create_access_token
 from app.auth.dependencies import get_current_active_user
 from app.config import get_settings
 
-settings = get_settings()
 router = APIRouter(prefix="/auth", tags=["auth"])
 
 
@@ -62,7 +61,7 @@ async def login(
             detail="Inactive user"
         )
 
-    access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+    access_token_expires = timedelta(minutes=get_settings().ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
         data={"sub": str(user.id)}, expires_delta=access_token_expires
     )
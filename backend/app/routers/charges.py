@@ -0,0 +1,43 @@
+from fastapi import APIRouter, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+from dataclasses import asdict
+from typing import Dict, Any
+from app.database import get_db
+from app.schemas.charges import ChargeRates, ChargeRatesUpdate
+from app.schemas.job import JobCreate
+from app.models.trade import TradeSegment
+from app.crud import charges as charges_crud
+from app.crud import job as job_crud
+from app.services.jobs import get_job_runner
+from app.auth.dependencies import get_current_active_user, get_current_admin_user
+from app.models import User
+
+router = APIRouter(prefix="/charges", tags=["charges"])
+
+
+@router.get("/rates", response_model=Dict[TradeSegment, ChargeRates])
+async def get_charge_rates(
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Get the charge rate table of every segment"""
+    tables = await charges_crud.get_rate_tables(db)
+    return {segment: asdict(table) for segment, table in tables.items()}
+
+
+@router.put("/rates/{segment}", response_model=Dict[str, Any])
+async def update_charge_rates(
+    segment: TradeSegment,
+    rates_update: ChargeRatesUpdate,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_admin_user)
+):
+    """Update a segment's rates and recompute affected trades in the background (admin only)"""
+    table = await charges_crud.update_rate_table(db, segment, rates_update)
+    job = await job_crud.create_job(
+        db,
+        job=JobCreate(kind="recompute_charges", params={"segment": segment.value}),
+        user_id=current_user.id
+    )
+    get_job_runner().enqueue(job.id)
+    return {"segment": segment, "rates": asdict(table), "job_id": job.id}
@@ -0,0 +1,52 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Literal, Optional
+from app.database import get_db
+from app.models.trade import TradeStatus
+from app.crud import portfolio as portfolio_crud
+from app.auth.dependencies import get_current_active_user
+from app.models import User
+from app.services.export import EXPORTERS, MEDIA_TYPES, build_export_query, export_filename
+
+router = APIRouter(prefix="/exports", tags=["exports"])
+
+
+@router.get("/trades")
+async def export_trades(
+    format: Literal["csv", "xlsx", "parquet"] = "csv",
+    portfolio_id: Optional[int] = None,
+    financial_year: Optional[int] = Query(
+        None, ge=2000, le=2100, description="Starting year, e.g. 2024 for FY2024-25"
+    ),
+    trade_status: Optional[TradeStatus] = Query(None, alias="status"),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Stream trades of one or all of the user's portfolios as CSV, XLSX or Parquet"""
+    if portfolio_id is not None:
+        portfolio = await portfolio_crud.get_portfolio_by_id(db, portfolio_id=portfolio_id)
+        if not portfolio:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Portfolio not found"
+            )
+        if portfolio.user_id != current_user.id:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Not authorized to access this portfolio"
+            )
+
+    query = build_export_query(
+        current_user.id,
+        portfolio_id=portfolio_id,
+        financial_year=financial_year,
+        status=trade_status
+    )
+
+    filename = export_filename(portfolio_id, financial_year, format)
+    return StreamingResponse(
+        EXPORTERS[format](query),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
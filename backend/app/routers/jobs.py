@@ -0,0 +1,137 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import FileResponse
+from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from pathlib import Path
+from app.database import get_db
+from app.schemas.job import Job, JobCreate
+from app.models.job import JobStatus
+from app.crud import job as job_crud
+from app.crud import portfolio as portfolio_crud
+from app.services.jobs import HANDLERS, get_job_runner
+from app.services.export import MEDIA_TYPES
+from app.services import job_handlers  # noqa: F401 - registers the job kinds
+from app.auth.dependencies import get_current_active_user
+from app.models import User
+
+router = APIRouter(prefix="/jobs", tags=["jobs"])
+
+
+async def get_owned_job(job_id: int, user_id: int, db: AsyncSession):
+    """Helper function to fetch a job belonging to the user"""
+    job = await job_crud.get_job_by_id(db, job_id=job_id)
+    if not job or job.user_id != user_id:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Job not found"
+        )
+    return job
+
+
+@router.post("", response_model=Job, status_code=status.HTTP_202_ACCEPTED)
+async def submit_job(
+    job: JobCreate,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Queue a background job and return immediately; poll it with GET /jobs/{id}"""
+    spec = HANDLERS.get(job.kind)
+    if spec is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown job kind. Available: {', '.join(sorted(HANDLERS))}"
+        )
+    if spec.admin_only and not current_user.is_admin:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough permissions"
+        )
+
+    if spec.params is not None:
+        try:
+            spec.params.model_validate(job.params)
+        except ValidationError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=e.errors(include_url=False, include_context=False)
+            )
+
+    portfolio_id = job.params.get("portfolio_id")
+    if portfolio_id is not None:
+        portfolio = await portfolio_crud.get_portfolio_by_id(db, portfolio_id=portfolio_id)
+        if not portfolio:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Portfolio not found"
+            )
+        if portfolio.user_id != current_user.id:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Not authorized to access this portfolio"
+            )
+
+    db_job = await job_crud.create_job(db, job=job, user_id=current_user.id)
+    get_job_runner().enqueue(db_job.id)
+    return db_job
+
+
+@router.get("", response_model=List[Job])
+async def get_jobs(
+    job_status: Optional[JobStatus] = Query(None, alias="status"),
+    limit: int = Query(50, ge=1, le=500),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """List the user's most recent jobs"""
+    return await job_crud.get_user_jobs(db, user_id=current_user.id, status=job_status, limit=limit)
+
+
+@router.get("/{job_id}", response_model=Job)
+async def get_job(
+    job_id: int,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Get a job's status, progress and result"""
+    return await get_owned_job(job_id, current_user.id, db)
+
+
+@router.post("/{job_id}/cancel", response_model=Job)
+async def cancel_job(
+    job_id: int,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Cancel a pending or running job"""
+    job = await get_owned_job(job_id, current_user.id, db)
+    if job.status not in (JobStatus.PENDING, JobStatus.RUNNING):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Job is already {job.status.value}"
+        )
+    job = await job_crud.request_cancel(db, job)
+    get_job_runner().cancel_local(job.id)
+    return job
+
+
+@router.get("/{job_id}/download")
+async def download_job_result(
+    job_id: int,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Download the file produced by a finished job (e.g. an export)"""
+    job = await get_owned_job(job_id, current_user.id, db)
+    if job.status != JobStatus.SUCCEEDED or not job.result_path or not Path(job.result_path).exists():
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Job has no file to download"
+        )
+    filename = (job.result or {}).get("filename", Path(job.result_path).name)
+    suffix = Path(job.result_path).suffix.lstrip(".")
+    return FileResponse(
+        job.result_path,
+        media_type=MEDIA_TYPES.get(suffix, "application/octet-stream"),
+        filename=filename
+    )
@@ -6,6 +6,7 @@ from app.schemas.portfolio import Portfolio, PortfolioCreate, PortfolioUpdate
 from app.crud import portfolio as portfolio_crud
 from app.auth.dependencies import get_current_active_user
 from app.models import User
+from app.services.lot_matching import OverfillError
 
 router = APIRouter(prefix="/portfolios", tags=["portfolios"])
 
@@ -76,9 +77,16 @@ async def update_portfolio(
             detail="Not authorized to modify this portfolio"
         )
 
-    updated_portfolio = await portfolio_crud.update_portfolio(
-        db, portfolio_id=portfolio_id, portfolio_update=portfolio_update
-    )
+    try:
+        updated_portfolio = await portfolio_crud.update_portfolio(
+            db, portfolio_id=portfolio_id, portfolio_update=portfolio_update
+        )
+    except OverfillError as e:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     return updated_portfolio
 
 
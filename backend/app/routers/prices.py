@@ -0,0 +1,30 @@
+import asyncio
+from fastapi import APIRouter, Depends, Query
+from typing import Dict, Any
+from app.auth.dependencies import get_current_active_user, get_current_admin_user
+from app.models import User
+from app.services.price_store import get_price_store
+
+router = APIRouter(prefix="/prices", tags=["prices"])
+
+
+@router.get("/latest", response_model=Dict[str, Any])
+async def get_latest_prices(
+    symbols: str = Query(..., description="Comma-separated symbols"),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Get the latest stored price for each symbol"""
+    requested = [s.strip().upper() for s in symbols.split(",") if s.strip()]
+    prices = get_price_store().latest_prices(requested)
+    return {
+        "prices": {
+            symbol: (price if price == price else None)
+            for symbol, price in zip(requested, prices.tolist())
+        }
+    }
+
+
+@router.post("/ingest", response_model=Dict[str, Any])
+async def ingest_prices(current_user: User = Depends(get_current_admin_user)):
+    """Ingest new CSV files from the price directory (admin only)"""
+    return await asyncio.to_thread(get_price_store().ingest_directory)
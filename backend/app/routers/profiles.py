@@ -0,0 +1,34 @@
+import asyncio
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import FileResponse
+from typing import Any, Dict, List
+from app.auth.dependencies import get_current_admin_user
+from app.models import User
+from app.services.profiling import PROFILE_FORMATS, get_profile_store
+
+router = APIRouter(prefix="/profiles", tags=["profiles"])
+
+
+@router.get("", response_model=List[Dict[str, Any]])
+async def get_profiles(current_user: User = Depends(get_current_admin_user)):
+    """Stored request profiles, newest first (admin only)"""
+    return await asyncio.to_thread(get_profile_store().list)
+
+
+@router.get("/{profile_id}")
+async def download_profile(
+    profile_id: str,
+    format: str = Query("speedscope", pattern=f"^({'|'.join(PROFILE_FORMATS)})$"),
+    current_user: User = Depends(get_current_admin_user)
+):
+    """Download a profile as speedscope JSON or an HTML flame view (admin only)"""
+    path = get_profile_store().path(profile_id, format)
+    if path is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Profile not found"
+        )
+    suffix, media_type = PROFILE_FORMATS[format]
+    # HTML opens in the browser; speedscope JSON downloads for https://www.speedscope.app
+    filename = None if format == "html" else f"profile_{profile_id}{suffix}"
+    return FileResponse(path, media_type=media_type, filename=filename)
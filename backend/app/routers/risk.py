@@ -0,0 +1,62 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List
+from app.database import get_db
+from app.crud import portfolio as portfolio_crud
+from app.crud import risk as risk_crud
+from app.auth.dependencies import get_current_active_user
+from app.models import User
+from app.schemas.risk import RiskRule, RiskRuleSet, RiskStatus
+
+router = APIRouter(prefix="/portfolios", tags=["risk"])
+
+
+async def verify_portfolio_ownership(portfolio_id: int, user_id: int, db: AsyncSession):
+    """Helper function to verify user owns the portfolio"""
+    portfolio = await portfolio_crud.get_portfolio_by_id(db, portfolio_id=portfolio_id)
+    if not portfolio:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Portfolio not found"
+        )
+    if portfolio.user_id != user_id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not authorized to access this portfolio"
+        )
+    return portfolio
+
+
+@router.get("/{portfolio_id}/risk-rules", response_model=List[RiskRule])
+async def get_risk_rules(
+    portfolio_id: int,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Risk rules checked when trades of the portfolio are entered or closed"""
+    await verify_portfolio_ownership(portfolio_id, current_user.id, db)
+    return await risk_crud.get_rules(db, portfolio_id=portfolio_id)
+
+
+@router.put("/{portfolio_id}/risk-rules", response_model=List[RiskRule])
+async def replace_risk_rules(
+    portfolio_id: int,
+    rule_set: RiskRuleSet,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Replace the portfolio's risk rules; an empty list turns checks off"""
+    await verify_portfolio_ownership(portfolio_id, current_user.id, db)
+    async with risk_crud.portfolio_lock(portfolio_id):
+        return await risk_crud.replace_rules(db, portfolio_id=portfolio_id, rules=rule_set.rules)
+
+
+@router.get("/{portfolio_id}/risk", response_model=RiskStatus)
+async def get_risk_status(
+    portfolio_id: int,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Today's (IST) risk counters and the rules already at their limit"""
+    await verify_portfolio_ownership(portfolio_id, current_user.id, db)
+    return await risk_crud.get_risk_status(db, portfolio_id=portfolio_id)
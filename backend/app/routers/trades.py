@@ -1,22 +1,49 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, Response, status, UploadFile, File
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 from pathlib import Path
 import shutil
 from datetime import datetime
 from app.database import get_db
-from app.schemas.trade import Trade, TradeCreate, TradeUpdate, TradeClose
+from app.schemas.trade import Trade, TradeCreate, TradeUpdate, TradeClose, TradeBatch, TradeBatchResult
+from app.schemas.fill import Fill, FillCreate, LotMatch, RematchResult
+from app.schemas.charges import ChargeBreakdown, ChargeRecomputeResult
+from app.schemas.trade_event import TradeEvent
 from app.models.trade import TradeStatus
+from app.models.portfolio import CostBasisMethod
 from app.crud import trade as trade_crud
+from app.crud import fill as fill_crud
 from app.crud import portfolio as portfolio_crud
+from app.crud import charges as charges_crud
+from app.crud import trade_event as trade_event_crud
+from app.crud import risk as risk_crud
+from app.services.lot_matching import OverfillError
+from app.services.risk import RiskRuleViolation, Violation
+from app.services.pnl import mark_to_market
+from app.services.price_store import get_price_store
 from app.auth.dependencies import get_current_active_user
 from app.models import User
 
 router = APIRouter(prefix="/trades", tags=["trades"])
 
-# Create uploads directory if it doesn't exist
+# Created at startup (see the lifespan in app.main)
 UPLOAD_DIR = Path("uploads/screenshots")
-UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+
+RISK_WARNING_HEADER = "X-Risk-Warning"
+
+
+def mark_open_trades(trades: List) -> None:
+    """Attach last price and unrealized P&L to open trades in one vectorized pass"""
+    open_trades = [t for t in trades if t.status == TradeStatus.OPEN]
+    if open_trades:
+        prices = get_price_store().latest_prices(t.symbol for t in open_trades)
+        mark_to_market(open_trades, prices)
+
+
+def add_risk_warnings(response: Response, warnings: List[Violation]) -> None:
+    """One header per broken ``warn`` rule"""
+    for warning in warnings:
+        response.headers.append(RISK_WARNING_HEADER, f"{warning.kind.value}: {warning.message}")
 
 
 async def verify_portfolio_ownership(portfolio_id: int, user_id: int, db: AsyncSession):
@@ -45,18 +72,90 @@ async def get_portfolio_trades(
     """Get all trades for a portfolio"""
     await verify_portfolio_ownership(portfolio_id, current_user.id, db)
     trades = await trade_crud.get_portfolio_trades(db, portfolio_id=portfolio_id, status=status)
+    mark_open_trades(trades)
     return trades
 
 
+@router.post("/portfolio/{portfolio_id}/rematch", response_model=RematchResult)
+async def rematch_portfolio(
+    portfolio_id: int,
+    method: Optional[CostBasisMethod] = None,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Re-match the fills of every position in a portfolio; a given method becomes the portfolio's"""
+    portfolio = await verify_portfolio_ownership(portfolio_id, current_user.id, db)
+    method = method or portfolio.cost_basis_method
+    try:
+        updated = await fill_crud.rematch_portfolio(db, portfolio_id=portfolio_id, method=method)
+    except OverfillError as e:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    return {"portfolio_id": portfolio_id, "method": method, "trades_updated": updated}
+
+
+@router.post("/portfolio/{portfolio_id}/recompute-charges", response_model=ChargeRecomputeResult)
+async def recompute_portfolio_charges(
+    portfolio_id: int,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Recompute charges and net P&L of every realized trade in a portfolio"""
+    await verify_portfolio_ownership(portfolio_id, current_user.id, db)
+    updated = await charges_crud.recompute_charges(db, portfolio_id=portfolio_id)
+    return {"portfolio_id": portfolio_id, "trades_updated": updated}
+
+
 @router.post("/", response_model=Trade, status_code=status.HTTP_201_CREATED)
 async def create_trade(
     trade: TradeCreate,
+    response: Response,
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
-    """Create a new trade"""
+    """
+    Create a new trade; the portfolio's risk rules may reject it or add warnings.
+
+    A trade with an ``external_id`` the portfolio already has is returned
+    as it is (200) instead of being created again.
+    """
     await verify_portfolio_ownership(trade.portfolio_id, current_user.id, db)
-    return await trade_crud.create_trade(db, trade=trade)
+    if trade.external_id is not None:
+        existing = await trade_crud.get_trade_by_external_id(db, trade.portfolio_id, trade.external_id)
+        if existing is not None:
+            response.status_code = status.HTTP_200_OK
+            return existing
+    async with risk_crud.portfolio_lock(trade.portfolio_id):
+        try:
+            check = await risk_crud.check_entry(db, trade=trade)
+        except RiskRuleViolation as e:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail={"message": "Trade rejected by risk rules", "violations": [vars(v) for v in e.violations]}
+            )
+        created_trade, created = await trade_crud.create_trade(db, trade=trade)
+        if created:
+            add_risk_warnings(response, await risk_crud.finish_check(db, check, created_trade))
+        else:
+            # Imported concurrently under the same external id
+            response.status_code = status.HTTP_200_OK
+    return created_trade
+
+
+@router.post("/batch", response_model=TradeBatchResult)
+async def apply_trade_batch(
+    batch: TradeBatch,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Close, update or delete many trades in one request; each operation reports its own status"""
+    results = await trade_crud.apply_batch(db, user_id=current_user.id, operations=batch.operations)
+    mark_open_trades([item["trade"] for item in results if item["trade"] is not None])
+    failed = sum(1 for item in results if item["status_code"] >= 400)
+    return {"succeeded": len(results) - failed, "failed": failed, "results": results}
 
 
 @router.get("/{trade_id}", response_model=Trade)
@@ -75,9 +174,38 @@ async def get_trade(
 
     # Verify ownership through portfolio
     await verify_portfolio_ownership(trade.portfolio_id, current_user.id, db)
+    mark_open_trades([trade])
     return trade
 
 
+@router.get("/{trade_id}/charges", response_model=ChargeBreakdown)
+async def get_trade_charges(
+    trade_id: int,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Itemized charges (brokerage, STT, exchange, SEBI, stamp duty, DP, GST) for a trade"""
+    trade = await trade_crud.get_trade_by_id(db, trade_id=trade_id)
+    if not trade:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Trade not found"
+        )
+
+    # Verify ownership through portfolio
+    await verify_portfolio_ownership(trade.portfolio_id, current_user.id, db)
+    tables = await charges_crud.get_rate_tables(db)
+    breakdown = charges_crud.trade_charge_breakdown(trade, tables)
+    net = trade.profit_loss - breakdown["total"] if trade.profit_loss is not None else None
+    return {
+        "trade_id": trade.id,
+        "segment": trade.segment,
+        **breakdown,
+        "profit_loss": trade.profit_loss,
+        "net_profit_loss": net,
+    }
+
+
 @router.patch("/{trade_id}", response_model=Trade)
 async def update_trade(
     trade_id: int,
@@ -104,10 +232,11 @@ async def update_trade(
 async def close_trade(
     trade_id: int,
     trade_close: TradeClose,
+    response: Response,
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
-    """Close a trade and calculate P&L"""
+    """Close a trade and calculate P&L; risk rules only warn on closes"""
     trade = await trade_crud.get_trade_by_id(db, trade_id=trade_id)
     if not trade:
         raise HTTPException(
@@ -124,10 +253,134 @@ async def close_trade(
             detail="Trade is already closed"
         )
 
-    closed_trade = await trade_crud.close_trade(db, trade_id=trade_id, trade_close=trade_close)
+    async with risk_crud.portfolio_lock(trade.portfolio_id):
+        check = await risk_crud.check_close(db, trade=trade)
+        closed_trade = await trade_crud.close_trade(db, trade_id=trade_id, trade_close=trade_close)
+        add_risk_warnings(response, await risk_crud.finish_check(db, check, closed_trade))
     return closed_trade
 
 
+@router.get("/{trade_id}/history", response_model=List[TradeEvent])
+async def get_trade_history(
+    trade_id: int,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Every recorded change to a trade, oldest first; still available after the trade is deleted"""
+    trade = await trade_crud.get_trade_by_id(db, trade_id=trade_id)
+    if trade is not None:
+        portfolio_id = trade.portfolio_id
+    else:
+        portfolio_id = await trade_event_crud.last_portfolio_id(db, trade_id=trade_id)
+    if portfolio_id is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Trade not found"
+        )
+
+    # Verify ownership through portfolio
+    await verify_portfolio_ownership(portfolio_id, current_user.id, db)
+    return await trade_event_crud.get_trade_history(db, trade_id=trade_id, portfolio_id=portfolio_id)
+
+
+@router.get("/{trade_id}/fills", response_model=List[Fill])
+async def get_trade_fills(
+    trade_id: int,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Get the fills of a trade in execution order"""
+    trade = await trade_crud.get_trade_by_id(db, trade_id=trade_id)
+    if not trade:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Trade not found"
+        )
+
+    # Verify ownership through portfolio
+    await verify_portfolio_ownership(trade.portfolio_id, current_user.id, db)
+    return await fill_crud.get_trade_fills(db, trade_id=trade_id)
+
+
+@router.post("/{trade_id}/fills", response_model=Trade, status_code=status.HTTP_201_CREATED)
+async def add_trade_fill(
+    trade_id: int,
+    fill: FillCreate,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Add a scale-in or partial exit fill and recalculate the position"""
+    trade = await trade_crud.get_trade_by_id(db, trade_id=trade_id)
+    if not trade:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Trade not found"
+        )
+
+    # Verify ownership through portfolio
+    await verify_portfolio_ownership(trade.portfolio_id, current_user.id, db)
+
+    try:
+        return await fill_crud.add_fill(db, trade=trade, fill=fill)
+    except OverfillError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+
+@router.delete("/{trade_id}/fills/{fill_id}", response_model=Trade)
+async def delete_trade_fill(
+    trade_id: int,
+    fill_id: int,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Remove a fill and recalculate the position"""
+    trade = await trade_crud.get_trade_by_id(db, trade_id=trade_id)
+    if not trade:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Trade not found"
+        )
+
+    # Verify ownership through portfolio
+    await verify_portfolio_ownership(trade.portfolio_id, current_user.id, db)
+
+    try:
+        updated_trade = await fill_crud.delete_fill(db, trade=trade, fill_id=fill_id)
+    except OverfillError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    if updated_trade is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Fill not found"
+        )
+    return updated_trade
+
+
+@router.get("/{trade_id}/lots", response_model=List[LotMatch])
+async def get_trade_lots(
+    trade_id: int,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Get realized P&L per matched lot using the portfolio's cost basis method"""
+    trade = await trade_crud.get_trade_by_id(db, trade_id=trade_id)
+    if not trade:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Trade not found"
+        )
+
+    # Verify ownership through portfolio
+    await verify_portfolio_ownership(trade.portfolio_id, current_user.id, db)
+    return await fill_crud.get_trade_lots(db, trade=trade)
+
+
 @router.post("/{trade_id}/screenshot")
 async def upload_screenshot(
     trade_id: int,
@@ -164,10 +417,7 @@ async def upload_screenshot(
     with open(file_path, "wb") as buffer:
         shutil.copyfileobj(file.file, buffer)
 
-    # Update trade with screenshot path
-    from app.schemas.trade import TradeUpdate
-    trade_update = TradeUpdate(screenshot_path=str(file_path))
-    await trade_crud.update_trade(db, trade_id=trade_id, trade_update=trade_update)
+    await trade_crud.set_screenshot(db, trade, str(file_path))
 
     return {"filename": filename, "path": str(file_path)}
 
@@ -0,0 +1,83 @@
+import asyncio
+from typing import Optional
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Query, status
+from sqlalchemy import select
+from app.auth.utils import verify_token
+from app.config import get_settings
+from app.database import get_sessionmaker
+from app.models import User
+from app.services.events import ConnectionLimitExceeded, get_event_broker
+
+router = APIRouter(tags=["updates"])
+
+
+async def _authenticate(token: Optional[str]) -> Optional[User]:
+    """The active user a bearer token belongs to, or None"""
+    payload = verify_token(token) if token else None
+    if payload is None:
+        return None
+    try:
+        user_id = int(payload.get("sub"))
+    except (TypeError, ValueError):
+        return None
+    # Short-lived session: nothing is held open for the life of the connection
+    async with get_sessionmaker()() as db:
+        user = (await db.execute(select(User).where(User.id == user_id))).scalar_one_or_none()
+    return user if user is not None and user.is_active else None
+
+
+async def _wait_for_disconnect(websocket: WebSocket) -> None:
+    # Clients don't send anything; reading is how a closed connection is noticed
+    try:
+        while True:
+            await websocket.receive_text()
+    except WebSocketDisconnect:
+        pass
+
+
+@router.websocket("/ws")
+async def updates(websocket: WebSocket, token: Optional[str] = Query(None)):
+    """
+    Push trade and portfolio changes of the authenticated user.
+
+    Browsers cannot set headers on WebSockets, so the access token is passed
+    as the ``token`` query parameter. Messages are JSON objects with a
+    ``type`` of ``trade.created``, ``trade.updated``, ``trade.closed``,
+    ``trade.deleted``, ``portfolio.stats``, ``portfolio.refresh`` or
+    ``resync``.
+    """
+    user = await _authenticate(token)
+    if user is None:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    broker = get_event_broker()
+    try:
+        subscription = broker.subscribe(user.id)
+    except ConnectionLimitExceeded:
+        await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER)
+        return
+
+    send_timeout = get_settings().WS_SEND_TIMEOUT_SECONDS
+    disconnected = None
+    try:
+        await websocket.accept()
+        disconnected = asyncio.create_task(_wait_for_disconnect(websocket))
+        while True:
+            next_message = asyncio.create_task(subscription.get())
+            await asyncio.wait({next_message, disconnected}, return_when=asyncio.FIRST_COMPLETED)
+            if disconnected.done():
+                next_message.cancel()
+                break
+            try:
+                await asyncio.wait_for(websocket.send_text(next_message.result()), send_timeout)
+            except asyncio.TimeoutError:
+                # A client that can't take a small message in time is dropped;
+                # returning lets the server close the connection
+                break
+    except WebSocketDisconnect:
+        pass
+    finally:
+        broker.unsubscribe(subscription)
+        if disconnected is not None:
+            disconnected.cancel()
@@ -1,8 +1,8 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List
+from typing import List, Optional
 from app.database import get_db
-from app.schemas.user import User, UserUpdate
+from app.schemas.user import User, UserSummary, UserUpdate
 from app.crud import user as user_crud
 from app.auth.dependencies import get_current_admin_user
 from app.models import User as UserModel
@@ -10,16 +10,34 @@ from app.models import User as UserModel
 router = APIRouter(prefix="/users", tags=["users"])
 
 
-@router.get("", response_model=List[User])
+@router.get("", response_model=List[UserSummary])
 async def get_all_users(
-    skip: int = 0,
-    limit: int = 100,
+    response: Response,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    after_id: Optional[int] = Query(None, description="Last user id of the previous page"),
+    search: Optional[str] = Query(None, min_length=1, description="Username or email prefix"),
+    is_active: Optional[bool] = None,
+    include_stats: bool = Query(False, description="Add portfolio/trade counts and last activity"),
     db: AsyncSession = Depends(get_db),
     current_user: UserModel = Depends(get_current_admin_user)
 ):
     """Get all users (admin only)"""
-    users = await user_crud.get_users(db, skip=skip, limit=limit)
-    return users
+    users = await user_crud.get_users(
+        db, skip=skip, limit=limit, after_id=after_id, search=search, is_active=is_active
+    )
+    if len(users) == limit:
+        response.headers["X-Next-Cursor"] = str(users[-1].id)
+
+    summaries = [UserSummary.model_validate(user) for user in users]
+    if include_stats:
+        rollups = await user_crud.get_user_rollups(db, [user.id for user in users])
+        for summary in summaries:
+            rollup = rollups.get(summary.id)
+            summary.portfolio_count = rollup["portfolio_count"] if rollup else 0
+            summary.trade_count = rollup["trade_count"] if rollup else 0
+            summary.last_activity_at = rollup["last_activity_at"] if rollup else None
+    return summaries
 
 
 @router.get("/{user_id}", response_model=User)
@@ -0,0 +1,41 @@
+from pydantic import BaseModel, Field, model_validator
+from typing import Optional, List, Literal
+from app.services.monte_carlo import MAX_CELLS, MAX_SIMULATIONS, MAX_TRADES
+
+
+class SizingRule(BaseModel):
+    rule: Literal["fixed_quantity", "fixed_fraction", "fixed_risk", "kelly"]
+    name: Optional[str] = None
+    # fixed_quantity
+    quantity: float = Field(1.0, gt=0)
+    # fixed_fraction: position value as a fraction of equity
+    fraction: float = Field(0.1, gt=0, le=10)
+    # fixed_risk: equity at risk if price hits a stop this far from entry
+    risk_percentage: float = Field(1.0, gt=0, le=100)
+    stop_loss_percentage: float = Field(2.0, gt=0, le=100)
+    # kelly: scaled Kelly fraction estimated from prior trades
+    kelly_fraction: float = Field(0.5, gt=0, le=1)
+    min_trades: int = Field(20, ge=1)
+    max_fraction: float = Field(1.0, gt=0, le=10)
+
+
+class WhatIfRequest(BaseModel):
+    rules: List[SizingRule] = Field(..., min_length=1, max_length=20)
+    curve_points: int = Field(100, ge=0, le=1000)
+
+
+class MonteCarloParams(BaseModel):
+    """Options of a Monte Carlo run, with the limits of the monte-carlo endpoint"""
+    simulations: int = Field(1000, ge=1, le=MAX_SIMULATIONS)
+    # Defaults to the number of realized trades
+    trades: Optional[int] = Field(None, ge=1, le=MAX_TRADES)
+    method: Literal["bootstrap", "shuffle"] = "bootstrap"
+    position_fraction: float = Field(1.0, gt=0, le=10)
+    ruin_threshold: float = Field(0.5, gt=0, le=1)
+    seed: Optional[int] = Field(None, ge=0)
+
+    @model_validator(mode="after")
+    def check_cells(self) -> "MonteCarloParams":
+        if self.trades is not None and self.simulations * self.trades > MAX_CELLS:
+            raise ValueError(f"simulations x trades may be at most {MAX_CELLS:,}")
+        return self
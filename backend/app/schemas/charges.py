@@ -0,0 +1,54 @@
+from pydantic import BaseModel, Field
+from typing import Optional
+from app.models.trade import TradeSegment
+
+
+class ChargeRates(BaseModel):
+    brokerage_percentage: float = Field(ge=0)
+    brokerage_flat_per_order: float = Field(ge=0)
+    brokerage_max_per_order: float = Field(ge=0)
+    stt_buy_percentage: float = Field(ge=0)
+    stt_sell_percentage: float = Field(ge=0)
+    exchange_percentage: float = Field(ge=0)
+    sebi_percentage: float = Field(ge=0)
+    stamp_duty_buy_percentage: float = Field(ge=0)
+    dp_charge_per_sell: float = Field(ge=0)
+    gst_percentage: float = Field(ge=0)
+
+    class Config:
+        from_attributes = True
+
+
+class ChargeRatesUpdate(BaseModel):
+    brokerage_percentage: Optional[float] = Field(None, ge=0)
+    brokerage_flat_per_order: Optional[float] = Field(None, ge=0)
+    brokerage_max_per_order: Optional[float] = Field(None, ge=0)
+    stt_buy_percentage: Optional[float] = Field(None, ge=0)
+    stt_sell_percentage: Optional[float] = Field(None, ge=0)
+    exchange_percentage: Optional[float] = Field(None, ge=0)
+    sebi_percentage: Optional[float] = Field(None, ge=0)
+    stamp_duty_buy_percentage: Optional[float] = Field(None, ge=0)
+    dp_charge_per_sell: Optional[float] = Field(None, ge=0)
+    gst_percentage: Optional[float] = Field(None, ge=0)
+
+
+class ChargeBreakdown(BaseModel):
+    trade_id: int
+    segment: TradeSegment
+    buy_value: float
+    sell_value: float
+    brokerage: float
+    stt: float
+    exchange: float
+    sebi: float
+    stamp_duty: float
+    dp: float
+    gst: float
+    total: float
+    profit_loss: Optional[float] = None
+    net_profit_loss: Optional[float] = None
+
+
+class ChargeRecomputeResult(BaseModel):
+    portfolio_id: int
+    trades_updated: int
@@ -0,0 +1,44 @@
+from pydantic import BaseModel, Field
+from typing import Optional
+from datetime import datetime
+from app.models.fill import FillSide
+from app.models.portfolio import CostBasisMethod
+from app.schemas.types import Price
+
+
+class FillBase(BaseModel):
+    side: FillSide
+    price: Price = Field(gt=0)
+    quantity: float = Field(gt=0)
+    executed_at: datetime
+
+
+class FillCreate(FillBase):
+    pass
+
+
+class Fill(FillBase):
+    id: int
+    trade_id: int
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+class LotMatch(BaseModel):
+    open_fill_id: Optional[int] = None
+    close_fill_id: Optional[int] = None
+    quantity: float
+    entry_price: float
+    exit_price: float
+    profit_loss: float
+
+    class Config:
+        from_attributes = True
+
+
+class RematchResult(BaseModel):
+    portfolio_id: int
+    method: CostBasisMethod
+    trades_updated: int
@@ -0,0 +1,28 @@
+from pydantic import BaseModel, Field
+from typing import Optional, Dict, Any
+from datetime import datetime
+from app.models.job import JobStatus
+
+
+class JobCreate(BaseModel):
+    kind: str
+    params: Dict[str, Any] = Field(default_factory=dict)
+
+
+class Job(BaseModel):
+    id: int
+    kind: str
+    params: Dict[str, Any]
+    status: JobStatus
+    progress: float
+    message: Optional[str] = None
+    cancel_requested: bool
+    result: Optional[Any] = None
+    error: Optional[str] = None
+    has_file: bool = False
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
@@ -1,12 +1,15 @@
 from pydantic import BaseModel
 from typing import Optional
 from datetime import datetime
+from app.models.portfolio import CostBasisMethod
+from app.schemas.types import Money
 
 
 class PortfolioBase(BaseModel):
     name: str
     description: Optional[str] = None
-    initial_balance: float = 0.0
+    initial_balance: Money = 0.0
+    cost_basis_method: CostBasisMethod = CostBasisMethod.FIFO
 
 
 class PortfolioCreate(PortfolioBase):
@@ -16,7 +19,8 @@ class PortfolioCreate(PortfolioBase):
 class PortfolioUpdate(BaseModel):
     name: Optional[str] = None
     description: Optional[str] = None
-    initial_balance: Optional[float] = None
+    initial_balance: Optional[Money] = None
+    cost_basis_method: Optional[CostBasisMethod] = None
 
 
 class Portfolio(PortfolioBase):
@@ -0,0 +1,54 @@
+from pydantic import BaseModel, Field, field_validator
+from typing import Dict, List
+from datetime import date
+from app.models.risk_rule import RiskRuleKind, RiskAction
+
+
+class RiskRuleBase(BaseModel):
+    kind: RiskRuleKind
+    limit: float = Field(ge=0)
+    action: RiskAction = RiskAction.REJECT
+
+
+class RiskRuleSet(BaseModel):
+    """The full rule set of a portfolio; kinds left out are removed"""
+    rules: List[RiskRuleBase]
+
+    @field_validator("rules")
+    @classmethod
+    def one_rule_per_kind(cls, rules: List[RiskRuleBase]) -> List[RiskRuleBase]:
+        kinds = [rule.kind for rule in rules]
+        if len(set(kinds)) != len(kinds):
+            raise ValueError("Only one rule per kind is allowed")
+        return rules
+
+
+class RiskRule(RiskRuleBase):
+    id: int
+    portfolio_id: int
+
+    class Config:
+        from_attributes = True
+
+
+class RiskViolation(BaseModel):
+    kind: RiskRuleKind
+    action: RiskAction
+    limit: float
+    value: float
+    message: str
+
+    class Config:
+        from_attributes = True
+
+
+class RiskStatus(BaseModel):
+    portfolio_id: int
+    day: date
+    realized_profit_loss: float
+    trades_entered: int
+    open_positions: int
+    exposure: Dict[str, float]
+    rules: List[RiskRule]
+    # Rules already at or past their limit for the next entry
+    breached: List[RiskViolation]
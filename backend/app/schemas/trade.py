@@ -1,17 +1,21 @@
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, Field
+from typing import Annotated, Optional, List, Literal, Union
 from datetime import datetime
-from app.models.trade import TradeType, TradeStatus
+from app.models.trade import TradeType, TradeStatus, TradeSegment
+from app.schemas.types import Price
 
 
 class TradeBase(BaseModel):
     symbol: str
     trade_type: TradeType
-    entry_price: float
+    segment: TradeSegment = TradeSegment.DELIVERY
+    entry_price: Price
     entry_date: datetime
     quantity: float
     notes: Optional[str] = None
     tags: Optional[str] = None
+    # Broker order/trade id; a trade whose id the portfolio already has is not created again
+    external_id: Optional[str] = Field(None, min_length=1, max_length=128)
 
 
 class TradeCreate(TradeBase):
@@ -21,10 +25,11 @@ class TradeCreate(TradeBase):
 class TradeUpdate(BaseModel):
     symbol: Optional[str] = None
     trade_type: Optional[TradeType] = None
-    entry_price: Optional[float] = None
+    segment: Optional[TradeSegment] = None
+    entry_price: Optional[Price] = None
     entry_date: Optional[datetime] = None
     quantity: Optional[float] = None
-    exit_price: Optional[float] = None
+    exit_price: Optional[Price] = None
     exit_date: Optional[datetime] = None
     status: Optional[TradeStatus] = None
     notes: Optional[str] = None
@@ -32,7 +37,7 @@ class TradeUpdate(BaseModel):
 
 
 class TradeClose(BaseModel):
-    exit_price: float
+    exit_price: Price
     exit_date: datetime
 
 
@@ -44,9 +49,53 @@ class Trade(TradeBase):
     exit_date: Optional[datetime] = None
     profit_loss: Optional[float] = None
     profit_loss_percentage: Optional[float] = None
+    charges: Optional[float] = None
+    net_profit_loss: Optional[float] = None
+    open_quantity: Optional[float] = None
+    last_price: Optional[float] = None
+    unrealized_profit_loss: Optional[float] = None
+    unrealized_profit_loss_percentage: Optional[float] = None
     screenshot_path: Optional[str] = None
     created_at: datetime
     updated_at: Optional[datetime] = None
 
     class Config:
         from_attributes = True
+
+
+class BatchClose(TradeClose):
+    op: Literal["close"]
+    trade_id: int
+
+
+class BatchUpdate(BaseModel):
+    op: Literal["update"]
+    trade_id: int
+    changes: TradeUpdate
+
+
+class BatchDelete(BaseModel):
+    op: Literal["delete"]
+    trade_id: int
+
+
+BatchOperation = Annotated[Union[BatchClose, BatchUpdate, BatchDelete], Field(discriminator="op")]
+
+
+class TradeBatch(BaseModel):
+    operations: List[BatchOperation] = Field(..., min_length=1, max_length=1000)
+
+
+class TradeBatchItem(BaseModel):
+    index: int
+    op: str
+    trade_id: int
+    status_code: int
+    detail: Optional[str] = None
+    trade: Optional[Trade] = None
+
+
+class TradeBatchResult(BaseModel):
+    succeeded: int
+    failed: int
+    results: List[TradeBatchItem]
@@ -0,0 +1,16 @@
+from pydantic import BaseModel
+from typing import Optional, Dict, List, Any
+from datetime import datetime
+
+
+class TradeEvent(BaseModel):
+    id: int
+    trade_id: int
+    portfolio_id: int
+    kind: str
+    changes: Optional[Dict[str, List[Any]]] = None
+    state: Optional[Dict[str, Any]] = None
+    created_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
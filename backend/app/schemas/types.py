@@ -0,0 +1,8 @@
+from typing import Annotated
+from pydantic import AfterValidator
+from app.models.types import round_money, round_price
+
+# Input amounts rounded to what the fixed-point columns store, so responses
+# and P&L computed before a reload match the stored values
+Money = Annotated[float, AfterValidator(round_money)]
+Price = Annotated[float, AfterValidator(round_price)]
@@ -36,6 +36,13 @@ class User(UserInDB):
     pass
 
 
+class UserSummary(User):
+    """User with an optional activity rollup for the admin console"""
+    portfolio_count: Optional[int] = None
+    trade_count: Optional[int] = None
+    last_activity_at: Optional[datetime] = None
+
+
 class Token(BaseModel):
     access_token: str
     token_type: str
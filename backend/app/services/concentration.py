@@ -0,0 +1,142 @@
+"""
+Where a portfolio's realized P&L comes from, by symbol.
+
+Closed trades are bucketed by symbol and IST exit day. With thousands of
+traded contracts that symbol x day matrix is almost entirely empty, so it is
+never built in full: per-symbol totals, the portfolio's daily P&L and
+drawdown contributions are ``bincount``s over the trade rows, and only the
+top-K symbols by absolute P&L are pivoted into a dense K x days block for
+the correlation matrix. Days without a close count as zero P&L.
+
+Concentration uses each symbol's share of absolute net P&L, so large losers
+count as much as large winners: the Herfindahl-Hirschman index (the sum of
+squared shares, 1 / symbols when spread evenly and 1 when everything came
+from one symbol), its inverse as the effective number of symbols, and the
+share of the top N.
+
+Drawdown is the largest fall of cumulative realized P&L from a running peak
+(starting from zero); each symbol's contribution is its P&L over the days
+from the peak to the trough.
+"""
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+
+def _round(value: float, digits: int = 2) -> Optional[float]:
+    return round(float(value), digits) if np.isfinite(value) else None
+
+
+def correlation_matrix(matrix: np.ndarray) -> np.ndarray:
+    """Pearson correlation between rows; NaN where a row has no variance"""
+    centered = matrix - matrix.mean(axis=1, keepdims=True)
+    norms = np.linalg.norm(centered, axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        corr = (centered @ centered.T) / np.outer(norms, norms)
+    return np.clip(corr, -1.0, 1.0)
+
+
+def _concentration(names: np.ndarray, totals: np.ndarray, order: np.ndarray, top_n: int) -> Dict[str, Any]:
+    magnitude = np.abs(totals)
+    gross = magnitude.sum()
+    shares = magnitude / gross if gross > 0 else np.zeros_like(magnitude)
+    hhi = float(np.sum(shares ** 2))
+    top = order[:top_n]
+    return {
+        "symbols": len(names),
+        "herfindahl_index": round(hhi, 4),
+        "effective_symbols": round(1 / hhi, 2) if hhi > 0 else 0.0,
+        "top_n": top_n,
+        "top_n_share": round(float(shares[top].sum()) * 100, 2),
+        "top_symbols": [
+            {
+                "symbol": str(names[i]),
+                "net_profit_loss": round(float(totals[i]), 2),
+                "share": round(float(shares[i]) * 100, 2),
+            }
+            for i in top
+        ],
+    }
+
+
+def _correlation(
+    names: np.ndarray, days: np.ndarray, sym: np.ndarray, day: np.ndarray, pl: np.ndarray, selected: np.ndarray
+) -> Dict[str, Any]:
+    k, n_days = len(selected), len(days)
+    row = np.full(len(names), -1)
+    row[selected] = np.arange(k)
+    rows = row[sym]
+    mask = rows >= 0
+    # Dense block for the selected symbols only, filled by flat index
+    matrix = np.bincount(rows[mask] * n_days + day[mask], weights=pl[mask], minlength=k * n_days)
+    corr = correlation_matrix(matrix.reshape(k, n_days)) if n_days > 1 else np.full((k, k), np.nan)
+    return {
+        "symbols": [str(names[i]) for i in selected],
+        "days": n_days,
+        "matrix": [[_round(value, 4) for value in line] for line in corr],
+    }
+
+
+def _drawdown(
+    names: np.ndarray, days: np.ndarray, daily: np.ndarray, sym: np.ndarray, day: np.ndarray, pl: np.ndarray,
+    limit: int
+) -> Dict[str, Any]:
+    equity = np.cumsum(daily)
+    peaks = np.maximum.accumulate(np.maximum(equity, 0.0))
+    drawdown = peaks - equity
+    trough = int(np.argmax(drawdown))
+    amount = float(drawdown[trough])
+    if amount <= 0:
+        return {"max_drawdown": 0.0, "peak_date": None, "trough_date": None, "contributions": []}
+
+    # Last day at the peak before the trough; -1 when the peak is the starting zero
+    at_peak = np.flatnonzero(equity[:trough + 1] == peaks[trough])
+    peak = int(at_peak[-1]) if len(at_peak) else -1
+    window = (day > peak) & (day <= trough)
+    contribution = np.bincount(sym[window], weights=pl[window], minlength=len(names))
+    losers = np.flatnonzero(contribution < 0)
+    losers = losers[np.argsort(contribution[losers], kind="stable")][:limit]
+    return {
+        "max_drawdown": round(amount, 2),
+        "peak_date": str(days[peak]) if peak >= 0 else None,
+        "trough_date": str(days[trough]),
+        "contributions": [
+            {
+                "symbol": str(names[i]),
+                "profit_loss": round(float(contribution[i]), 2),
+                "share": round(float(-contribution[i] / amount) * 100, 2),
+            }
+            for i in losers
+        ],
+    }
+
+
+def analyze(symbols: np.ndarray, exit_days: np.ndarray, pl: np.ndarray, top_k: int, top_n: int) -> Dict[str, Any]:
+    """
+    Concentration, correlation of the top ``top_k`` symbols and drawdown contributions.
+
+    ``symbols``, ``exit_days`` (``datetime64[D]``) and ``pl`` hold one entry per
+    closed trade.
+    """
+    if len(pl) == 0:
+        empty: List[Any] = []
+        return {
+            "trades": 0,
+            "concentration": _concentration(np.array(empty), np.zeros(0), np.zeros(0, dtype=int), top_n),
+            "correlation": {"symbols": empty, "days": 0, "matrix": empty},
+            "drawdown": {"max_drawdown": 0.0, "peak_date": None, "trough_date": None, "contributions": empty},
+        }
+
+    names, sym = np.unique(symbols, return_inverse=True)
+    days, day = np.unique(exit_days, return_inverse=True)
+    totals = np.bincount(sym, weights=pl, minlength=len(names))
+    daily = np.bincount(day, weights=pl, minlength=len(days))
+    # Largest absolute P&L first; names are sorted, so ties go alphabetically
+    order = np.argsort(-np.abs(totals), kind="stable")
+
+    return {
+        "trades": len(pl),
+        "concentration": _concentration(names, totals, order, top_n),
+        "correlation": _correlation(names, days, sym, day, pl, order[:top_k]),
+        "drawdown": _drawdown(names, days, daily, sym, day, pl, top_k),
+    }
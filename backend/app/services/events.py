@@ -0,0 +1,201 @@
+"""
+In-process pub/sub for pushing portfolio updates to WebSocket clients.
+
+Each WebSocket connection subscribes for its user and gets a bounded queue.
+Write paths publish small deltas after they commit (a changed trade, a
+deleted trade id, the portfolio's new totals); nothing is computed or
+serialized unless the owning user has a connection open, so idle dashboards
+cost nothing.
+
+A client that falls behind is not allowed to grow memory: when its queue is
+full the queued deltas are discarded and replaced by a single ``resync``
+message, after which it should refetch what it shows.
+
+Subscriptions are per process. With several API processes a client only
+receives updates made through the process it is connected to, so run the
+WebSocket endpoint behind a single process or sticky routing.
+"""
+import asyncio
+import json
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import select, func, case
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import get_settings
+from app.metrics import WS_CONNECTIONS, WS_MESSAGES_DROPPED
+from app.models import Portfolio, Trade
+from app.models.trade import TradeStatus
+
+RESYNC_MESSAGE = json.dumps({"type": "resync"})
+
+# Trade fields sent with trade events; enough to update a row in place
+TRADE_EVENT_FIELDS = [
+    "id", "portfolio_id", "symbol", "trade_type", "segment", "status", "entry_price", "entry_date",
+    "quantity", "open_quantity", "exit_price", "exit_date", "profit_loss", "profit_loss_percentage",
+    "charges", "net_profit_loss", "updated_at",
+]
+
+
+class ConnectionLimitExceeded(Exception):
+    pass
+
+
+class Subscription:
+    """One connection's bounded queue of serialized messages"""
+
+    def __init__(self, user_id: int, queue_size: int):
+        self.user_id = user_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.overflowed = False
+
+    def push(self, message: str) -> None:
+        if self.overflowed:
+            WS_MESSAGES_DROPPED.inc()
+            return
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            # Replace the backlog with a single resync; deltas after it are dropped until it is sent
+            WS_MESSAGES_DROPPED.inc(self.queue.qsize() + 1)
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESYNC_MESSAGE)
+            self.overflowed = True
+
+    async def get(self) -> str:
+        message = await self.queue.get()
+        if message is RESYNC_MESSAGE:
+            self.overflowed = False
+        return message
+
+
+class EventBroker:
+    def __init__(self, queue_size: int, max_connections: int, max_connections_per_user: int):
+        self.queue_size = queue_size
+        self.max_connections = max_connections
+        self.max_connections_per_user = max_connections_per_user
+        self._subscriptions: Dict[int, Set[Subscription]] = {}
+        self._count = 0
+
+    def subscribe(self, user_id: int) -> Subscription:
+        user_subscriptions = self._subscriptions.get(user_id, set())
+        if self._count >= self.max_connections:
+            raise ConnectionLimitExceeded("Too many connections")
+        if len(user_subscriptions) >= self.max_connections_per_user:
+            raise ConnectionLimitExceeded("Too many connections for this user")
+
+        subscription = Subscription(user_id, self.queue_size)
+        self._subscriptions.setdefault(user_id, set()).add(subscription)
+        self._count += 1
+        WS_CONNECTIONS.inc()
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        user_subscriptions = self._subscriptions.get(subscription.user_id)
+        if not user_subscriptions or subscription not in user_subscriptions:
+            return
+        user_subscriptions.discard(subscription)
+        if not user_subscriptions:
+            del self._subscriptions[subscription.user_id]
+        self._count -= 1
+        WS_CONNECTIONS.dec()
+
+    @property
+    def active(self) -> bool:
+        return self._count > 0
+
+    def has_subscribers(self, user_id: int) -> bool:
+        return user_id in self._subscriptions
+
+    def publish(self, user_id: int, events: Iterable[Dict[str, Any]]) -> None:
+        """Queue events for every connection of a user; never blocks"""
+        subscriptions = self._subscriptions.get(user_id)
+        if not subscriptions:
+            return
+        # Serialized once, shared by all of the user's connections
+        messages = [json.dumps(jsonable_encoder(event)) for event in events]
+        for subscription in subscriptions:
+            for message in messages:
+                subscription.push(message)
+
+
+@lru_cache()
+def get_event_broker() -> EventBroker:
+    settings = get_settings()
+    return EventBroker(
+        queue_size=settings.WS_QUEUE_SIZE,
+        max_connections=settings.WS_MAX_CONNECTIONS,
+        max_connections_per_user=settings.WS_MAX_CONNECTIONS_PER_USER
+    )
+
+
+def trade_event(trade: Any, previous_status: Optional[TradeStatus] = None) -> Dict[str, Any]:
+    """``trade.created``, ``trade.closed`` or ``trade.updated`` with the trade's compact fields"""
+    if previous_status is None:
+        kind = "trade.created"
+    elif previous_status != TradeStatus.CLOSED and trade.status == TradeStatus.CLOSED:
+        kind = "trade.closed"
+    else:
+        kind = "trade.updated"
+    return {
+        "type": kind,
+        "portfolio_id": trade.portfolio_id,
+        "trade": {field: getattr(trade, field) for field in TRADE_EVENT_FIELDS},
+    }
+
+
+def trade_deleted_event(portfolio_id: int, trade_id: int) -> Dict[str, Any]:
+    return {"type": "trade.deleted", "portfolio_id": portfolio_id, "trade_id": trade_id}
+
+
+def portfolio_refresh_event(portfolio_id: int) -> Dict[str, Any]:
+    """Many trades of a portfolio changed at once (re-matching, charge recalculation): refetch them"""
+    return {"type": "portfolio.refresh", "portfolio_id": portfolio_id}
+
+
+async def portfolio_stats(db: AsyncSession, portfolio_id: int) -> Dict[str, Any]:
+    """Trade counts and realized totals of a portfolio in one aggregate query"""
+    closed = Trade.status == TradeStatus.CLOSED
+    row = (await db.execute(
+        select(
+            func.count(case((Trade.status == TradeStatus.OPEN, 1))).label("open_trades"),
+            func.count(case((closed, 1))).label("closed_trades"),
+            func.coalesce(func.sum(case((closed, Trade.profit_loss))), 0.0).label("total_profit_loss"),
+            func.coalesce(func.sum(case((closed, Trade.charges))), 0.0).label("total_charges"),
+            func.coalesce(
+                func.sum(case((closed, func.coalesce(Trade.net_profit_loss, Trade.profit_loss)))), 0.0
+            ).label("total_net_profit_loss"),
+        ).where(Trade.portfolio_id == portfolio_id)
+    )).one()
+    stats = dict(row._mapping)
+    for key in ("total_profit_loss", "total_charges", "total_net_profit_loss"):
+        stats[key] = round(stats[key], 2)
+    return stats
+
+
+async def publish_portfolio_events(
+    db: AsyncSession,
+    portfolio_id: int,
+    events: List[Dict[str, Any]]
+) -> None:
+    """
+    Push events for a portfolio, followed by its new totals, to its owner.
+
+    Call after committing. Returns immediately (without querying) when the
+    owner has no open connection.
+    """
+    broker = get_event_broker()
+    if not broker.active:
+        return
+    # Usually already in the session's identity map from the ownership check
+    portfolio = await db.get(Portfolio, portfolio_id)
+    if portfolio is None or not broker.has_subscribers(portfolio.user_id):
+        return
+    stats = await portfolio_stats(db, portfolio_id)
+    broker.publish(
+        portfolio.user_id,
+        [*events, {"type": "portfolio.stats", "portfolio_id": portfolio_id, "stats": stats}]
+    )
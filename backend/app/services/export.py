@@ -0,0 +1,226 @@
+"""
+Streaming trade exports.
+
+Rows are read from a server-side cursor in chunks and encoded chunk by chunk,
+so memory stays bounded regardless of how many trades are exported. CSV and
+Parquet bytes are yielded as each chunk is encoded; XLSX is written to a
+temporary file by openpyxl's write-only mode (a zip archive cannot be
+streamed before it is finalized) and then streamed from disk.
+"""
+import asyncio
+import csv
+import io
+import os
+import tempfile
+from datetime import datetime
+from typing import Any, AsyncIterator, List, Optional, Sequence
+
+from sqlalchemy import select, and_
+from sqlalchemy.sql import Select
+
+from app.database import get_sessionmaker
+from app.models import Trade, Portfolio
+from app.models.trade import TradeStatus
+from app.services.market_time import financial_year_bounds, financial_year_label
+
+CHUNK_SIZE = 5000
+FILE_READ_SIZE = 1024 * 1024
+
+EXPORT_COLUMNS = [
+    ("id", Trade.id),
+    ("portfolio_id", Trade.portfolio_id),
+    ("portfolio_name", Portfolio.name),
+    ("symbol", Trade.symbol),
+    ("trade_type", Trade.trade_type),
+    ("segment", Trade.segment),
+    ("status", Trade.status),
+    ("entry_date", Trade.entry_date),
+    ("entry_price", Trade.entry_price),
+    ("quantity", Trade.quantity),
+    ("exit_date", Trade.exit_date),
+    ("exit_price", Trade.exit_price),
+    ("profit_loss", Trade.profit_loss),
+    ("profit_loss_percentage", Trade.profit_loss_percentage),
+    ("charges", Trade.charges),
+    ("net_profit_loss", Trade.net_profit_loss),
+    ("notes", Trade.notes),
+    ("tags", Trade.tags),
+]
+HEADER = [name for name, _ in EXPORT_COLUMNS]
+
+MEDIA_TYPES = {
+    "csv": "text/csv",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+def build_export_query(
+    user_id: int,
+    portfolio_id: Optional[int] = None,
+    financial_year: Optional[int] = None,
+    status: Optional[TradeStatus] = None
+) -> Select:
+    """
+    Trades owned by a user, optionally limited to one portfolio.
+
+    A financial year filter selects trades closed between 1 April and
+    31 March (IST), which is what tax filing needs.
+    """
+    conditions = [Portfolio.user_id == user_id]
+    if portfolio_id is not None:
+        conditions.append(Trade.portfolio_id == portfolio_id)
+    if status is not None:
+        conditions.append(Trade.status == status)
+    if financial_year is not None:
+        start, end = financial_year_bounds(financial_year)
+        conditions.append(Trade.exit_date >= start)
+        conditions.append(Trade.exit_date < end)
+
+    return (
+        select(*[column for _, column in EXPORT_COLUMNS])
+        .join(Portfolio, Portfolio.id == Trade.portfolio_id)
+        .where(and_(*conditions))
+        .order_by(Trade.portfolio_id, Trade.entry_date, Trade.id)
+    )
+
+
+def export_filename(portfolio_id: Optional[int], financial_year: Optional[int], format: str) -> str:
+    filename = f"trades_portfolio_{portfolio_id}" if portfolio_id is not None else "trades_all"
+    if financial_year is not None:
+        filename += f"_{financial_year_label(financial_year)}"
+    return f"{filename}.{format}"
+
+
+def _plain(value: Any) -> Any:
+    return getattr(value, "value", value)
+
+
+async def stream_rows(query: Select, chunk_size: int = CHUNK_SIZE) -> AsyncIterator[List[Sequence]]:
+    """Yield lists of rows from a server-side cursor using a dedicated session"""
+    async with get_sessionmaker()() as session:
+        result = await session.stream(query.execution_options(yield_per=chunk_size))
+        async for partition in result.partitions(chunk_size):
+            yield [tuple(_plain(v) for v in row) for row in partition]
+
+
+async def export_csv(query: Select) -> AsyncIterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(HEADER)
+    async for rows in stream_rows(query):
+        writer.writerows(
+            [[v.isoformat() if isinstance(v, datetime) else v for v in row] for row in rows]
+        )
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+def _append_rows(sheet, rows: List[Sequence]) -> None:
+    for row in rows:
+        # Excel has no timezone support
+        sheet.append([
+            v.replace(tzinfo=None) if isinstance(v, datetime) else v for v in row
+        ])
+
+
+async def export_xlsx(query: Select) -> AsyncIterator[bytes]:
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("Trades")
+    sheet.append(HEADER)
+    async for rows in stream_rows(query):
+        # Encoding cells is CPU-bound; keep it off the event loop like the save
+        await asyncio.to_thread(_append_rows, sheet, rows)
+
+    fd, path = tempfile.mkstemp(suffix=".xlsx")
+    os.close(fd)
+    try:
+        await asyncio.to_thread(workbook.save, path)
+        with open(path, "rb") as f:
+            while True:
+                data = await asyncio.to_thread(f.read, FILE_READ_SIZE)
+                if not data:
+                    break
+                yield data
+    finally:
+        os.unlink(path)
+
+
+class _DrainableSink(io.RawIOBase):
+    """Write-only file object whose contents can be taken after each write"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _parquet_schema():
+    import pyarrow as pa
+
+    return pa.schema([
+        ("id", pa.int64()),
+        ("portfolio_id", pa.int64()),
+        ("portfolio_name", pa.string()),
+        ("symbol", pa.string()),
+        ("trade_type", pa.string()),
+        ("segment", pa.string()),
+        ("status", pa.string()),
+        ("entry_date", pa.timestamp("us", tz="UTC")),
+        ("entry_price", pa.float64()),
+        ("quantity", pa.float64()),
+        ("exit_date", pa.timestamp("us", tz="UTC")),
+        ("exit_price", pa.float64()),
+        ("profit_loss", pa.float64()),
+        ("profit_loss_percentage", pa.float64()),
+        ("charges", pa.float64()),
+        ("net_profit_loss", pa.float64()),
+        ("notes", pa.string()),
+        ("tags", pa.string()),
+    ])
+
+
+async def export_parquet(query: Select) -> AsyncIterator[bytes]:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = _parquet_schema()
+    sink = _DrainableSink()
+    writer = pq.ParquetWriter(sink, schema, compression="snappy")
+    try:
+        async for rows in stream_rows(query):
+            # One row group per chunk
+            columns = list(zip(*rows))
+            table = pa.Table.from_arrays(
+                [pa.array(col, type=field.type) for col, field in zip(columns, schema)],
+                schema=schema
+            )
+            writer.write_table(table)
+            data = sink.drain()
+            if data:
+                yield data
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+EXPORTERS = {
+    "csv": export_csv,
+    "xlsx": export_xlsx,
+    "parquet": export_parquet,
+}
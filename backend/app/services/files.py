@@ -0,0 +1,34 @@
+"""
+Cleanup of files referenced by deleted rows (trade screenshots, job outputs).
+
+Rows are deleted in bulk first; the files they pointed to are removed after
+the commit, so a failed transaction never leaves rows pointing at missing
+files. Files that are already gone are ignored.
+"""
+import asyncio
+import logging
+import os
+from typing import Iterable
+
+logger = logging.getLogger(__name__)
+
+
+def remove_files(paths: Iterable[str]) -> int:
+    """Remove files, skipping missing ones; returns how many were removed"""
+    removed = 0
+    for path in paths:
+        try:
+            os.unlink(path)
+            removed += 1
+        except FileNotFoundError:
+            pass
+        except OSError:
+            logger.warning("Could not remove %s", path, exc_info=True)
+    return removed
+
+
+async def remove_files_async(paths: Iterable[str]) -> int:
+    paths = [p for p in paths if p]
+    if not paths:
+        return 0
+    return await asyncio.to_thread(remove_files, paths)
@@ -0,0 +1,172 @@
+"""
+Handlers for the background job kinds.
+
+Importing this module registers them with ``app.services.jobs``.
+"""
+import asyncio
+import math
+from typing import Any, Dict
+
+from sqlalchemy import select, func
+
+from app.crud import analytics as analytics_crud
+from app.crud import charges as charges_crud
+from app.crud import fill as fill_crud
+from app.crud import portfolio as portfolio_crud
+from app.crud import snapshot as snapshot_crud
+from app.models.portfolio import CostBasisMethod
+from app.models import Trade
+from app.models.trade import TradeStatus, TradeSegment
+from app.schemas.analytics import MonteCarloParams
+from app.services.export import CHUNK_SIZE, EXPORTERS, build_export_query, export_filename
+from app.services.jobs import JobContext, job_handler
+from app.services.monte_carlo import SimulationConfig, simulate, get_process_pool
+from app.services.price_store import get_price_store
+from app.services import replay as replay_service
+from app.services import shards
+from app.database import current_shard, use_shard
+
+
+async def _owned_portfolio(db, ctx: JobContext):
+    portfolio = await portfolio_crud.get_portfolio_by_id(db, portfolio_id=ctx.params.get("portfolio_id"))
+    if portfolio is None or portfolio.user_id != ctx.user_id:
+        raise ValueError("Portfolio not found")
+    return portfolio
+
+
+@job_handler("portfolio_analytics")
+async def portfolio_analytics(ctx: JobContext) -> Dict[str, Any]:
+    """Full analytics for a portfolio: summary and per-symbol breakdown"""
+    async with ctx.session() as db:
+        portfolio = await _owned_portfolio(db, ctx)
+        await ctx.report(0.1, "Computing summary", force=True)
+        summary = await analytics_crud.get_portfolio_analytics(db, portfolio)
+        await ctx.report(0.6, "Computing per-symbol breakdown", force=True)
+        by_symbol = await analytics_crud.get_analytics_by_symbol(db, portfolio.id)
+    return {"summary": summary, **by_symbol}
+
+
+@job_handler("rematch_portfolio")
+async def rematch_portfolio(ctx: JobContext) -> Dict[str, Any]:
+    """Recalculate P&L of every multi-fill trade in a portfolio"""
+    method = ctx.params.get("method")
+    async with ctx.session() as db:
+        portfolio = await _owned_portfolio(db, ctx)
+        method = CostBasisMethod(method) if method else portfolio.cost_basis_method
+        await ctx.report(0.1, "Matching fills", force=True)
+        updated = await fill_crud.rematch_portfolio(db, portfolio.id, method)
+    return {"portfolio_id": portfolio.id, "method": method, "trades_updated": updated}
+
+
+@job_handler("export_trades")
+async def export_trades(ctx: JobContext) -> Dict[str, Any]:
+    """Write a trade export to a file that can be downloaded when the job is done"""
+    fmt = ctx.params.get("format", "csv")
+    if fmt not in EXPORTERS:
+        raise ValueError(f"Unsupported format: {fmt}")
+    status = ctx.params.get("status")
+    portfolio_id = ctx.params.get("portfolio_id")
+    financial_year = ctx.params.get("financial_year")
+
+    async with ctx.session() as db:
+        if portfolio_id is not None:
+            await _owned_portfolio(db, ctx)
+        query = build_export_query(
+            ctx.user_id,
+            portfolio_id=portfolio_id,
+            financial_year=financial_year,
+            status=TradeStatus(status) if status else None
+        )
+        total = (await db.execute(select(func.count()).select_from(query.subquery()))).scalar_one()
+
+    # Exporters yield roughly once per chunk of rows
+    expected_chunks = max(math.ceil(total / CHUNK_SIZE), 1)
+    path = ctx.output_file(f".{fmt}")
+    size = 0
+    with open(path, "wb") as f:
+        chunks = 0
+        async for data in EXPORTERS[fmt](query):
+            await asyncio.to_thread(f.write, data)
+            size += len(data)
+            chunks += 1
+            await ctx.report(min(chunks / expected_chunks, 0.99), f"{size:,} bytes written")
+    return {"format": fmt, "rows": total, "bytes": size, "filename": export_filename(portfolio_id, financial_year, fmt)}
+
+
+@job_handler("monte_carlo", params=MonteCarloParams)
+async def monte_carlo(ctx: JobContext) -> Dict[str, Any]:
+    """Monte Carlo simulation of a portfolio's closed-trade returns"""
+    # Validated on submission too; jobs queued before that are checked here
+    params = MonteCarloParams.model_validate(ctx.params)
+    async with ctx.session() as db:
+        portfolio = await _owned_portfolio(db, ctx)
+        returns = await analytics_crud.get_closed_trade_returns(db, portfolio.id)
+    config = SimulationConfig(starting_equity=portfolio.initial_balance or 1.0, **params.model_dump())
+    await ctx.report(0.1, f"Running {config.simulations:,} simulations", force=True)
+    result = await asyncio.to_thread(simulate, returns, config, get_process_pool())
+    return {"portfolio_id": portfolio.id, **result}
+
+
+@job_handler("recompute_charges", admin_only=True)
+async def recompute_charges(ctx: JobContext) -> Dict[str, Any]:
+    """Recompute charges after a rate table change, one portfolio per batch"""
+    segment = ctx.params.get("segment")
+    segment = TradeSegment(segment) if segment else None
+    query = select(Trade.portfolio_id).where(Trade.profit_loss.is_not(None)).distinct()
+    if segment is not None:
+        query = query.where(Trade.segment == segment)
+
+    portfolios = updated = 0
+    locations = await shards.data_locations()
+    for shard_index, shard in enumerate(locations):
+        with use_shard(shard):
+            async with ctx.session() as db:
+                portfolio_ids = list((await db.execute(query)).scalars())
+                for i, portfolio_id in enumerate(portfolio_ids):
+                    updated += await charges_crud.recompute_charges(db, portfolio_id=portfolio_id, segment=segment)
+                    await ctx.report(
+                        (shard_index + (i + 1) / len(portfolio_ids)) / len(locations),
+                        f"{portfolios + i + 1} portfolios"
+                    )
+        portfolios += len(portfolio_ids)
+    return {"segment": segment, "portfolios": portfolios, "trades_updated": updated}
+
+
+@job_handler("backfill_snapshots", admin_only=True)
+async def backfill_snapshots(ctx: JobContext) -> Dict[str, int]:
+    """Rebuild daily NAV snapshots, e.g. after loading historical prices"""
+    portfolio_ids = ctx.params.get("portfolio_ids")
+    await ctx.report(0.0, "Rebuilding snapshots", force=True)
+    totals: Dict[str, int] = {}
+    # Portfolio ids are per database: with sharding, restrict to the admin's own shard
+    locations = [current_shard.get()] if portfolio_ids else await shards.data_locations()
+    for shard in locations:
+        with use_shard(shard):
+            async with ctx.session() as db:
+                result = await snapshot_crud.backfill_snapshots(db, portfolio_ids=portfolio_ids)
+        for key, value in result.items():
+            totals[key] = totals.get(key, 0) + value
+    return totals
+
+
+@job_handler("replay_events", admin_only=True)
+async def replay_events(ctx: JobContext) -> Dict[str, Any]:
+    """Apply the trade event log to derived-state projections from their checkpoints"""
+    names = [ctx.params["projection"]] if ctx.params.get("projection") else list(replay_service.PROJECTIONS)
+    results = []
+    # Each shard has its own log and checkpoints
+    for shard in await shards.data_locations():
+        with use_shard(shard):
+            async with ctx.session() as db:
+                for i, name in enumerate(names):
+                    await ctx.report(i / len(names), f"Replaying {name}", force=True)
+                    result = await replay_service.replay(db, name, from_start=bool(ctx.params.get("from_start")))
+                    results.append(result if shard is None else {**result, "shard": shard})
+    return {"projections": results}
+
+
+@job_handler("ingest_prices", admin_only=True)
+async def ingest_prices(ctx: JobContext) -> Dict[str, int]:
+    """Ingest new CSV files from the price directory"""
+    await ctx.report(0.0, "Ingesting price files", force=True)
+    return await asyncio.to_thread(get_price_store().ingest_directory)
@@ -0,0 +1,335 @@
+"""
+In-process background jobs.
+
+Jobs are rows in the ``jobs`` table, so they survive restarts and can be
+polled from any worker process. Each API process runs a ``JobRunner`` with a
+fixed number of worker tasks; a worker claims a pending job with a
+conditional UPDATE (so two processes never run the same job), runs its
+handler with a dedicated database session and stores the result.
+
+While a job runs, its process renews the job's ``heartbeat_at``. A running
+job whose heartbeat is older than ``JOB_LEASE_SECONDS`` belonged to a
+process that died, and is put back to pending by whichever process notices
+first; jobs of live processes are never touched. A process that shuts down
+cleanly hands its interrupted jobs back right away.
+
+Handlers are registered with ``@job_handler("kind")`` and receive a
+``JobContext`` for reading parameters, reporting progress and checking for
+cancellation:
+
+    @job_handler("rematch_portfolio")
+    async def rematch(ctx: JobContext):
+        await ctx.report(0.5, "Matching fills")
+        return {"trades_updated": 42}
+"""
+import asyncio
+import logging
+import os
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Type
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel
+from sqlalchemy import select, update, delete, func, or_
+
+from app.config import get_settings
+from app.database import get_sessionmaker, use_shard
+from app.models import User
+from app.models.job import Job, JobStatus
+
+logger = logging.getLogger("app.jobs")
+
+FINISHED_STATUSES = (JobStatus.SUCCEEDED, JobStatus.FAILED, JobStatus.CANCELLED)
+PROGRESS_WRITE_INTERVAL = 0.5
+CLEANUP_INTERVAL = 3600
+# Heartbeats sent per lease, so a few can be late without losing the job
+HEARTBEATS_PER_LEASE = 4
+
+
+class JobCancelled(Exception):
+    pass
+
+
+@dataclass
+class JobSpec:
+    handler: Callable[["JobContext"], Awaitable[Any]]
+    admin_only: bool = False
+    # Validates the job's params when it is submitted
+    params: Optional[Type[BaseModel]] = None
+
+
+HANDLERS: Dict[str, JobSpec] = {}
+
+
+def job_handler(kind: str, admin_only: bool = False, params: Optional[Type[BaseModel]] = None):
+    """Register a coroutine function as the handler for a job kind"""
+    def decorator(func):
+        HANDLERS[kind] = JobSpec(func, admin_only, params)
+        return func
+    return decorator
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+class JobContext:
+    """What a handler sees of its job"""
+
+    def __init__(self, job_id: int, user_id: int, params: Dict[str, Any], results_dir: Path):
+        self.job_id = job_id
+        self.user_id = user_id
+        self.params = params
+        self.results_dir = results_dir
+        self.result_path: Optional[str] = None
+        self._last_write = 0.0
+
+    def session(self):
+        """A fresh session for the handler's own queries"""
+        return get_sessionmaker()()
+
+    def output_file(self, suffix: str) -> Path:
+        """Path for a file the job produces; it is deleted with the job"""
+        self.results_dir.mkdir(parents=True, exist_ok=True)
+        path = self.results_dir / f"job_{self.job_id}{suffix}"
+        self.result_path = str(path)
+        return path
+
+    async def report(self, progress: float, message: Optional[str] = None, force: bool = False) -> None:
+        """
+        Record progress (0..1) and raise ``JobCancelled`` if cancellation was requested.
+
+        Writes are throttled, so handlers can call this as often as they like.
+        """
+        now = time.monotonic()
+        if not force and now - self._last_write < PROGRESS_WRITE_INTERVAL:
+            return
+        self._last_write = now
+
+        values = {"progress": min(max(progress, 0.0), 1.0)}
+        if message is not None:
+            values["message"] = message
+        async with get_sessionmaker()() as session:
+            await session.execute(update(Job).where(Job.id == self.job_id).values(**values))
+            cancel_requested = (await session.execute(
+                select(Job.cancel_requested).where(Job.id == self.job_id)
+            )).scalar_one_or_none()
+            await session.commit()
+        if cancel_requested:
+            raise JobCancelled()
+
+
+class JobRunner:
+    def __init__(self, concurrency: int, retention: timedelta, results_dir: Path, lease: timedelta):
+        self.concurrency = concurrency
+        self.retention = retention
+        self.results_dir = results_dir
+        self.lease = lease
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._running: Dict[int, asyncio.Task] = {}
+        self._stopping = False
+
+    async def start(self) -> None:
+        self._stopping = False
+        self._queue = asyncio.Queue()
+        await self.requeue_stale()
+        async with get_sessionmaker()() as session:
+            pending = (await session.execute(
+                select(Job.id).where(Job.status == JobStatus.PENDING).order_by(Job.id)
+            )).scalars().all()
+        for job_id in pending:
+            self._queue.put_nowait(job_id)
+
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+        self._tasks.append(asyncio.create_task(self._cleanup_loop()))
+        self._tasks.append(asyncio.create_task(self._heartbeat_loop()))
+
+    async def stop(self) -> None:
+        self._stopping = True
+        interrupted = list(self._running)
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        # Hand interrupted jobs back now instead of waiting for their lease to expire
+        if interrupted:
+            try:
+                async with get_sessionmaker()() as session:
+                    await session.execute(
+                        update(Job)
+                        .where(Job.id.in_(interrupted), Job.status == JobStatus.RUNNING)
+                        .values(status=JobStatus.PENDING, progress=0.0, started_at=None, heartbeat_at=None)
+                    )
+                    await session.commit()
+            except Exception:
+                logger.exception("Could not release interrupted jobs")
+
+    async def requeue_stale(self) -> List[int]:
+        """Put running jobs without a recent heartbeat back to pending and queue them here"""
+        cutoff = _utcnow() - self.lease
+        async with get_sessionmaker()() as session:
+            # Jobs claimed before heartbeats existed only have started_at
+            last_seen = func.coalesce(Job.heartbeat_at, Job.started_at)
+            result = await session.execute(
+                update(Job)
+                .where(Job.status == JobStatus.RUNNING, or_(last_seen < cutoff, last_seen.is_(None)))
+                .values(status=JobStatus.PENDING, progress=0.0, started_at=None, heartbeat_at=None)
+                .returning(Job.id)
+            )
+            requeued = sorted(result.scalars().all())
+            await session.commit()
+        if requeued:
+            logger.warning("Re-queued jobs %s whose process stopped sending heartbeats", requeued)
+        for job_id in requeued:
+            self.enqueue(job_id)
+        return requeued
+
+    def enqueue(self, job_id: int) -> None:
+        if self._queue is not None:
+            self._queue.put_nowait(job_id)
+
+    def cancel_local(self, job_id: int) -> bool:
+        """Cancel a job running in this process; other processes notice the flag on their next report"""
+        task = self._running.get(job_id)
+        if task is None:
+            return False
+        task.cancel()
+        return True
+
+    async def _worker(self) -> None:
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._run(job_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Job %s could not be run", job_id)
+
+    async def _claim(self, job_id: int) -> Optional[Job]:
+        async with get_sessionmaker()() as session:
+            claimed = await session.execute(
+                update(Job)
+                .where(Job.id == job_id, Job.status == JobStatus.PENDING)
+                .values(status=JobStatus.RUNNING, started_at=_utcnow(), heartbeat_at=_utcnow())
+            )
+            await session.commit()
+            if claimed.rowcount != 1:
+                return None
+            return (await session.execute(select(Job).where(Job.id == job_id))).scalar_one()
+
+    @staticmethod
+    async def _owner_shard(user_id: int) -> Optional[int]:
+        async with get_sessionmaker()() as session:
+            return await session.scalar(select(User.shard).where(User.id == user_id))
+
+    async def _finish(self, job_id: int, **values) -> None:
+        async with get_sessionmaker()() as session:
+            await session.execute(
+                update(Job).where(Job.id == job_id).values(finished_at=_utcnow(), **values)
+            )
+            await session.commit()
+
+    async def _run(self, job_id: int) -> None:
+        job = await self._claim(job_id)
+        if job is None:
+            return
+
+        spec = HANDLERS.get(job.kind)
+        if spec is None:
+            await self._finish(job_id, status=JobStatus.FAILED, error=f"Unknown job kind: {job.kind}")
+            return
+
+        context = JobContext(job.id, job.user_id, job.params or {}, self.results_dir)
+        # The handler's sessions use the owner's shard (the task copies the context)
+        with use_shard(await self._owner_shard(job.user_id)):
+            task = asyncio.create_task(spec.handler(context))
+        self._running[job_id] = task
+        try:
+            result = await task
+        except (JobCancelled, asyncio.CancelledError):
+            if self._stopping:
+                raise
+            self._discard_output(context.result_path)
+            await self._finish(job_id, status=JobStatus.CANCELLED, message="Cancelled")
+            return
+        except Exception as e:
+            logger.exception("Job %s (%s) failed", job_id, job.kind)
+            self._discard_output(context.result_path)
+            await self._finish(job_id, status=JobStatus.FAILED, error=str(e) or type(e).__name__)
+            return
+        finally:
+            self._running.pop(job_id, None)
+
+        await self._finish(
+            job_id,
+            status=JobStatus.SUCCEEDED,
+            progress=1.0,
+            result=jsonable_encoder(result),
+            result_path=context.result_path
+        )
+
+    @staticmethod
+    def _discard_output(path: Optional[str]) -> None:
+        if path and os.path.exists(path):
+            os.unlink(path)
+
+    async def purge_expired(self) -> int:
+        """Delete finished jobs (and their files) older than the retention period"""
+        cutoff = _utcnow() - self.retention
+        async with get_sessionmaker()() as session:
+            expired = (await session.execute(
+                select(Job.id, Job.result_path).where(
+                    Job.status.in_(FINISHED_STATUSES),
+                    or_(Job.finished_at < cutoff, Job.finished_at.is_(None))
+                )
+            )).all()
+            if not expired:
+                return 0
+            await session.execute(delete(Job).where(Job.id.in_([job_id for job_id, _ in expired])))
+            await session.commit()
+        for _, path in expired:
+            self._discard_output(path)
+        return len(expired)
+
+    async def _heartbeat_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.lease.total_seconds() / HEARTBEATS_PER_LEASE)
+            try:
+                if self._running:
+                    async with get_sessionmaker()() as session:
+                        await session.execute(
+                            update(Job)
+                            .where(Job.id.in_(list(self._running)), Job.status == JobStatus.RUNNING)
+                            .values(heartbeat_at=_utcnow())
+                        )
+                        await session.commit()
+                await self.requeue_stale()
+            except Exception:
+                logger.exception("Job heartbeat failed")
+
+    async def _cleanup_loop(self) -> None:
+        while True:
+            try:
+                purged = await self.purge_expired()
+                if purged:
+                    logger.info("Purged %d expired jobs", purged)
+            except Exception:
+                logger.exception("Job cleanup failed")
+            await asyncio.sleep(CLEANUP_INTERVAL)
+
+
+@lru_cache()
+def get_job_runner() -> JobRunner:
+    settings = get_settings()
+    return JobRunner(
+        concurrency=settings.JOB_WORKERS,
+        retention=timedelta(hours=settings.JOB_RESULT_RETENTION_HOURS),
+        results_dir=Path(settings.JOB_RESULTS_DIR),
+        lease=timedelta(seconds=settings.JOB_LEASE_SECONDS)
+    )
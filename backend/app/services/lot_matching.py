@@ -0,0 +1,172 @@
+"""
+Lot matching engine for multi-fill positions.
+
+Opening fills are queued as lots; each closing fill consumes lots in FIFO or
+LIFO order (or against the running average cost) and realizes P&L for the
+quantity it matches. Every lot is pushed and popped at most once, so matching
+a position is O(fills).
+
+This module has no database dependencies so it can be used from CRUD code,
+background jobs and benchmarks alike.
+"""
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Iterable, List, Optional
+
+FIFO = "fifo"
+LIFO = "lifo"
+AVERAGE = "average"
+
+BUY = "buy"
+SELL = "sell"
+
+# Quantities below this are treated as fully consumed
+QUANTITY_EPSILON = 1e-9
+
+
+class OverfillError(ValueError):
+    """Raised when a closing fill exceeds the open quantity of the position"""
+
+
+@dataclass
+class LotMatch:
+    open_fill_id: Optional[int]
+    close_fill_id: Optional[int]
+    quantity: float
+    entry_price: float
+    exit_price: float
+    profit_loss: float
+
+
+@dataclass
+class PositionResult:
+    entry_quantity: float = 0.0
+    entry_cost: float = 0.0
+    exit_quantity: float = 0.0
+    exit_value: float = 0.0
+    open_quantity: float = 0.0
+    matched_cost: float = 0.0
+    realized_pl: float = 0.0
+    lots: List[LotMatch] = field(default_factory=list)
+
+    @property
+    def avg_entry_price(self) -> Optional[float]:
+        if self.entry_quantity <= QUANTITY_EPSILON:
+            return None
+        return self.entry_cost / self.entry_quantity
+
+    @property
+    def avg_exit_price(self) -> Optional[float]:
+        if self.exit_quantity <= QUANTITY_EPSILON:
+            return None
+        return self.exit_value / self.exit_quantity
+
+    @property
+    def open_avg_price(self) -> Optional[float]:
+        # Cost basis of the lots still open (entry cost not yet matched)
+        if self.open_quantity <= QUANTITY_EPSILON:
+            return None
+        return (self.entry_cost - self.matched_cost) / self.open_quantity
+
+    @property
+    def is_flat(self) -> bool:
+        return self.exit_quantity > QUANTITY_EPSILON and self.open_quantity <= QUANTITY_EPSILON
+
+    @property
+    def realized_pl_percentage(self) -> Optional[float]:
+        if self.matched_cost <= QUANTITY_EPSILON:
+            return None
+        return (self.realized_pl / self.matched_cost) * 100
+
+
+def _value(attr: Any) -> Any:
+    # Accept both plain strings and str-based enums (FillSide, CostBasisMethod)
+    return getattr(attr, "value", attr)
+
+
+def match_fills(
+    fills: Iterable[Any],
+    is_long: bool,
+    method: str = FIFO,
+    keep_lots: bool = True
+) -> PositionResult:
+    """
+    Match the fills of a single position.
+
+    Args:
+        fills: Objects or rows with ``id``, ``side``, ``price`` and ``quantity``,
+            already ordered by execution time
+        is_long: True if buys open the position, False if sells do
+        method: One of "fifo", "lifo" or "average"
+        keep_lots: Record each matched lot in the result (disable for bulk runs)
+
+    Returns:
+        PositionResult with realized P&L and entry/exit aggregates
+
+    Raises:
+        OverfillError: if a closing fill exceeds the open quantity
+    """
+    method = _value(method)
+    if method not in (FIFO, LIFO, AVERAGE):
+        raise ValueError(f"Unknown cost basis method: {method}")
+
+    opening_side = BUY if is_long else SELL
+    direction = 1.0 if is_long else -1.0
+    result = PositionResult()
+    lots: deque = deque()
+    take_from_front = method == FIFO
+    avg_cost = 0.0
+
+    for fill in fills:
+        price = fill.price
+        quantity = fill.quantity
+
+        if _value(fill.side) == opening_side:
+            result.entry_quantity += quantity
+            result.entry_cost += price * quantity
+            if method == AVERAGE:
+                avg_cost = (
+                    (avg_cost * result.open_quantity + price * quantity)
+                    / (result.open_quantity + quantity)
+                )
+            else:
+                # Lots are mutable [fill_id, price, remaining_quantity]
+                lots.append([fill.id, price, quantity])
+            result.open_quantity += quantity
+            continue
+
+        if quantity > result.open_quantity + QUANTITY_EPSILON:
+            raise OverfillError(
+                f"Closing quantity {quantity} exceeds open quantity {result.open_quantity}"
+            )
+
+        result.exit_quantity += quantity
+        result.exit_value += price * quantity
+        result.open_quantity = max(result.open_quantity - quantity, 0.0)
+
+        if method == AVERAGE:
+            pl = direction * (price - avg_cost) * quantity
+            result.realized_pl += pl
+            result.matched_cost += avg_cost * quantity
+            if keep_lots:
+                result.lots.append(LotMatch(None, fill.id, quantity, avg_cost, price, pl))
+            continue
+
+        remaining = quantity
+        while remaining > QUANTITY_EPSILON and lots:
+            lot = lots[0] if take_from_front else lots[-1]
+            taken = min(lot[2], remaining)
+            pl = direction * (price - lot[1]) * taken
+            result.realized_pl += pl
+            result.matched_cost += lot[1] * taken
+            if keep_lots:
+                result.lots.append(LotMatch(lot[0], fill.id, taken, lot[1], price, pl))
+            lot[2] -= taken
+            remaining -= taken
+            if lot[2] <= QUANTITY_EPSILON:
+                if take_from_front:
+                    lots.popleft()
+                else:
+                    lots.pop()
+
+    return result
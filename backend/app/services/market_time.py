@@ -0,0 +1,61 @@
+"""
+Indian market calendar helpers.
+
+Trade timestamps are stored as UTC; these helpers translate IST calendar
+concepts (trading days, the April–March financial year) into UTC bounds that
+can be used directly in queries.
+"""
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Iterable, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+import numpy as np
+
+IST = ZoneInfo("Asia/Kolkata")
+# IST has no daylight saving time, so array code can use a fixed offset
+IST_OFFSET_SECONDS = 5 * 3600 + 30 * 60
+
+
+def to_ist(value: datetime) -> datetime:
+    """Convert a timestamp to IST; naive values are treated as UTC"""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(IST)
+
+
+def ist_day_start(day: date) -> datetime:
+    """Midnight IST of the given day, as a UTC datetime"""
+    return datetime.combine(day, time.min, tzinfo=IST).astimezone(timezone.utc)
+
+
+def financial_year_of(value: datetime) -> int:
+    """Starting year of the Indian financial year a timestamp falls in"""
+    local = to_ist(value)
+    return local.year if local.month >= 4 else local.year - 1
+
+
+def financial_year_bounds(start_year: int) -> Tuple[datetime, datetime]:
+    """UTC [start, end) bounds of FY ``start_year``-``start_year + 1`` (April–March, IST)"""
+    return ist_day_start(date(start_year, 4, 1)), ist_day_start(date(start_year + 1, 4, 1))
+
+
+def financial_year_label(start_year: int) -> str:
+    return f"FY{start_year}-{str(start_year + 1)[-2:]}"
+
+
+def ist_today(now: Optional[datetime] = None) -> date:
+    return to_ist(now or datetime.now(timezone.utc)).date()
+
+
+def ist_day_bounds(day: date) -> Tuple[datetime, datetime]:
+    """UTC [start, end) bounds of an IST calendar day"""
+    return ist_day_start(day), ist_day_start(day + timedelta(days=1))
+
+
+def ist_dates(values: Iterable[datetime]) -> np.ndarray:
+    """IST calendar days of timestamps as a ``datetime64[D]`` array; naive values are treated as UTC"""
+    seconds = np.fromiter(
+        ((v if v.tzinfo is not None else v.replace(tzinfo=timezone.utc)).timestamp() for v in values),
+        dtype=np.float64
+    )
+    return ((seconds + IST_OFFSET_SECONDS) // 86400).astype("datetime64[D]")
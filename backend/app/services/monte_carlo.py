@@ -0,0 +1,173 @@
+"""
+Monte Carlo simulation of a portfolio's closed-trade returns.
+
+Each simulation draws a sequence of trade returns from the realized ones,
+either with replacement (``bootstrap``) or as a random permutation
+(``shuffle``), and compounds them into an equity curve where every trade
+risks ``position_fraction`` of current equity. Simulations are processed in
+fixed-size chunks so memory stays bounded; chunks can be spread over a
+process pool. Every chunk gets its own child of one ``SeedSequence``, so a
+seeded run gives identical results no matter how many workers execute it.
+"""
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+import numpy as np
+
+BOOTSTRAP = "bootstrap"
+SHUFFLE = "shuffle"
+
+PERCENTILES = (5, 25, 50, 75, 95)
+EQUITY_CHECKPOINTS = 50
+# Cells (simulations x trades) per chunk; ~16 MB of float64 per working array
+CHUNK_CELLS = 2_000_000
+# Below this many cells the pool's pickling overhead outweighs the speed-up
+PARALLEL_MIN_CELLS = 5_000_000
+MAX_SIMULATIONS = 100_000
+MAX_TRADES = 100_000
+# Caps the work of one run (simulations x trades): 10,000 x 10,000 at most
+MAX_CELLS = 100_000_000
+
+
+@dataclass
+class SimulationConfig:
+    simulations: int = 1000
+    trades: Optional[int] = None  # Defaults to the number of realized trades
+    method: str = BOOTSTRAP
+    position_fraction: float = 1.0
+    ruin_threshold: float = 0.5  # Ruin is losing this fraction of starting equity
+    starting_equity: float = 1.0
+    seed: Optional[int] = None
+
+
+def _simulate_chunk(
+    returns: np.ndarray,
+    simulations: int,
+    trades: int,
+    method: str,
+    position_fraction: float,
+    ruin_level: float,
+    checkpoints: np.ndarray,
+    seed: np.random.SeedSequence
+) -> Dict[str, np.ndarray]:
+    rng = np.random.default_rng(seed)
+    if method == SHUFFLE:
+        # Sort keys of a random matrix give an independent permutation per row
+        order = np.argsort(rng.random((simulations, len(returns))), axis=1)[:, :trades]
+        sampled = returns[order]
+    else:
+        sampled = returns[rng.integers(0, len(returns), size=(simulations, trades))]
+
+    # Growth below zero means the account is wiped out; it stays at zero
+    growth = np.maximum(1.0 + position_fraction * sampled, 0.0)
+    equity = np.cumprod(growth, axis=1)
+    peaks = np.maximum(np.maximum.accumulate(equity, axis=1), 1.0)
+    max_drawdown = np.max(1.0 - equity / peaks, axis=1)
+
+    return {
+        "ending": equity[:, -1],
+        "max_drawdown": max_drawdown,
+        "ruined": (equity.min(axis=1) <= ruin_level),
+        "checkpoints": equity[:, checkpoints],
+    }
+
+
+def _chunk_sizes(simulations: int, trades: int) -> List[int]:
+    per_chunk = max(CHUNK_CELLS // max(trades, 1), 1)
+    sizes = [per_chunk] * (simulations // per_chunk)
+    if simulations % per_chunk:
+        sizes.append(simulations % per_chunk)
+    return sizes
+
+
+def _percentiles(values: np.ndarray, scale: float = 1.0) -> Dict[str, float]:
+    return {
+        f"p{p}": round(float(v) * scale, 4)
+        for p, v in zip(PERCENTILES, np.percentile(values, PERCENTILES))
+    }
+
+
+def simulate(
+    returns_percentage: np.ndarray,
+    config: SimulationConfig,
+    executor: Optional[Executor] = None
+) -> Dict:
+    """
+    Run the simulation and summarize it as percentile bands.
+
+    ``returns_percentage`` are per-trade P&L percentages (as stored on trades).
+    Equity figures are in units of ``config.starting_equity``; drawdowns and
+    risk of ruin are percentages.
+    """
+    returns = np.asarray(returns_percentage, dtype=np.float64) / 100.0
+    returns = returns[np.isfinite(returns)]
+    if len(returns) == 0:
+        raise ValueError("No closed trades with a P&L percentage to simulate")
+    if config.method not in (BOOTSTRAP, SHUFFLE):
+        raise ValueError(f"Unknown method: {config.method}")
+
+    trades = config.trades or len(returns)
+    if not 1 <= config.simulations <= MAX_SIMULATIONS or trades > MAX_TRADES:
+        raise ValueError(f"At most {MAX_SIMULATIONS:,} simulations of {MAX_TRADES:,} trades are supported")
+    if config.simulations * trades > MAX_CELLS:
+        raise ValueError(f"Simulations x trades per simulation may be at most {MAX_CELLS:,}")
+    if config.method == SHUFFLE and trades > len(returns):
+        raise ValueError("Shuffling cannot produce more trades than were realized; use bootstrap")
+
+    # An unseeded run still reports the seed it used, so it can be reproduced
+    seed = config.seed if config.seed is not None else int(np.random.default_rng().integers(2**31))
+    checkpoints = np.unique(np.linspace(0, trades - 1, min(EQUITY_CHECKPOINTS, trades)).astype(np.int64))
+    sizes = _chunk_sizes(config.simulations, trades)
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    ruin_level = 1.0 - config.ruin_threshold
+    args = [
+        (returns, size, trades, config.method, config.position_fraction, ruin_level, checkpoints, seed)
+        for size, seed in zip(sizes, seeds)
+    ]
+
+    if executor is not None and config.simulations * trades >= PARALLEL_MIN_CELLS and len(sizes) > 1:
+        chunks = list(executor.map(_simulate_chunk, *zip(*args)))
+    else:
+        chunks = [_simulate_chunk(*a) for a in args]
+
+    ending = np.concatenate([c["ending"] for c in chunks])
+    max_drawdown = np.concatenate([c["max_drawdown"] for c in chunks])
+    ruined = np.concatenate([c["ruined"] for c in chunks])
+    paths = np.concatenate([c["checkpoints"] for c in chunks])
+    bands = np.percentile(paths, PERCENTILES, axis=0) * config.starting_equity
+
+    return {
+        "simulations": config.simulations,
+        "trades_per_simulation": trades,
+        "sample_size": int(len(returns)),
+        "method": config.method,
+        "seed": seed,
+        "position_fraction": config.position_fraction,
+        "starting_equity": config.starting_equity,
+        "equity_bands": {
+            "trade": (checkpoints + 1).tolist(),
+            **{f"p{p}": np.round(band, 4).tolist() for p, band in zip(PERCENTILES, bands)},
+        },
+        "ending_equity": _percentiles(ending, config.starting_equity),
+        "max_drawdown_percentage": _percentiles(max_drawdown, 100.0),
+        "probability_of_profit": round(float(np.mean(ending > 1.0)) * 100, 2),
+        "risk_of_ruin": round(float(np.mean(ruined)) * 100, 2),
+        "ruin_threshold_percentage": config.ruin_threshold * 100,
+    }
+
+
+@lru_cache()
+def get_process_pool() -> ProcessPoolExecutor:
+    from app.config import get_settings
+
+    workers = get_settings().SIMULATION_WORKERS or os.cpu_count() or 1
+    return ProcessPoolExecutor(max_workers=workers)
+
+
+def shutdown_process_pool() -> None:
+    if get_process_pool.cache_info().currsize:
+        get_process_pool().shutdown(cancel_futures=True)
+        get_process_pool.cache_clear()
@@ -0,0 +1,190 @@
+"""
+Daily portfolio NAV.
+
+A portfolio's value at the close of an IST trading day (weekdays; exchange
+holidays are not modelled) is
+
+    cash  = initial balance + realized P&L - cost of open positions
+    NAV   = cash + cost of open positions + unrealized P&L
+
+Realized P&L is net of charges where they are known and is recognized on the
+day a trade closes (partial exits of multi-fill positions count when the
+position closes). Open positions are valued at the last stored price at or
+before the day's close, or at cost when there is none.
+
+Every quantity is a running sum over entries and exits, so a series of D days
+over N trades is a few sorts and ``searchsorted`` calls, O((N + D) log N),
+instead of replaying the trades day by day.
+
+Usage (from the backend directory):
+    python -m app.services.nav backfill [portfolio_id ...]
+"""
+from dataclasses import dataclass
+from datetime import date, datetime, timezone
+from typing import Callable, Optional, Sequence
+
+import numpy as np
+
+from app.services.market_time import ist_today
+
+# IST has no daylight saving: a fixed UTC offset
+IST_OFFSET_SECONDS = 5 * 3600 + 1800
+DAY_SECONDS = 86400
+
+
+@dataclass
+class NavSeries:
+    days: np.ndarray  # datetime64[D]
+    realized_profit_loss: np.ndarray
+    unrealized_profit_loss: np.ndarray
+    open_positions: np.ndarray
+    cash: np.ndarray
+    nav: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.days)
+
+
+def to_epoch(value: Optional[datetime]) -> float:
+    """Epoch seconds; naive values are UTC (as stored), None is +inf (never)"""
+    if value is None:
+        return np.inf
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+def trading_days(start: date, end: date) -> np.ndarray:
+    """Weekdays from ``start`` to ``end`` inclusive, as datetime64[D]"""
+    if end < start:
+        return np.empty(0, dtype="datetime64[D]")
+    days = np.arange(np.datetime64(start, "D"), np.datetime64(end, "D") + 1)
+    return days[np.is_busday(days)]
+
+
+def last_completed_trading_day(now: Optional[datetime] = None) -> date:
+    """The latest trading day before today (IST)"""
+    today = np.datetime64(ist_today(now), "D")
+    return np.busday_offset(today, -1, roll="forward").astype(date)
+
+
+def day_close_epochs(days: np.ndarray) -> np.ndarray:
+    """Epoch second at which each IST day ends (midnight IST of the next day)"""
+    midnight_utc = days.astype("datetime64[s]").astype(np.int64)
+    return midnight_utc - IST_OFFSET_SECONDS + DAY_SECONDS
+
+
+def _running(event_times: np.ndarray, values: np.ndarray, cutoffs: np.ndarray) -> np.ndarray:
+    """Sum of ``values`` whose event time is before each cutoff"""
+    order = np.argsort(event_times, kind="stable")
+    cumulative = np.concatenate(([0.0], np.cumsum(values[order])))
+    return cumulative[np.searchsorted(event_times[order], cutoffs, side="left")]
+
+
+def compute_nav(
+    days: np.ndarray,
+    initial_balance: float,
+    realized_before: float,
+    trades: Sequence,
+    prices_at: Callable[[str, np.ndarray], np.ndarray]
+) -> NavSeries:
+    """
+    NAV at the close of each day.
+
+    ``trades`` are rows with ``symbol``, ``trade_type``, ``entry_price``,
+    ``quantity``, ``open_quantity``, ``open_avg_price``, ``entry_date``,
+    ``exit_date``, ``profit_loss`` and ``net_profit_loss``; they must include
+    every trade still open at the first day or closed on or after it.
+    ``realized_before`` is the realized P&L of trades closed before then.
+    ``prices_at(symbol, epochs)`` returns the price at each epoch (NaN if none).
+    """
+    cutoffs = day_close_epochs(days).astype(np.float64)
+    n = len(trades)
+    entry = np.fromiter((to_epoch(t.entry_date) for t in trades), dtype=np.float64, count=n)
+    exit_ = np.fromiter((to_epoch(t.exit_date) for t in trades), dtype=np.float64, count=n)
+    realized = np.fromiter(
+        (
+            (t.net_profit_loss if t.net_profit_loss is not None else t.profit_loss or 0.0)
+            if t.exit_date is not None else 0.0
+            for t in trades
+        ),
+        dtype=np.float64, count=n
+    )
+    quantity = np.fromiter(
+        (t.quantity if t.open_quantity is None or t.exit_date is not None else t.open_quantity for t in trades),
+        dtype=np.float64, count=n
+    )
+    basis = np.fromiter(
+        (t.entry_price if t.open_avg_price is None or t.exit_date is not None else t.open_avg_price for t in trades),
+        dtype=np.float64, count=n
+    )
+    direction = np.fromiter(
+        (1.0 if getattr(t.trade_type, "value", t.trade_type) == "long" else -1.0 for t in trades),
+        dtype=np.float64, count=n
+    )
+    cost = basis * quantity
+
+    # A position is open at a cutoff when it was entered before it and not yet exited
+    def open_sum(values: np.ndarray) -> np.ndarray:
+        return _running(entry, values, cutoffs) - _running(exit_, values, cutoffs)
+
+    realized_cum = realized_before + _running(exit_, realized, cutoffs)
+    open_positions = np.rint(open_sum(np.ones(n))).astype(np.int64)
+    open_cost = open_sum(cost)
+
+    # Unrealized P&L per symbol: price * signed open quantity - signed open cost
+    unrealized = np.zeros(len(days))
+    symbols = np.array([t.symbol for t in trades], dtype=object)
+    for symbol in set(symbols.tolist()):
+        mask = symbols == symbol
+        signed_quantity = open_sum(np.where(mask, direction * quantity, 0.0))
+        if not np.any(signed_quantity):
+            continue
+        signed_cost = open_sum(np.where(mask, direction * cost, 0.0))
+        # Price at the last second of the day
+        prices = prices_at(symbol, cutoffs.astype(np.int64) - 1)
+        unrealized += np.where(np.isnan(prices), 0.0, prices * signed_quantity - signed_cost)
+
+    cash = initial_balance + realized_cum - open_cost
+    return NavSeries(
+        days=days,
+        realized_profit_loss=realized_cum,
+        unrealized_profit_loss=unrealized,
+        open_positions=open_positions,
+        cash=cash,
+        nav=cash + open_cost + unrealized,
+    )
+
+
+def period_return(nav_now: float, nav_before: Optional[float]) -> Optional[float]:
+    """Percentage return from ``nav_before`` to ``nav_now``; None if undefined"""
+    if nav_before is None or nav_before <= 0:
+        return None
+    return round((nav_now / nav_before - 1) * 100, 4)
+
+
+if __name__ == "__main__":
+    import argparse
+    import asyncio
+
+    parser = argparse.ArgumentParser(description="Rebuild daily NAV snapshots")
+    parser.add_argument("command", choices=["backfill"])
+    parser.add_argument("portfolio_ids", nargs="*", type=int, help="default: every portfolio")
+    parser.add_argument("--shard", type=int, help="shard the portfolio ids belong to (sharded storage)")
+    args = parser.parse_args()
+
+    from app.crud import snapshot as snapshot_crud
+    from app.database import get_sessionmaker, dispose_engine, use_shard
+    from app.services.shards import data_locations
+
+    async def backfill():
+        locations = [args.shard] if args.portfolio_ids else await data_locations()
+        for shard in locations:
+            with use_shard(shard):
+                async with get_sessionmaker()() as db:
+                    result = await snapshot_crud.backfill_snapshots(db, portfolio_ids=args.portfolio_ids or None)
+            where = "" if shard is None else f" on shard {shard}"
+            print(f"Wrote {result['snapshots']} snapshots for {result['portfolios']} portfolios{where}")
+        await dispose_engine()
+
+    asyncio.run(backfill())
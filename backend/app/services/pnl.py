@@ -0,0 +1,64 @@
+"""
+Vectorized P&L helpers.
+
+These mirror ``crud.trade.calculate_profit_loss`` but operate on NumPy arrays
+so whole portfolios can be valued in a single pass.
+"""
+from typing import Sequence, Tuple
+import numpy as np
+
+
+def profit_loss_arrays(
+    entry_price: np.ndarray,
+    exit_price: np.ndarray,
+    quantity: np.ndarray,
+    is_long: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """P&L and P&L percentage for each row; NaN exit prices give NaN results"""
+    entry_price = np.asarray(entry_price, dtype=np.float64)
+    exit_price = np.asarray(exit_price, dtype=np.float64)
+    quantity = np.asarray(quantity, dtype=np.float64)
+    direction = np.where(np.asarray(is_long, dtype=bool), 1.0, -1.0)
+
+    pl = direction * (exit_price - entry_price) * quantity
+    cost = entry_price * quantity
+    with np.errstate(divide="ignore", invalid="ignore"):
+        pl_percentage = np.where(cost != 0, pl / cost * 100, np.nan)
+    return pl, pl_percentage
+
+
+def unrealized_profit_loss(positions: Sequence, prices: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Unrealized P&L for open positions against an aligned array of last prices.
+
+    ``positions`` may be ORM trades or result rows with ``trade_type``,
+    ``entry_price``, ``quantity``, ``open_quantity`` and ``open_avg_price``.
+    Multi-fill positions are valued on their remaining open quantity and cost
+    basis. Positions without a price (NaN) yield NaN.
+    """
+    n = len(positions)
+    quantity = np.fromiter(
+        (p.quantity if p.open_quantity is None else p.open_quantity for p in positions),
+        dtype=np.float64, count=n
+    )
+    basis = np.fromiter(
+        (p.entry_price if p.open_avg_price is None else p.open_avg_price for p in positions),
+        dtype=np.float64, count=n
+    )
+    is_long = np.fromiter(
+        (getattr(p.trade_type, "value", p.trade_type) == "long" for p in positions),
+        dtype=bool, count=n
+    )
+    return profit_loss_arrays(basis, prices, quantity, is_long)
+
+
+def mark_to_market(trades: Sequence, prices: np.ndarray) -> np.ndarray:
+    """Set last price and unrealized P&L attributes on open trades; returns the P&L array"""
+    pl, pl_percentage = unrealized_profit_loss(trades, prices)
+
+    for trade, price, value, pct in zip(trades, prices.tolist(), pl.tolist(), pl_percentage.tolist()):
+        priced = price == price  # False for NaN
+        trade.last_price = price if priced else None
+        trade.unrealized_profit_loss = value if priced else None
+        trade.unrealized_profit_loss_percentage = pct if priced and pct == pct else None
+    return pl
@@ -0,0 +1,326 @@
+"""
+Local, offline price store.
+
+CSV files dropped into ``<PRICE_DATA_DIR>/incoming`` are ingested into a
+columnar store with one pair of ``.npy`` files per symbol (timestamps as
+int64 epoch seconds, prices as float64). Series are opened memory-mapped, so
+only the pages that are touched are read, and the latest price of every
+symbol is kept in an in-memory cache for mark-to-market lookups. Requests
+only read that cache; ``refresh_periodically`` (started by the app's
+lifespan) rebuilds it in a worker thread and swaps it in.
+
+CSV layout is detected from the header (case-insensitive):
+- symbol: ``symbol``, ``tradingsymbol`` or ``ticker``; if absent the file
+  name (without extension) is used as the symbol
+- time: ``timestamp``, ``datetime``, ``date`` or ``time``
+- price: ``close``, ``price``, ``ltp``, ``last_price`` or ``last``
+
+Naive timestamps are interpreted as IST. NSE bhavcopy files work as-is.
+
+Usage (from the backend directory):
+    python -m app.services.price_store ingest [directory]
+"""
+import asyncio
+import csv
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from datetime import datetime
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import quote, unquote
+
+import numpy as np
+
+from app.services.market_time import IST
+
+SYMBOL_COLUMNS = ("symbol", "tradingsymbol", "ticker")
+TIME_COLUMNS = ("timestamp", "datetime", "date", "time")
+PRICE_COLUMNS = ("close", "price", "ltp", "last_price", "last")
+DATE_FORMATS = ("%d-%b-%Y", "%d-%m-%Y", "%d/%m/%Y", "%Y%m%d", "%d-%b-%Y %H:%M:%S")
+
+MANIFEST_NAME = "manifest.json"
+
+logger = logging.getLogger("app.prices")
+
+
+def normalize_symbol(symbol: str) -> str:
+    return symbol.strip().upper()
+
+
+def parse_timestamp(value: str) -> int:
+    """Parse a CSV timestamp into epoch seconds (naive values are IST)"""
+    value = value.strip()
+    try:
+        dt = datetime.fromisoformat(value)
+    except ValueError:
+        for fmt in DATE_FORMATS:
+            try:
+                dt = datetime.strptime(value.title(), fmt)
+                break
+            except ValueError:
+                continue
+        else:
+            raise ValueError(f"Unrecognized timestamp: {value!r}")
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=IST)
+    return int(dt.timestamp())
+
+
+def _find_column(header: List[str], candidates: Tuple[str, ...]) -> Optional[int]:
+    lowered = [h.strip().lower() for h in header]
+    for name in candidates:
+        if name in lowered:
+            return lowered.index(name)
+    return None
+
+
+def read_price_csv(path: Path) -> Dict[str, Tuple[np.ndarray, np.ndarray]]:
+    """Read a CSV into per-symbol (timestamps, prices) arrays"""
+    rows: Dict[str, Tuple[List[int], List[float]]] = {}
+    with open(path, newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            return {}
+
+        symbol_idx = _find_column(header, SYMBOL_COLUMNS)
+        time_idx = _find_column(header, TIME_COLUMNS)
+        price_idx = _find_column(header, PRICE_COLUMNS)
+        if time_idx is None or price_idx is None:
+            raise ValueError(f"{path.name}: missing time or price column")
+        default_symbol = normalize_symbol(path.stem)
+
+        for record in reader:
+            if not record or len(record) <= max(time_idx, price_idx):
+                continue
+            price = record[price_idx].strip()
+            if not price:
+                continue
+            symbol = normalize_symbol(record[symbol_idx]) if symbol_idx is not None else default_symbol
+            timestamps, prices = rows.setdefault(symbol, ([], []))
+            timestamps.append(parse_timestamp(record[time_idx]))
+            prices.append(float(price))
+
+    return {
+        symbol: (np.asarray(ts, dtype=np.int64), np.asarray(px, dtype=np.float64))
+        for symbol, (ts, px) in rows.items()
+    }
+
+
+class PriceStore:
+    """Columnar, memory-mapped price series keyed by symbol"""
+
+    def __init__(self, root: Path, refresh_seconds: int = 60):
+        self.root = Path(root)
+        self.incoming_dir = self.root / "incoming"
+        self.store_dir = self.root / "store"
+        self.refresh_seconds = refresh_seconds
+        self._lock = threading.Lock()
+        self._series: Dict[str, Tuple[float, np.ndarray, np.ndarray]] = {}
+        self._latest: Dict[str, Tuple[int, float]] = {}
+        self._last_refresh = 0.0
+
+    # Paths
+
+    def _column_path(self, symbol: str, column: str) -> Path:
+        return self.store_dir / f"{quote(symbol, safe='')}.{column}.npy"
+
+    def symbols(self) -> List[str]:
+        if not self.store_dir.exists():
+            return []
+        return sorted(
+            unquote(p.name[:-len(".ts.npy")]) for p in self.store_dir.glob("*.ts.npy")
+        )
+
+    # Reading
+
+    def series(self, symbol: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Memory-mapped (timestamps, prices) for a symbol, empty if unknown"""
+        symbol = normalize_symbol(symbol)
+        ts_path = self._column_path(symbol, "ts")
+        try:
+            mtime = ts_path.stat().st_mtime
+        except FileNotFoundError:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+
+        cached = self._series.get(symbol)
+        if cached is not None and cached[0] == mtime:
+            return cached[1], cached[2]
+
+        ts = np.load(ts_path, mmap_mode="r")
+        px = np.load(self._column_path(symbol, "close"), mmap_mode="r")
+        self._series[symbol] = (mtime, ts, px)
+        if len(ts):
+            self._latest[symbol] = (int(ts[-1]), float(px[-1]))
+        return ts, px
+
+    def refresh(self) -> None:
+        """
+        Rebuild the latest-price cache from the store.
+
+        Blocking (it stats and may reload every stored series); run it in a
+        thread. Readers keep using the previous cache until the new one is
+        swapped in.
+        """
+        with self._lock:
+            latest = {}
+            for symbol in self.symbols():
+                try:
+                    ts, px = self.series(symbol)
+                except (OSError, ValueError):
+                    logger.exception("Could not read the stored prices of %s", symbol)
+                    continue
+                if len(ts):
+                    latest[symbol] = (int(ts[-1]), float(px[-1]))
+            self._latest = latest
+            self._last_refresh = time.monotonic()
+
+    async def refresh_periodically(self) -> None:
+        """Refresh the cache every ``refresh_seconds`` until cancelled"""
+        while True:
+            await asyncio.sleep(self.refresh_seconds)
+            try:
+                await asyncio.to_thread(self.refresh)
+            except Exception:
+                logger.exception("Refreshing the latest prices failed")
+
+    def latest_price(self, symbol: str) -> Optional[float]:
+        entry = self._latest.get(normalize_symbol(symbol))
+        return entry[1] if entry else None
+
+    def latest_prices(self, symbols: Iterable[str]) -> np.ndarray:
+        """Latest price for each symbol from the cache, NaN where no price is known"""
+        latest = self._latest
+        nan = (0, np.nan)
+        return np.array(
+            [latest.get(normalize_symbol(s), nan)[1] for s in symbols],
+            dtype=np.float64
+        )
+
+    def prices_at(self, symbol: str, timestamps: np.ndarray) -> np.ndarray:
+        """Last known price at or before each epoch timestamp (NaN before the first)"""
+        ts, px = self.series(symbol)
+        timestamps = np.asarray(timestamps, dtype=np.int64)
+        if len(ts) == 0:
+            return np.full(len(timestamps), np.nan)
+        idx = np.searchsorted(ts, timestamps, side="right") - 1
+        out = np.asarray(px)[np.clip(idx, 0, None)].astype(np.float64)
+        out[idx < 0] = np.nan
+        return out
+
+    # Writing
+
+    def write_series(self, symbol: str, ts: np.ndarray, px: np.ndarray) -> int:
+        """Merge new points into a symbol's series; later points win on duplicate timestamps"""
+        symbol = normalize_symbol(symbol)
+        old_ts, old_px = self.series(symbol)
+        all_ts = np.concatenate([np.asarray(old_ts), ts])
+        all_px = np.concatenate([np.asarray(old_px), px])
+
+        order = np.argsort(all_ts, kind="stable")
+        all_ts = all_ts[order]
+        all_px = all_px[order]
+        keep = np.append(all_ts[1:] != all_ts[:-1], True)
+        all_ts = all_ts[keep]
+        all_px = all_px[keep]
+
+        self.store_dir.mkdir(parents=True, exist_ok=True)
+        # Write to temporary files and swap in so readers never see partial data
+        for column, values in (("close", all_px), ("ts", all_ts)):
+            path = self._column_path(symbol, column)
+            tmp = path.with_name(path.name + ".tmp")
+            with open(tmp, "wb") as f:
+                np.save(f, values)
+            os.replace(tmp, path)
+
+        self._series.pop(symbol, None)
+        if len(all_ts):
+            self._latest[symbol] = (int(all_ts[-1]), float(all_px[-1]))
+        return len(all_ts)
+
+    def _load_manifest(self) -> Dict[str, list]:
+        try:
+            return json.loads((self.store_dir / MANIFEST_NAME).read_text())
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def _save_manifest(self, manifest: Dict[str, list]) -> None:
+        self.store_dir.mkdir(parents=True, exist_ok=True)
+        (self.store_dir / MANIFEST_NAME).write_text(json.dumps(manifest, indent=2))
+
+    def ingest_directory(self, directory: Optional[Path] = None) -> Dict[str, Any]:
+        """
+        Ingest new or modified CSV files from a directory.
+
+        Files already ingested (same size and modification time) are skipped,
+        so this is cheap to call on every startup. A file that can't be read
+        or parsed is logged, listed under ``failed`` and recorded in the
+        manifest with its error, so it is only tried again once it changes;
+        the other files are still ingested.
+        """
+        directory = Path(directory) if directory else self.incoming_dir
+        stats: Dict[str, Any] = {"files": 0, "rows": 0, "symbols": 0, "failed": []}
+        if not directory.exists():
+            return stats
+
+        with self._lock:
+            manifest = self._load_manifest()
+            pending: Dict[str, List[Tuple[np.ndarray, np.ndarray]]] = {}
+            changed = False
+
+            for path in sorted(directory.glob("*.csv")):
+                try:
+                    st = path.stat()
+                except OSError:
+                    continue  # removed while listing
+                key = str(path.resolve())
+                signature = [st.st_size, st.st_mtime]
+                if manifest.get(key, [])[:2] == signature:
+                    continue
+                changed = True
+                try:
+                    series = read_price_csv(path)
+                except (OSError, ValueError, UnicodeDecodeError, csv.Error) as e:
+                    error = str(e)
+                    logger.warning("Skipping price file %s: %s", path.name, error)
+                    manifest[key] = signature + [error]
+                    stats["failed"].append({"file": path.name, "error": error})
+                    continue
+                for symbol, arrays in series.items():
+                    pending.setdefault(symbol, []).append(arrays)
+                    stats["rows"] += len(arrays[0])
+                manifest[key] = signature
+                stats["files"] += 1
+
+            for symbol, chunks in pending.items():
+                ts = np.concatenate([c[0] for c in chunks])
+                px = np.concatenate([c[1] for c in chunks])
+                self.write_series(symbol, ts, px)
+            stats["symbols"] = len(pending)
+
+            if changed:
+                self._save_manifest(manifest)
+        return stats
+
+
+@lru_cache()
+def get_price_store() -> PriceStore:
+    from app.config import get_settings
+    settings = get_settings()
+    return PriceStore(Path(settings.PRICE_DATA_DIR), settings.PRICE_REFRESH_SECONDS)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] != "ingest":
+        print("Usage: python -m app.services.price_store ingest [directory]")
+        sys.exit(1)
+    store = get_price_store()
+    result = store.ingest_directory(Path(sys.argv[2]) if len(sys.argv) > 2 else None)
+    print(f"Ingested {result['rows']} rows for {result['symbols']} symbols from {result['files']} files")
+    for failure in result["failed"]:
+        print(f"Skipped {failure['file']}: {failure['error']}")
@@ -0,0 +1,83 @@
+"""
+Storage for on-demand request profiles.
+
+``app.middleware.profiling`` runs pyinstrument for a request an admin asked
+to profile and saves the report here under an id returned in the
+``X-Profile-Id`` header. Each profile is kept as a speedscope JSON file
+(open it at https://www.speedscope.app), an HTML flame view and a small
+metadata file; only the newest ``PROFILE_MAX_REPORTS`` are kept.
+"""
+import json
+import re
+import secrets
+import time
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from app.config import get_settings
+
+PROFILE_FORMATS = {
+    "speedscope": (".speedscope.json", "application/json"),
+    "html": (".html", "text/html"),
+}
+_META_SUFFIX = ".meta.json"
+PROFILE_ID_PATTERN = re.compile(r"^\d+-[0-9a-f]{8}$")
+
+
+def new_profile_id() -> str:
+    # Sorts by creation time
+    return f"{time.time_ns() // 1_000_000}-{secrets.token_hex(4)}"
+
+
+class ProfileStore:
+    def __init__(self, directory: Path, max_reports: int):
+        self.directory = directory
+        self.max_reports = max_reports
+
+    def save(self, profile_id: str, session: Any, meta: Dict[str, Any]) -> None:
+        """Render a pyinstrument session in every format; blocking, run it in a thread"""
+        from pyinstrument.renderers import HTMLRenderer, SpeedscopeRenderer
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        (self.directory / f"{profile_id}.speedscope.json").write_text(SpeedscopeRenderer().render(session))
+        (self.directory / f"{profile_id}.html").write_text(HTMLRenderer().render(session))
+        (self.directory / f"{profile_id}{_META_SUFFIX}").write_text(json.dumps({"id": profile_id, **meta}))
+        self._prune()
+
+    def _prune(self) -> None:
+        ids = self._ids()
+        for profile_id in ids[:max(len(ids) - self.max_reports, 0)]:
+            for path in self.directory.glob(f"{profile_id}.*"):
+                path.unlink(missing_ok=True)
+
+    def _ids(self) -> List[str]:
+        """Stored profile ids, oldest first"""
+        if not self.directory.exists():
+            return []
+        return sorted(
+            (p.name[:-len(_META_SUFFIX)] for p in self.directory.glob(f"*{_META_SUFFIX}")),
+            key=lambda i: (int(i.split("-")[0]), i)
+        )
+
+    def list(self) -> List[Dict[str, Any]]:
+        """Metadata of stored profiles, newest first"""
+        profiles = []
+        for profile_id in reversed(self._ids()):
+            try:
+                profiles.append(json.loads((self.directory / f"{profile_id}{_META_SUFFIX}").read_text()))
+            except (OSError, ValueError):
+                continue  # pruned or half-written
+        return profiles
+
+    def path(self, profile_id: str, fmt: str) -> Optional[Path]:
+        if not PROFILE_ID_PATTERN.match(profile_id) or fmt not in PROFILE_FORMATS:
+            return None
+        path = self.directory / f"{profile_id}{PROFILE_FORMATS[fmt][0]}"
+        return path if path.exists() else None
+
+
+@lru_cache()
+def get_profile_store() -> ProfileStore:
+    settings = get_settings()
+    return ProfileStore(Path(settings.PROFILE_DIR), settings.PROFILE_MAX_REPORTS)
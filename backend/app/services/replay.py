@@ -0,0 +1,145 @@
+"""
+Replay of the trade event log into derived state.
+
+A projection applies batches of trade events (see ``app.models.trade_event``)
+to a derived table and is registered with ``@projection("name")``. Replay
+reads the events after the projection's checkpoint in id order, a batch at a
+time with keyset pagination, so memory stays flat however long the log is.
+Each batch is applied and the checkpoint advanced in one transaction: an
+interrupted replay resumes where it stopped, and replaying twice does not
+apply a batch twice.
+
+Usage (from the backend directory):
+    python -m app.services.replay                  # every projection, from its checkpoint
+    python -m app.services.replay snapshots --from-start
+"""
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.crud import snapshot as snapshot_crud
+from app.models import Portfolio, TradeEvent, ProjectionCheckpoint
+
+REPLAY_BATCH_SIZE = 5000
+
+
+@dataclass
+class ProjectionSpec:
+    apply: Callable[[AsyncSession, Sequence[Any]], Awaitable[None]]
+    # Clears the derived state before a replay from the start of the log
+    reset: Optional[Callable[[AsyncSession], Awaitable[None]]] = None
+
+
+PROJECTIONS: Dict[str, ProjectionSpec] = {}
+
+
+def projection(name: str, reset: Optional[Callable[[AsyncSession], Awaitable[None]]] = None):
+    """Register a coroutine function ``apply(db, events)`` as a projection"""
+    def decorator(func):
+        PROJECTIONS[name] = ProjectionSpec(func, reset)
+        return func
+    return decorator
+
+
+def _event_times(event: Any, field: str) -> List[datetime]:
+    """Values of a timestamp field in an event's state and on both sides of its changes"""
+    values = [(event.state or {}).get(field)]
+    values.extend((event.changes or {}).get(field) or [])
+    return [datetime.fromisoformat(v) for v in values if v]
+
+
+async def _extend_snapshots(db: AsyncSession, portfolio_ids: Optional[List[int]] = None) -> None:
+    query = select(Portfolio).order_by(Portfolio.id)
+    if portfolio_ids is not None:
+        query = query.where(Portfolio.id.in_(portfolio_ids))
+    for portfolio in (await db.execute(query)).scalars():
+        await snapshot_crud.extend_snapshots(db, portfolio)
+
+
+async def _reset_snapshots(db: AsyncSession) -> None:
+    await snapshot_crud.invalidate_snapshots(db)
+    await _extend_snapshots(db)
+
+
+@projection("snapshots", reset=_reset_snapshots)
+async def snapshots(db: AsyncSession, events: Sequence[Any]) -> None:
+    """Rebuild daily NAV snapshots from the first day each event affects"""
+    earliest: Dict[int, List[datetime]] = {}
+    for event in events:
+        earliest.setdefault(event.portfolio_id, []).extend(_event_times(event, "entry_date"))
+    for portfolio_id, times in earliest.items():
+        await snapshot_crud.invalidate_snapshots(db, [portfolio_id], snapshot_crud.first_day(*times))
+    # Deleted portfolios have events but nothing to rebuild
+    await _extend_snapshots(db, list(earliest))
+
+
+async def replay(
+    db: AsyncSession,
+    name: str,
+    from_start: bool = False,
+    batch_size: int = REPLAY_BATCH_SIZE
+) -> Dict[str, Any]:
+    """Apply the events after a projection's checkpoint (or all of them) and commit per batch"""
+    spec = PROJECTIONS.get(name)
+    if spec is None:
+        raise ValueError(f"Unknown projection: {name}")
+
+    checkpoint = await db.get(ProjectionCheckpoint, name)
+    if checkpoint is None:
+        checkpoint = ProjectionCheckpoint(name=name, last_event_id=0)
+        db.add(checkpoint)
+    if from_start:
+        if spec.reset is not None:
+            await spec.reset(db)
+        checkpoint.last_event_id = 0
+    await db.commit()
+
+    applied = batches = 0
+    while True:
+        result = await db.execute(
+            select(TradeEvent.id, TradeEvent.trade_id, TradeEvent.portfolio_id, TradeEvent.kind,
+                   TradeEvent.changes, TradeEvent.state)
+            .where(TradeEvent.id > checkpoint.last_event_id)
+            .order_by(TradeEvent.id)
+            .limit(batch_size)
+        )
+        events = result.all()
+        if not events:
+            break
+        await spec.apply(db, events)
+        checkpoint.last_event_id = events[-1].id
+        await db.commit()
+        applied += len(events)
+        batches += 1
+    return {"projection": name, "events": applied, "batches": batches, "last_event_id": checkpoint.last_event_id}
+
+
+if __name__ == "__main__":
+    import argparse
+    import asyncio
+
+    parser = argparse.ArgumentParser(description="Rebuild derived state from the trade event log")
+    parser.add_argument("projections", nargs="*", help=f"default: all ({', '.join(PROJECTIONS)})")
+    parser.add_argument("--from-start", action="store_true", help="reset and replay the whole log")
+    parser.add_argument("--batch-size", type=int, default=REPLAY_BATCH_SIZE)
+    args = parser.parse_args()
+
+    from app.database import get_sessionmaker, dispose_engine, use_shard
+    from app.services.shards import data_locations
+
+    async def main():
+        # Each shard has its own log and checkpoints
+        for shard in await data_locations():
+            with use_shard(shard):
+                async with get_sessionmaker()() as db:
+                    for name in args.projections or list(PROJECTIONS):
+                        result = await replay(db, name, from_start=args.from_start, batch_size=args.batch_size)
+                        where = "" if shard is None else f" [shard {shard}]"
+                        print(f"{name}{where}: {result['events']} events in {result['batches']} batches "
+                              f"(checkpoint {result['last_event_id']})")
+        await dispose_engine()
+
+    asyncio.run(main())
@@ -0,0 +1,71 @@
+"""
+In-process cache for expensive read-only results, with single-flight misses.
+
+Keys include a data version (for portfolios, the id of their latest trade
+event), so a write makes new requests miss without any explicit
+invalidation, in this process or another; superseded entries age out by
+TTL and LRU order. Concurrent misses for the same key share one computation
+instead of running the same scan side by side.
+
+The shared computation runs as its own task: a caller that goes away
+(e.g. a closed tab) doesn't cancel it for the others. It must therefore not
+use the caller's database session; ``compute`` opens its own.
+"""
+import asyncio
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+from app.config import get_settings
+from app.metrics import ANALYTICS_CACHE_REQUESTS, ANALYTICS_CACHE_ENTRIES
+
+
+class ResultCache:
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._in_flight: Dict[Hashable, asyncio.Future] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def get_or_compute(self, endpoint: str, key: Hashable, compute: Callable[[], Awaitable[Any]]) -> Any:
+        """Cached result for ``(endpoint, key)``, computing it at most once at a time"""
+        key = (endpoint, key)
+        entry = self._entries.get(key)
+        if entry is not None and time.monotonic() - entry[0] < self.ttl_seconds:
+            self._entries.move_to_end(key)
+            ANALYTICS_CACHE_REQUESTS.labels(endpoint, "hit").inc()
+            return entry[1]
+
+        task = self._in_flight.get(key)
+        if task is not None:
+            ANALYTICS_CACHE_REQUESTS.labels(endpoint, "coalesced").inc()
+        else:
+            ANALYTICS_CACHE_REQUESTS.labels(endpoint, "miss").inc()
+            task = asyncio.ensure_future(compute())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        return await asyncio.shield(task)
+
+    def _finish(self, key: Hashable, task: asyncio.Future) -> None:
+        self._in_flight.pop(key, None)
+        if task.cancelled() or task.exception() is not None:
+            return  # the waiters get the error; the next request tries again
+        self._entries[key] = (time.monotonic(), task.result())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+@lru_cache()
+def get_analytics_cache() -> ResultCache:
+    settings = get_settings()
+    cache = ResultCache(settings.ANALYTICS_CACHE_MAX_ENTRIES, settings.ANALYTICS_CACHE_TTL_SECONDS)
+    ANALYTICS_CACHE_ENTRIES.set_function(lambda: len(cache))
+    return cache
@@ -0,0 +1,263 @@
+"""
+Per-portfolio risk rules checked when trades are entered or closed.
+
+Rules are evaluated against counters for the current IST trading day held in
+process memory: realized net P&L of trades closed today, trades entered
+today, open positions and open exposure (at cost) per symbol. Counters are
+seeded with one query the first time a portfolio is checked and then moved
+by each entry and close made through this process, so a check is a few
+dictionary lookups and comparisons.
+
+Every write to a trade appends a trade event (see ``app.crud.trade_event``);
+counters remember the latest event id they reflect, and are re-seeded when
+the portfolio has events they haven't seen (edits, fills, batches, jobs or
+another API process) or when the IST day rolls over.
+
+Entries that break a ``reject`` rule are refused; closes are never refused,
+since a close only reduces risk, so their violations are warnings.
+"""
+import asyncio
+import weakref
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+from app.models.risk_rule import RiskRuleKind, RiskAction
+from app.services.market_time import ist_today
+
+# Portfolios whose counters are kept; the least recently checked are dropped
+MAX_TRACKED_PORTFOLIOS = 10_000
+
+
+@dataclass(frozen=True)
+class Rule:
+    kind: RiskRuleKind
+    limit: float
+    action: RiskAction
+
+
+@dataclass
+class Violation:
+    kind: RiskRuleKind
+    action: RiskAction
+    limit: float
+    value: float
+    message: str
+
+
+@dataclass
+class Contribution:
+    """What one trade adds to a portfolio's counters on ``day``"""
+    symbol: str
+    is_open: bool
+    exposure: float
+    entered_today: bool
+    realized_today: float
+
+
+@dataclass
+class DayCounters:
+    day: date
+    last_event_id: int
+    realized_profit_loss: float = 0.0
+    trades_entered: int = 0
+    open_positions: int = 0
+    exposure: Dict[str, float] = field(default_factory=dict)
+
+    def add(self, item: Contribution, sign: int = 1) -> None:
+        self.realized_profit_loss += sign * item.realized_today
+        self.trades_entered += sign * item.entered_today
+        if item.is_open:
+            self.open_positions += sign
+            exposure = self.exposure.get(item.symbol, 0.0) + sign * item.exposure
+            if abs(exposure) < 0.005:
+                self.exposure.pop(item.symbol, None)
+            else:
+                self.exposure[item.symbol] = exposure
+
+    def remove(self, item: Contribution) -> None:
+        self.add(item, -1)
+
+
+class RiskRuleViolation(Exception):
+    """An entry broke at least one ``reject`` rule"""
+
+    def __init__(self, violations: List[Violation]):
+        self.violations = violations
+        super().__init__("; ".join(v.message for v in violations))
+
+
+def _on_day(value: Optional[datetime], day: date) -> bool:
+    return value is not None and ist_today(value) == day
+
+
+def _value(trade: Any, name: str) -> Any:
+    return trade.get(name) if isinstance(trade, dict) else getattr(trade, name, None)
+
+
+def contribution(trade: Any, day: date) -> Contribution:
+    """Counter contribution of a trade (a model, row or state dict) on ``day``"""
+    status = _value(trade, "status")
+    is_open = getattr(status, "value", status) in (None, "open")
+    quantity, price = _value(trade, "quantity"), _value(trade, "entry_price")
+    # Multi-fill positions that were partly exited hold only their remainder
+    if _value(trade, "open_quantity") is not None:
+        quantity = _value(trade, "open_quantity")
+        price = _value(trade, "open_avg_price") or price
+    realized = 0.0
+    if not is_open and _on_day(_value(trade, "exit_date"), day):
+        net = _value(trade, "net_profit_loss")
+        realized = net if net is not None else _value(trade, "profit_loss") or 0.0
+    return Contribution(
+        symbol=_value(trade, "symbol"),
+        is_open=is_open,
+        exposure=quantity * price if is_open else 0.0,
+        entered_today=_on_day(_value(trade, "entry_date"), day),
+        realized_today=realized,
+    )
+
+
+def _daily_loss(rule: Rule, counters: DayCounters) -> Optional[Violation]:
+    loss = -counters.realized_profit_loss
+    if loss < rule.limit:
+        return None
+    return Violation(
+        rule.kind, rule.action, rule.limit, round(loss, 2),
+        f"Today's realized loss {loss:.2f} has reached the daily limit of {rule.limit:.2f}"
+    )
+
+
+def check_entry(rules: List[Rule], counters: DayCounters, entry: Contribution) -> List[Violation]:
+    """Violations the entry would cause; backdated entries don't count as today's trades"""
+    violations = []
+    for rule in rules:
+        violation = None
+        if rule.kind == RiskRuleKind.MAX_DAILY_LOSS:
+            violation = _daily_loss(rule, counters)
+        elif rule.kind == RiskRuleKind.MAX_OPEN_POSITIONS and entry.is_open:
+            count = counters.open_positions + 1
+            if count > rule.limit:
+                violation = Violation(
+                    rule.kind, rule.action, rule.limit, count,
+                    f"{count} open positions would exceed the limit of {rule.limit:g}"
+                )
+        elif rule.kind == RiskRuleKind.MAX_SYMBOL_EXPOSURE and entry.is_open:
+            exposure = counters.exposure.get(entry.symbol, 0.0) + entry.exposure
+            if exposure > rule.limit:
+                violation = Violation(
+                    rule.kind, rule.action, rule.limit, round(exposure, 2),
+                    f"Exposure to {entry.symbol} of {exposure:.2f} would exceed the limit of {rule.limit:.2f}"
+                )
+        elif rule.kind == RiskRuleKind.MAX_TRADES_PER_DAY and entry.entered_today:
+            count = counters.trades_entered + 1
+            if count > rule.limit:
+                violation = Violation(
+                    rule.kind, rule.action, rule.limit, count,
+                    f"{count} trades today would exceed the limit of {rule.limit:g}"
+                )
+        if violation is not None:
+            violations.append(violation)
+    return violations
+
+
+def check_close(rules: List[Rule], counters: DayCounters) -> List[Violation]:
+    """Warnings after a close has been counted; closes are never rejected"""
+    violations = []
+    for rule in rules:
+        if rule.kind == RiskRuleKind.MAX_DAILY_LOSS:
+            violation = _daily_loss(rule, counters)
+            if violation is not None:
+                violation.action = RiskAction.WARN
+                violations.append(violation)
+    return violations
+
+
+def breached(rules: List[Rule], counters: DayCounters) -> List[Violation]:
+    """Rules at their limit already, so the next entry (of the symbol) would break them"""
+    violations = []
+    for rule in rules:
+        if rule.kind == RiskRuleKind.MAX_DAILY_LOSS:
+            violation = _daily_loss(rule, counters)
+            if violation is not None:
+                violations.append(violation)
+        elif rule.kind == RiskRuleKind.MAX_SYMBOL_EXPOSURE:
+            violations.extend(
+                Violation(
+                    rule.kind, rule.action, rule.limit, round(exposure, 2),
+                    f"Exposure to {symbol} of {exposure:.2f} has reached the limit of {rule.limit:.2f}"
+                )
+                for symbol, exposure in sorted(counters.exposure.items()) if exposure >= rule.limit
+            )
+        else:
+            label, count = (
+                ("open positions", counters.open_positions) if rule.kind == RiskRuleKind.MAX_OPEN_POSITIONS
+                else ("trades today", counters.trades_entered)
+            )
+            if count >= rule.limit:
+                violations.append(Violation(
+                    rule.kind, rule.action, rule.limit, count, f"{count} {label}, the limit is {rule.limit:g}"
+                ))
+    return violations
+
+
+def rejections(violations: List[Violation]) -> List[Violation]:
+    return [v for v in violations if v.action == RiskAction.REJECT]
+
+
+@dataclass
+class Check:
+    """A check made before a write, finished once the write has committed"""
+    portfolio_id: int
+    rules: List[Rule]
+    counters: DayCounters
+    before: Optional[Dict[str, Any]]
+    warnings: List[Violation]
+
+
+class CounterStore:
+    """Day counters and per-portfolio locks of this process"""
+
+    def __init__(self, max_portfolios: int = MAX_TRACKED_PORTFOLIOS):
+        self.max_portfolios = max_portfolios
+        self._counters: "OrderedDict[Hashable, DayCounters]" = OrderedDict()
+        self._locks: "weakref.WeakValueDictionary[Hashable, asyncio.Lock]" = weakref.WeakValueDictionary()
+
+    def get(self, key: Hashable, day: date, last_event_id: int) -> Optional[DayCounters]:
+        """Counters that are still current, or None when they must be seeded"""
+        counters = self._counters.get(key)
+        if counters is None or counters.day != day or counters.last_event_id != last_event_id:
+            return None
+        self._counters.move_to_end(key)
+        return counters
+
+    def put(self, key: Hashable, counters: DayCounters) -> None:
+        self._counters[key] = counters
+        self._counters.move_to_end(key)
+        while len(self._counters) > self.max_portfolios:
+            self._counters.popitem(last=False)
+
+    def discard(self, key: Hashable) -> None:
+        self._counters.pop(key, None)
+
+    def clear(self) -> None:
+        self._counters.clear()
+
+    def lock(self, key: Hashable) -> asyncio.Lock:
+        """Serializes check-then-write for one portfolio within this process"""
+        lock = self._locks.get(key)
+        if lock is None:
+            lock = self._locks[key] = asyncio.Lock()
+        return lock
+
+
+_store = CounterStore()
+
+
+def get_counter_store() -> CounterStore:
+    return _store
+
+
+def counter_key(shard: Optional[int], portfolio_id: int) -> Tuple[Optional[int], int]:
+    # Portfolio ids are only unique within one database
+    return shard, portfolio_id
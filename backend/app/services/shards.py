@@ -0,0 +1,304 @@
+"""
+Sharded storage: where each user's data lives, and moving users between shards.
+
+With ``SHARDING=fixed`` new users are placed on the least-loaded of
+``SHARD_COUNT`` databases; with ``per_user`` each user gets a database of
+their own. Either way writes of different users on different shards don't
+wait for each other's SQLite write lock. The directory database
+(``DATABASE_URL``) keeps users, jobs and charge rates, and the data of users
+without a shard (everyone, before sharding was switched on).
+
+Every shard has the full schema and a stub row for each user it holds,
+so foreign keys and ``ON DELETE CASCADE`` work inside a shard as they do in a
+single database. Sessions pick the database per table (``app.database.RoutingSession``).
+
+Moving a user copies their portfolios, trades, fills, snapshots and trade
+events to the target and deletes them from the source. Row ids are
+reassigned in the target (ids are only unique within a database), so move
+users while they are not using the app.
+
+Usage (from the backend directory):
+    python -m app.services.shards status
+    python -m app.services.shards move <user_id> <shard|directory>
+    python -m app.services.shards rebalance [--dry-run]
+"""
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from sqlalchemy import select, delete, insert, func
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+
+from app.config import get_settings
+from app.database import (
+    Base, get_sessionmaker, engine_for_shard, get_shard_engine, upgrade_database
+)
+from app.models import User
+
+# Ids per IN list when reading a user's rows
+_ID_CHUNK = 500
+
+_prepared: Set[int] = set()
+
+
+def _table(name: str):
+    return Base.metadata.tables[name]
+
+
+def _chunks(ids: List[int]) -> Iterable[List[int]]:
+    for i in range(0, len(ids), _ID_CHUNK):
+        yield ids[i:i + _ID_CHUNK]
+
+
+async def known_shards() -> List[int]:
+    """Shards in use, plus every configured shard with ``SHARDING=fixed``"""
+    async with get_sessionmaker()() as db:
+        shards = set((await db.execute(select(User.shard).where(User.shard.is_not(None)).distinct())).scalars())
+    if get_settings().SHARDING == "fixed":
+        shards.update(range(get_settings().SHARD_COUNT))
+    return sorted(shards)
+
+
+async def data_locations() -> List[Optional[int]]:
+    """Every database that can hold user data: the directory (None) and each shard"""
+    return [None, *(await known_shards())]
+
+
+def ensure_shard_directory(shard: int) -> None:
+    """SQLite creates a missing database file but not its directory"""
+    url = make_url(get_settings().SHARD_URL_TEMPLATE.format(shard=shard))
+    if url.get_backend_name() == "sqlite" and url.database and url.database != ":memory:":
+        Path(url.database).parent.mkdir(parents=True, exist_ok=True)
+
+
+async def prepare_shard(shard: int) -> None:
+    """Create a shard's database and bring its schema up to date, once per process"""
+    if shard in _prepared:
+        return
+    ensure_shard_directory(shard)
+    await upgrade_database(get_shard_engine(shard))
+    _prepared.add(shard)
+
+
+async def choose_shard(db: AsyncSession, user_id: int) -> Optional[int]:
+    """Shard for a new user: their own with ``per_user``, the least-loaded one with ``fixed``"""
+    mode = get_settings().SHARDING
+    if mode == "per_user":
+        return user_id
+    if mode == "fixed":
+        counts = Counter(dict((await db.execute(
+            select(User.shard, func.count()).where(User.shard.is_not(None)).group_by(User.shard)
+        )).all()))
+        return min(range(get_settings().SHARD_COUNT), key=lambda shard: (counts[shard], shard))
+    return None
+
+
+def _user_values(user: Any) -> Dict[str, Any]:
+    # The shard's copy exists for foreign keys; credentials stay in the directory
+    return {"id": user.id, "email": user.email, "username": user.username, "hashed_password": "", "shard": user.shard}
+
+
+async def _add_replica(conn: AsyncConnection, user_values: Dict[str, Any]) -> None:
+    users = _table("users")
+    exists = await conn.scalar(select(users.c.id).where(users.c.id == user_values["id"]))
+    if exists is None:
+        await conn.execute(insert(users), [user_values])
+
+
+async def add_user_to_shard(user: User) -> None:
+    """Create the shard's copy of a user row before the user's first write there"""
+    if user.shard is None:
+        return
+    await prepare_shard(user.shard)
+    async with get_shard_engine(user.shard).begin() as conn:
+        await _add_replica(conn, _user_values(user))
+
+
+async def delete_user_data(user_id: int, shard: Optional[int]) -> None:
+    """Delete a user's portfolios (cascading to everything under them) and shard copy of the user"""
+    portfolios, users = _table("portfolios"), _table("users")
+    async with engine_for_shard(shard).begin() as conn:
+        await conn.execute(delete(portfolios).where(portfolios.c.user_id == user_id))
+        if shard is not None:
+            await conn.execute(delete(users).where(users.c.id == user_id))
+
+
+async def _read_user_rows(conn: AsyncConnection, user_id: int) -> Dict[str, List[Dict[str, Any]]]:
+    portfolios = _table("portfolios")
+    rows = {"portfolios": [dict(r._mapping) for r in await conn.execute(
+        select(portfolios).where(portfolios.c.user_id == user_id).order_by(portfolios.c.id)
+    )]}
+    portfolio_ids = [r["id"] for r in rows["portfolios"]]
+    for name in ("trades", "portfolio_snapshots", "trade_events", "risk_rules"):
+        table = _table(name)
+        rows[name] = []
+        for chunk in _chunks(portfolio_ids):
+            result = await conn.execute(select(table).where(table.c.portfolio_id.in_(chunk)).order_by(table.c.id))
+            rows[name].extend(dict(r._mapping) for r in result)
+    fills = _table("fills")
+    rows["fills"] = []
+    for chunk in _chunks([r["id"] for r in rows["trades"]]):
+        result = await conn.execute(select(fills).where(fills.c.trade_id.in_(chunk)).order_by(fills.c.id))
+        rows["fills"].extend(dict(r._mapping) for r in result)
+    return rows
+
+
+async def _id_map(conn: AsyncConnection, name: str, old_ids: Iterable[int]) -> Dict[int, int]:
+    """New ids after the target's current maximum; stable while this transaction holds the write lock"""
+    table = _table(name)
+    base = await conn.scalar(select(func.coalesce(func.max(table.c.id), 0)))
+    return {old: base + i for i, old in enumerate(sorted(set(old_ids)), start=1)}
+
+
+def _remap_pair(value: Any, id_map: Dict[int, int]) -> Any:
+    return [id_map.get(v, v) for v in value] if isinstance(value, list) else value
+
+
+async def _write_user_rows(conn: AsyncConnection, rows: Dict[str, List[Dict[str, Any]]]) -> None:
+    portfolio_ids = await _id_map(conn, "portfolios", (r["id"] for r in rows["portfolios"]))
+    # Events of deleted trades keep a trade id of their own too
+    trade_ids = await _id_map(
+        conn, "trades", [r["id"] for r in rows["trades"]] + [e["trade_id"] for e in rows["trade_events"]]
+    )
+    fill_ids = await _id_map(conn, "fills", (r["id"] for r in rows["fills"]))
+    snapshot_ids = await _id_map(conn, "portfolio_snapshots", (r["id"] for r in rows["portfolio_snapshots"]))
+    event_ids = await _id_map(conn, "trade_events", (r["id"] for r in rows["trade_events"]))
+    rule_ids = await _id_map(conn, "risk_rules", (r["id"] for r in rows["risk_rules"]))
+
+    for r in rows["portfolios"]:
+        r["id"] = portfolio_ids[r["id"]]
+    for r in rows["trades"]:
+        r["id"], r["portfolio_id"] = trade_ids[r["id"]], portfolio_ids[r["portfolio_id"]]
+    for r in rows["fills"]:
+        r["id"], r["trade_id"] = fill_ids[r["id"]], trade_ids[r["trade_id"]]
+    for r in rows["portfolio_snapshots"]:
+        r["id"], r["portfolio_id"] = snapshot_ids[r["id"]], portfolio_ids[r["portfolio_id"]]
+    for r in rows["trade_events"]:
+        r["id"], r["trade_id"] = event_ids[r["id"]], trade_ids[r["trade_id"]]
+        r["portfolio_id"] = portfolio_ids[r["portfolio_id"]]
+        if r["state"] and "portfolio_id" in r["state"]:
+            r["state"] = {**r["state"], "portfolio_id": portfolio_ids.get(r["state"]["portfolio_id"])}
+        if r["changes"] and "portfolio_id" in r["changes"]:
+            r["changes"] = {**r["changes"], "portfolio_id": _remap_pair(r["changes"]["portfolio_id"], portfolio_ids)}
+
+    for r in rows["risk_rules"]:
+        r["id"], r["portfolio_id"] = rule_ids[r["id"]], portfolio_ids[r["portfolio_id"]]
+
+    for name in ("portfolios", "trades", "fills", "portfolio_snapshots", "trade_events", "risk_rules"):
+        for i in range(0, len(rows[name]), 5000):
+            await conn.execute(insert(_table(name)), rows[name][i:i + 5000])
+
+
+async def move_user(user_id: int, target: Optional[int]) -> Dict[str, Any]:
+    """Move a user's data to ``target`` (None: the directory database)"""
+    async with get_sessionmaker()() as db:
+        user = await db.get(User, user_id)
+        if user is None:
+            raise ValueError(f"No user {user_id}")
+        source = user.shard
+        if source == target:
+            return {"user_id": user_id, "from": source, "to": target, "rows": 0}
+
+        async with engine_for_shard(source).connect() as conn:
+            rows = await _read_user_rows(conn, user_id)
+
+        if target is not None:
+            await prepare_shard(target)
+        async with engine_for_shard(target).begin() as conn:
+            # Leftovers of an interrupted move go first; the DELETE also takes the write lock
+            portfolios = _table("portfolios")
+            await conn.execute(delete(portfolios).where(portfolios.c.user_id == user_id))
+            if target is not None:
+                await _add_replica(conn, _user_values(user))
+            await _write_user_rows(conn, rows)
+
+        user.shard = target
+        await db.commit()
+    await delete_user_data(user_id, source)
+    return {"user_id": user_id, "from": source, "to": target, "rows": sum(len(r) for r in rows.values())}
+
+
+async def plan_rebalance() -> List[Dict[str, Any]]:
+    """
+    Moves that put every user on a shard of the current configuration.
+
+    ``per_user``: users not in their own database move there. ``fixed``:
+    users outside ``range(SHARD_COUNT)`` (or without a shard) move to the
+    least-loaded shard, then users move from the fullest shards until user
+    counts differ by at most one. ``off``: everyone moves to the directory.
+    """
+    settings = get_settings()
+    async with get_sessionmaker()() as db:
+        users = (await db.execute(select(User.id, User.shard).order_by(User.id))).all()
+
+    if settings.SHARDING == "off":
+        return [{"user_id": u.id, "from": u.shard, "to": None} for u in users if u.shard is not None]
+    if settings.SHARDING == "per_user":
+        return [{"user_id": u.id, "from": u.shard, "to": u.id} for u in users if u.shard != u.id]
+
+    shard_ids = range(settings.SHARD_COUNT)
+    members: Dict[int, List[int]] = {shard: [] for shard in shard_ids}
+    homeless = []
+    for u in users:
+        if u.shard in members:
+            members[u.shard].append(u.id)
+        else:
+            homeless.append(u)
+    moves = []
+    for u in homeless:
+        target = min(shard_ids, key=lambda s: (len(members[s]), s))
+        members[target].append(u.id)
+        moves.append({"user_id": u.id, "from": u.shard, "to": target})
+    while True:
+        fullest = max(shard_ids, key=lambda s: (len(members[s]), -s))
+        emptiest = min(shard_ids, key=lambda s: (len(members[s]), s))
+        if len(members[fullest]) - len(members[emptiest]) <= 1:
+            break
+        user_id = members[fullest].pop()
+        members[emptiest].append(user_id)
+        moves.append({"user_id": user_id, "from": fullest, "to": emptiest})
+    return moves
+
+
+async def shard_status() -> Dict[str, int]:
+    async with get_sessionmaker()() as db:
+        counts = (await db.execute(select(User.shard, func.count()).group_by(User.shard))).all()
+    return {"directory" if shard is None else str(shard): count for shard, count in counts}
+
+
+if __name__ == "__main__":
+    import argparse
+    import asyncio
+
+    parser = argparse.ArgumentParser(description="Inspect and rebalance sharded storage")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("status", help="users per shard")
+    move_parser = commands.add_parser("move", help="move one user's data")
+    move_parser.add_argument("user_id", type=int)
+    move_parser.add_argument("shard", help="shard number or 'directory'")
+    rebalance_parser = commands.add_parser("rebalance", help="move users to match the current settings")
+    rebalance_parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    from app.database import dispose_engine, init_db
+
+    async def main():
+        await init_db()
+        if args.command == "status":
+            for shard, count in (await shard_status()).items():
+                print(f"{shard}: {count} users")
+        elif args.command == "move":
+            target = None if args.shard == "directory" else int(args.shard)
+            result = await move_user(args.user_id, target)
+            print(f"user {result['user_id']}: {result['from']} -> {result['to']} ({result['rows']} rows)")
+        else:
+            moves = await plan_rebalance()
+            for move in moves:
+                print(f"user {move['user_id']}: {move['from']} -> {move['to']}")
+                if not args.dry_run:
+                    await move_user(move["user_id"], move["to"])
+            print(f"{len(moves)} moves" + (" planned" if args.dry_run else ""))
+        await dispose_engine()
+
+    asyncio.run(main())
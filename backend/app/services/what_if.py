@@ -0,0 +1,139 @@
+"""
+Replay historical trades under alternative position sizing rules.
+
+Entries, exits and direction are kept exactly as traded; only the quantity
+changes. Trades are replayed one after another in entry order, each sized
+off the equity left by the previous ones, so every rule reduces to a growth
+factor per trade and the whole equity curve is one ``cumprod`` (or
+``cumsum`` for fixed quantities). Quantities are fractional.
+
+Rules:
+    fixed_quantity  the same quantity on every trade
+    fixed_fraction  ``fraction`` of equity as position value
+    fixed_risk      ``risk_percentage`` of equity lost if price moves
+                    ``stop_loss_percentage`` against the position
+    kelly           ``kelly_fraction`` of the Kelly-optimal fraction, estimated
+                    from the trades before each one (no look-ahead)
+"""
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from app.services.pnl import profit_loss_arrays
+
+FIXED_QUANTITY = "fixed_quantity"
+FIXED_FRACTION = "fixed_fraction"
+FIXED_RISK = "fixed_risk"
+KELLY = "kelly"
+
+
+@dataclass
+class SizingRule:
+    rule: str
+    name: Optional[str] = None
+    quantity: float = 1.0
+    fraction: float = 0.1
+    risk_percentage: float = 1.0
+    stop_loss_percentage: float = 2.0
+    kelly_fraction: float = 0.5
+    min_trades: int = 20
+    max_fraction: float = 1.0
+
+
+def kelly_fractions(returns: np.ndarray, min_trades: int, max_fraction: float) -> np.ndarray:
+    """
+    Kelly position fraction before each trade from the trades preceding it.
+
+    For wins averaging ``a`` and losses averaging ``b`` (as fractions of
+    position value) with win rate ``W``, the growth-optimal position value is
+    ``W / b - (1 - W) / a`` of equity.
+    """
+    wins = returns > 0
+    losses = ~wins
+    # Exclusive prefix sums: statistics of trades strictly before each one
+    n_prior = np.arange(len(returns))
+    win_count = np.cumsum(wins) - wins
+    loss_count = n_prior - win_count
+    win_sum = np.cumsum(np.where(wins, returns, 0.0)) - np.where(wins, returns, 0.0)
+    loss_sum = np.cumsum(np.where(losses, -returns, 0.0)) - np.where(losses, -returns, 0.0)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        win_rate = win_count / n_prior
+        avg_win = win_sum / win_count
+        avg_loss = loss_sum / loss_count
+        fraction = win_rate / avg_loss - (1 - win_rate) / avg_win
+
+    # No losses yet means unbounded Kelly; no wins (or zero-size wins) means don't trade
+    fraction = np.where((loss_count == 0) | (avg_loss == 0), max_fraction, fraction)
+    fraction = np.where((win_count == 0) | (avg_win == 0), 0.0, fraction)
+    fraction = np.where(n_prior < min_trades, 0.0, fraction)
+    return np.clip(np.nan_to_num(fraction, nan=0.0), 0.0, max_fraction)
+
+
+def _max_drawdown(equity: np.ndarray, initial_balance: float) -> float:
+    peaks = np.maximum(np.maximum.accumulate(equity), initial_balance)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        drawdown = np.where(peaks > 0, 1.0 - equity / peaks, 0.0)
+    return float(drawdown.max()) * 100 if len(drawdown) else 0.0
+
+
+def sample_curve(equity: np.ndarray, points: int) -> Dict[str, List]:
+    if points <= 0 or len(equity) == 0:
+        return {"trade": [], "equity": []}
+    idx = np.unique(np.linspace(0, len(equity) - 1, min(points, len(equity))).astype(np.int64))
+    return {"trade": (idx + 1).tolist(), "equity": np.round(equity[idx], 2).tolist()}
+
+
+def replay(
+    entry_price: np.ndarray,
+    exit_price: np.ndarray,
+    is_long: np.ndarray,
+    initial_balance: float,
+    rule: SizingRule,
+    curve_points: int = 100
+) -> Dict:
+    """Quantities, P&L and equity for one sizing rule; arrays must be in entry order"""
+    entry_price = np.asarray(entry_price, dtype=np.float64)
+    unit_pl, unit_pl_percentage = profit_loss_arrays(
+        entry_price, exit_price, np.ones_like(entry_price), is_long
+    )
+    returns = unit_pl_percentage / 100
+
+    if rule.rule == FIXED_QUANTITY:
+        quantity = np.full_like(entry_price, rule.quantity)
+        pl = unit_pl * quantity
+        equity = initial_balance + np.cumsum(pl)
+    else:
+        if rule.rule == FIXED_FRACTION:
+            fraction = np.full_like(entry_price, rule.fraction)
+        elif rule.rule == FIXED_RISK:
+            # Position value that loses risk% of equity at the stop
+            fraction = np.full_like(entry_price, rule.risk_percentage / rule.stop_loss_percentage)
+        elif rule.rule == KELLY:
+            fraction = rule.kelly_fraction * kelly_fractions(returns, rule.min_trades, rule.max_fraction)
+        else:
+            raise ValueError(f"Unknown sizing rule: {rule.rule}")
+
+        # Equity can't go below zero; once wiped out the account stays flat
+        growth = np.maximum(1.0 + fraction * returns, 0.0)
+        equity = initial_balance * np.cumprod(growth)
+        equity_before = np.concatenate(([initial_balance], equity[:-1]))
+        quantity = fraction * equity_before / entry_price
+        pl = equity - equity_before
+
+    final_equity = float(equity[-1]) if len(equity) else initial_balance
+    total_pl = final_equity - initial_balance
+    return {
+        "name": rule.name or rule.rule,
+        "rule": rule.rule,
+        "trades": int(len(pl)),
+        "final_equity": round(final_equity, 2),
+        "total_profit_loss": round(total_pl, 2),
+        "return_percentage": round(total_pl / initial_balance * 100, 2) if initial_balance else None,
+        "max_drawdown_percentage": round(_max_drawdown(equity, initial_balance), 2),
+        "average_quantity": round(float(quantity.mean()), 4) if len(quantity) else 0.0,
+        "largest_loss": round(float(pl.min()), 2) if len(pl) else 0.0,
+        "ruined": bool(len(equity) and equity.min() <= 0),
+        "equity_curve": sample_curve(equity, curve_points),
+    }
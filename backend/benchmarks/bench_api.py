@@ -0,0 +1,244 @@
+"""
+In-process API benchmark.
+
+Drives the real FastAPI app over ASGI (no network, no uvicorn) against a
+synthetic dataset and records throughput and p50/p95/p99 latency for the
+hot endpoints. Results are written as JSON to ``benchmarks/results`` so runs
+can be compared across commits with ``benchmarks.compare``.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_api --scale 1k
+    python -m benchmarks.bench_api --scale 100k --iterations 500 --concurrency 16
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List
+
+import numpy as np
+
+from benchmarks.datagen import BENCH_PASSWORD, SCALES, DatasetConfig
+
+RESULTS_DIR = Path(__file__).parent / "results"
+SCENARIOS = [
+    "login",
+    "trade_list",
+    "create_trade",
+    "close_trade",
+    "portfolio_analytics",
+    "symbol_analytics",
+]
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def configure_environment(database_url: str) -> None:
+    """Settings are read at import time, so this must run before importing the app"""
+    os.environ.setdefault("SECRET_KEY", "benchmark-secret-key")
+    os.environ["DATABASE_URL"] = database_url
+    os.environ["CSRF_COOKIE_SECURE"] = "false"
+    os.environ["ENVIRONMENT"] = "development"
+    os.environ["SLOW_QUERY_THRESHOLD_MS"] = "-1"
+
+
+def summarize(latencies: List[float], queries: List[int], errors: int, elapsed: float) -> dict:
+    ms = np.asarray(latencies) * 1000
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "mean_ms": round(float(ms.mean()), 3) if len(ms) else None,
+        "p50_ms": round(float(np.percentile(ms, 50)), 3) if len(ms) else None,
+        "p95_ms": round(float(np.percentile(ms, 95)), 3) if len(ms) else None,
+        "p99_ms": round(float(np.percentile(ms, 99)), 3) if len(ms) else None,
+        "max_ms": round(float(ms.max()), 3) if len(ms) else None,
+        "db_queries_mean": round(float(np.mean(queries)), 2) if queries else None,
+    }
+
+
+async def run_scenario(
+    request: Callable[[int], Awaitable],
+    iterations: int,
+    concurrency: int,
+    warmup: int = 5
+) -> dict:
+    for i in range(min(warmup, iterations)):
+        await request(-1 - i)
+
+    latencies: List[float] = []
+    queries: List[int] = []
+    errors = 0
+    counter = iter(range(iterations))
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            start = time.perf_counter()
+            response = await request(i)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                errors += 1
+            count = response.headers.get("X-DB-Query-Count")
+            if count is not None:
+                queries.append(int(count))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, queries, errors, time.perf_counter() - started)
+
+
+async def run_benchmarks(config: DatasetConfig, args) -> Dict[str, dict]:
+    import httpx
+    from sqlalchemy import select, func
+    from app.main import app
+    from app.database import get_engine, get_sessionmaker
+    from app.models import User, Portfolio
+    from benchmarks.datagen import load_dataset
+
+    engine = get_engine()
+    async with get_sessionmaker()() as session:
+        has_data = (await session.execute(
+            select(func.count(User.id)).where(User.username == "bench0")
+        )).scalar_one() if await _has_schema(engine) else 0
+    if not has_data:
+        print(f"Loading dataset ({config.total_trades:,} trades)...")
+        await load_dataset(engine, config)
+
+    async with get_sessionmaker()() as session:
+        portfolio_id = (await session.execute(
+            select(Portfolio.id).join(User).where(User.username == "bench0").order_by(Portfolio.id).limit(1)
+        )).scalar_one()
+
+    results: Dict[str, dict] = {}
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        logging.getLogger("httpx").setLevel(logging.WARNING)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            async def keep_csrf_token(response):
+                token = response.headers.get("X-CSRF-Token")
+                if token:
+                    client.headers["X-CSRF-Token"] = token
+                    client.cookies.set("csrf_token", token)
+            client.event_hooks["response"] = [keep_csrf_token]
+
+            login_form = {"username": "bench0", "password": BENCH_PASSWORD}
+            response = await client.post("/api/auth/login", data=login_form)
+            response.raise_for_status()
+            client.headers["Authorization"] = f"Bearer {response.json()['access_token']}"
+
+            created: List[int] = []
+            now = datetime.now(timezone.utc).isoformat()
+
+            async def create_trade(i):
+                response = await client.post("/api/trades/", json={
+                    "portfolio_id": portfolio_id,
+                    "symbol": "BENCH",
+                    "trade_type": "long",
+                    "entry_price": 100.0,
+                    "entry_date": now,
+                    "quantity": 10,
+                })
+                if response.status_code == 201:
+                    created.append(response.json()["id"])
+                return response
+
+            async def close_trade(i):
+                trade_id = created.pop()
+                return await client.post(
+                    f"/api/trades/{trade_id}/close", json={"exit_price": 105.0, "exit_date": now}
+                )
+
+            requests = {
+                "login": lambda i: client.post("/api/auth/login", data=login_form),
+                "trade_list": lambda i: client.get(f"/api/trades/portfolio/{portfolio_id}"),
+                "create_trade": create_trade,
+                "close_trade": close_trade,
+                "portfolio_analytics": lambda i: client.get(f"/api/analytics/portfolio/{portfolio_id}"),
+                "symbol_analytics": lambda i: client.get(f"/api/analytics/portfolio/{portfolio_id}/by-symbol"),
+            }
+
+            for name in args.scenarios:
+                iterations = args.login_iterations if name == "login" else args.iterations
+                # close_trade consumes the trades opened by create_trade (plus its warmup)
+                warmup = 0 if name == "close_trade" else 5
+                if name == "close_trade":
+                    iterations = min(iterations, len(created))
+                print(f"  {name:<22}", end="", flush=True)
+                results[name] = await run_scenario(requests[name], iterations, args.concurrency, warmup)
+                r = results[name]
+                print(f"{r['throughput_rps']:>9.1f} req/s  p50 {r['p50_ms']:>8.2f} ms  "
+                      f"p95 {r['p95_ms']:>8.2f} ms  p99 {r['p99_ms']:>8.2f} ms  "
+                      f"queries {r['db_queries_mean']}")
+
+    await engine.dispose()
+    return results
+
+
+async def _has_schema(engine) -> bool:
+    from sqlalchemy import inspect
+    async with engine.connect() as conn:
+        return await conn.run_sync(lambda sync_conn: inspect(sync_conn).has_table("users"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the API in-process over ASGI")
+    parser.add_argument("--scale", choices=sorted(SCALES), default="1k")
+    parser.add_argument("--database-url", help="Defaults to a SQLite file per scale in the temp directory")
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--login-iterations", type=int, default=20, help="Login is bcrypt-bound")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument("--output", type=Path, help="Result file (default: results/<commit>_<scale>.json)")
+    args = parser.parse_args()
+
+    config = SCALES[args.scale]
+    database_url = args.database_url or (
+        f"sqlite+aiosqlite:///{Path(tempfile.gettempdir()) / f'trade_journal_bench_{args.scale}.db'}"
+    )
+    configure_environment(database_url)
+
+    commit = git_commit()
+    print(f"Benchmarking commit {commit} at scale {args.scale} ({database_url})")
+    scenarios = asyncio.run(run_benchmarks(config, args))
+
+    import sqlalchemy
+    result = {
+        "meta": {
+            "commit": commit,
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "scale": args.scale,
+            "dataset": config.__dict__,
+            "database": database_url.split(":")[0],
+            "iterations": args.iterations,
+            "concurrency": args.concurrency,
+            "python": sys.version.split()[0],
+            "sqlalchemy": sqlalchemy.__version__,
+            "platform": platform.platform(),
+        },
+        "scenarios": scenarios,
+    }
+
+    output = args.output or RESULTS_DIR / f"{commit}_{args.scale}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(result, indent=2))
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
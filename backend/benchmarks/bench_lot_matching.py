@@ -0,0 +1,72 @@
+"""
+Benchmark the lot matching engine on synthetic fill histories.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_lot_matching --fills 1000000
+"""
+import argparse
+import random
+import time
+from collections import namedtuple
+
+from app.services.lot_matching import match_fills, BUY, SELL, FIFO, LIFO, AVERAGE
+
+FillRow = namedtuple("FillRow", ["id", "side", "price", "quantity"])
+
+
+def generate_position(rng: random.Random, n_fills: int, start_id: int = 1):
+    """Random walk of scale-ins and partial exits that never overfills"""
+    fills = []
+    open_qty = 0
+    price = 1000.0
+    for i in range(n_fills):
+        price = max(1.0, price * (1 + rng.gauss(0, 0.01)))
+        if open_qty == 0 or rng.random() < 0.55:
+            qty = rng.randint(1, 100)
+            open_qty += qty
+            fills.append(FillRow(start_id + i, BUY, price, qty))
+        else:
+            qty = rng.randint(1, open_qty)
+            open_qty -= qty
+            fills.append(FillRow(start_id + i, SELL, price, qty))
+    return fills
+
+
+def generate_portfolio(rng: random.Random, total_fills: int, fills_per_position: int):
+    positions = []
+    next_id = 1
+    while next_id <= total_fills:
+        n = min(fills_per_position, total_fills - next_id + 1)
+        positions.append(generate_position(rng, n, next_id))
+        next_id += n
+    return positions
+
+
+def bench(label: str, positions, method: str) -> float:
+    start = time.perf_counter()
+    for fills in positions:
+        match_fills(fills, is_long=True, method=method, keep_lots=False)
+    elapsed = time.perf_counter() - start
+    n = sum(len(p) for p in positions)
+    print(f"{label:<32} {method:<8} {n:>10,} fills {elapsed:8.3f}s {n / elapsed:>14,.0f} fills/s")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--fills", type=int, default=1_000_000)
+    parser.add_argument("--fills-per-position", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    single = [generate_position(rng, args.fills)]
+    portfolio = generate_portfolio(rng, args.fills, args.fills_per_position)
+
+    for method in (FIFO, LIFO, AVERAGE):
+        bench("single position", single, method)
+        bench(f"portfolio ({len(portfolio):,} positions)", portfolio, method)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Benchmark risk rule evaluation against in-memory day counters.
+
+Times what a trade entry or close adds to a request once the rules and
+counters are loaded: the entry's contribution, every rule's check and the
+counter update. Exits non-zero when the p99 latency is over the budget.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_risk_rules --checks 100000 --symbols 500
+"""
+import argparse
+import random
+import sys
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+from app.models.risk_rule import RiskRuleKind, RiskAction
+from app.services import risk
+from app.services.market_time import ist_today
+
+RULES = [
+    risk.Rule(RiskRuleKind.MAX_DAILY_LOSS, 50_000.0, RiskAction.REJECT),
+    risk.Rule(RiskRuleKind.MAX_OPEN_POSITIONS, 1e9, RiskAction.WARN),
+    risk.Rule(RiskRuleKind.MAX_SYMBOL_EXPOSURE, 1e12, RiskAction.REJECT),
+    risk.Rule(RiskRuleKind.MAX_TRADES_PER_DAY, 1e9, RiskAction.REJECT),
+]
+
+
+def seeded_counters(rng: random.Random, n_symbols: int, day) -> risk.DayCounters:
+    counters = risk.DayCounters(day=day, last_event_id=0)
+    for i in range(n_symbols):
+        counters.add(risk.Contribution(f"SYM{i}", True, rng.uniform(1e3, 1e6), False, 0.0))
+    return counters
+
+
+def bench(checks: int, n_symbols: int, seed: int) -> np.ndarray:
+    rng = random.Random(seed)
+    now = datetime.now(timezone.utc)
+    day = ist_today(now)
+    counters = seeded_counters(rng, n_symbols, day)
+    trades = [
+        {
+            "symbol": f"SYM{rng.randrange(n_symbols)}", "status": "open", "entry_price": rng.uniform(10, 5000),
+            "entry_date": now, "quantity": rng.randint(1, 500),
+        }
+        for _ in range(checks)
+    ]
+
+    timings = np.empty(checks)
+    for i, trade in enumerate(trades):
+        start = time.perf_counter()
+        entry = risk.contribution(trade, day)
+        risk.rejections(risk.check_entry(RULES, counters, entry))
+        counters.add(entry)
+        timings[i] = time.perf_counter() - start
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--checks", type=int, default=100_000)
+    parser.add_argument("--symbols", type=int, default=500)
+    parser.add_argument("--budget-ms", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    timings = bench(args.checks, args.symbols, args.seed) * 1e6
+    p50, p99, worst = np.percentile(timings, [50, 99, 100])
+    print(
+        f"{args.checks:,} entry checks, {len(RULES)} rules, {args.symbols:,} open symbols: "
+        f"p50 {p50:.1f}us  p99 {p99:.1f}us  max {worst:.1f}us"
+    )
+    if p99 > args.budget_ms * 1000:
+        print(f"p99 is over the {args.budget_ms:g} ms budget")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Startup-time benchmark.
+
+Each run is a fresh interpreter, so imports are really cold. The child
+process times importing ``app.main``, the lifespan startup (schema check or
+migrations, price ingest, job runner) and the first requests: one that does
+not touch the database and one that does. Runs against a new database
+measure the full migration; runs against an existing one measure a normal
+restart.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_startup
+    python -m benchmarks.bench_startup --runs 10 --output startup.json
+"""
+import argparse
+import asyncio
+import json
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from statistics import median
+from typing import Dict, List
+
+from benchmarks.bench_api import RESULTS_DIR, configure_environment, git_commit
+
+PHASES = ["import_ms", "startup_ms", "first_request_ms", "first_db_request_ms", "shutdown_ms"]
+
+
+async def _measure_app(timings: Dict[str, float]) -> None:
+    import httpx
+
+    started = time.perf_counter()
+    from app.main import app
+    timings["import_ms"] = (time.perf_counter() - started) * 1000
+
+    transport = httpx.ASGITransport(app=app)
+    lifespan = app.router.lifespan_context(app)
+    started = time.perf_counter()
+    await lifespan.__aenter__()
+    timings["startup_ms"] = (time.perf_counter() - started) * 1000
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        started = time.perf_counter()
+        (await client.get("/health")).raise_for_status()
+        timings["first_request_ms"] = (time.perf_counter() - started) * 1000
+
+        # Unknown user: one query, no password hashing
+        started = time.perf_counter()
+        response = await client.post("/api/auth/login", data={"username": "nobody", "password": "x"})
+        timings["first_db_request_ms"] = (time.perf_counter() - started) * 1000
+        assert response.status_code == 401, response.text
+
+    started = time.perf_counter()
+    await lifespan.__aexit__(None, None, None)
+    timings["shutdown_ms"] = (time.perf_counter() - started) * 1000
+
+
+def child(database_url: str) -> None:
+    configure_environment(database_url)
+    timings: Dict[str, float] = {}
+    asyncio.run(_measure_app(timings))
+    print(json.dumps(timings))
+
+
+def run_child(database_url: str) -> Dict[str, float]:
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_startup", "--child", database_url],
+        check=True, capture_output=True, text=True, cwd=Path(__file__).parent.parent
+    ).stdout
+    # The app prints debug lines of its own; the timings are the last line
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def summarize(runs: List[Dict[str, float]]) -> Dict[str, Dict[str, float]]:
+    return {
+        phase: {
+            "median_ms": round(median(r[phase] for r in runs), 2),
+            "min_ms": round(min(r[phase] for r in runs), 2),
+            "max_ms": round(max(r[phase] for r in runs), 2),
+        }
+        for phase in PHASES
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure app import, startup and first-request latency")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--output", type=Path, help="Result file (default: results/<commit>_startup.json)")
+    parser.add_argument("--child", metavar="DATABASE_URL", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child)
+        return
+
+    commit = git_commit()
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        existing = f"sqlite+aiosqlite:///{Path(tmp) / 'existing.db'}"
+        run_child(existing)  # Create and migrate once
+
+        for name, url_for_run in [
+            ("new_database", lambda i: f"sqlite+aiosqlite:///{Path(tmp) / f'new_{i}.db'}"),
+            ("existing_database", lambda i: existing),
+        ]:
+            runs = [run_child(url_for_run(i)) for i in range(args.runs)]
+            results[name] = summarize(runs)
+            print(f"{name}:")
+            for phase, stats in results[name].items():
+                print(f"  {phase:<22}{stats['median_ms']:>10.1f} ms  (min {stats['min_ms']:.1f}, max {stats['max_ms']:.1f})")
+
+    output = args.output or RESULTS_DIR / f"{commit}_startup.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps({"meta": {"commit": commit, "runs": args.runs}, "scenarios": results}, indent=2))
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
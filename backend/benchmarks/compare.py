@@ -0,0 +1,59 @@
+"""
+Compare two benchmark result files.
+
+Usage (from the backend directory):
+    python -m benchmarks.compare benchmarks/results/abc1234_1k.json benchmarks/results/def5678_1k.json
+
+Exits non-zero when any scenario's p95 latency regressed by more than
+``--threshold`` percent, so it can gate CI.
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+
+METRICS = ["throughput_rps", "p50_ms", "p95_ms", "p99_ms", "db_queries_mean"]
+
+
+def percent_change(old, new):
+    if old in (None, 0) or new is None:
+        return None
+    return (new - old) / old * 100
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files")
+    parser.add_argument("baseline", type=Path)
+    parser.add_argument("candidate", type=Path)
+    parser.add_argument("--threshold", type=float, default=10.0, help="Allowed p95 regression in percent")
+    args = parser.parse_args()
+
+    baseline = json.loads(args.baseline.read_text())
+    candidate = json.loads(args.candidate.read_text())
+    print(f"baseline  {baseline['meta']['commit']} ({baseline['meta']['scale']})")
+    print(f"candidate {candidate['meta']['commit']} ({candidate['meta']['scale']})")
+    print()
+    print(f"{'scenario':<22}{'metric':<17}{'baseline':>12}{'candidate':>12}{'change':>10}")
+
+    regressions = []
+    for name, old in baseline["scenarios"].items():
+        new = candidate["scenarios"].get(name)
+        if new is None:
+            continue
+        for metric in METRICS:
+            change = percent_change(old.get(metric), new.get(metric))
+            change_text = f"{change:+.1f}%" if change is not None else "-"
+            print(f"{name:<22}{metric:<17}{old.get(metric) or 0:>12.2f}{new.get(metric) or 0:>12.2f}{change_text:>10}")
+            if metric == "p95_ms" and change is not None and change > args.threshold:
+                regressions.append(f"{name}: p95 {change:+.1f}%")
+
+    if regressions:
+        print()
+        print(f"Regressions above {args.threshold}%:")
+        for line in regressions:
+            print(f"  {line}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,293 @@
+"""
+Synthetic trade journal data generator.
+
+Creates users, portfolios and trades with a skewed (Zipf-like) symbol
+distribution and a configurable open/closed ratio, and bulk-loads them with
+multi-row INSERTs in large batches. Works against SQLite and PostgreSQL.
+
+Trades look like ones written through the API: closed trades carry charges
+(at the default rate tables) and net P&L, and every trade has its
+``created`` event, plus a ``closed`` event once it is closed, in
+``trade_events``.
+
+Usage (from the backend directory):
+    python -m benchmarks.datagen --database-url sqlite+aiosqlite:///./bench.db \\
+        --users 10 --portfolios-per-user 2 --trades-per-portfolio 5000
+"""
+import argparse
+import asyncio
+import enum
+import os
+import random
+import time
+from dataclasses import dataclass, asdict
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from typing import Dict, List
+
+# Every synthetic user shares this password so benchmarks can log in
+BENCH_PASSWORD = "benchmark-password"
+BATCH_SIZE = 20_000
+# Share of trades per segment (the rest are delivery)
+SEGMENT_MIX = {"intraday": 0.4, "futures": 0.1, "options": 0.1}
+
+NSE_SYMBOLS = [
+    "RELIANCE", "TCS", "INFY", "HDFCBANK", "ICICIBANK", "SBIN", "BHARTIARTL", "ITC",
+    "WIPRO", "AXISBANK", "KOTAKBANK", "LT", "HINDUNILVR", "BAJFINANCE", "MARUTI",
+    "ASIANPAINT", "HCLTECH", "SUNPHARMA", "TITAN", "ULTRACEMCO", "NESTLEIND",
+    "TATAMOTORS", "TATASTEEL", "POWERGRID", "NTPC", "ONGC", "COALINDIA", "ADANIENT",
+    "JSWSTEEL", "M&M",
+]
+
+
+@dataclass
+class DatasetConfig:
+    users: int = 1
+    portfolios_per_user: int = 1
+    trades_per_portfolio: int = 1000
+    symbols: int = 200
+    symbol_skew: float = 1.1
+    open_ratio: float = 0.1
+    days: int = 3 * 365
+    seed: int = 42
+
+    @property
+    def total_trades(self) -> int:
+        return self.users * self.portfolios_per_user * self.trades_per_portfolio
+
+
+SCALES: Dict[str, DatasetConfig] = {
+    "1k": DatasetConfig(users=1, portfolios_per_user=1, trades_per_portfolio=1_000, symbols=50),
+    "100k": DatasetConfig(users=10, portfolios_per_user=2, trades_per_portfolio=5_000, symbols=500),
+    "1m": DatasetConfig(users=100, portfolios_per_user=2, trades_per_portfolio=5_000, symbols=2_000),
+}
+
+
+def symbol_universe(n: int) -> List[str]:
+    """Real NSE names first, then synthetic F&O-style contracts"""
+    symbols = NSE_SYMBOLS[:n]
+    i = 0
+    while len(symbols) < n:
+        underlying = NSE_SYMBOLS[i % len(NSE_SYMBOLS)]
+        strike = 100 * (10 + i // len(NSE_SYMBOLS))
+        symbols.append(f"{underlying}{strike}{'CE' if i % 2 else 'PE'}")
+        i += 1
+    return symbols
+
+
+def symbol_weights(n: int, skew: float) -> List[float]:
+    return [1.0 / (rank ** skew) for rank in range(1, n + 1)]
+
+
+def generate_trades(portfolio_id: int, config: DatasetConfig, rng: random.Random,
+                    symbols: List[str], weights: List[float]) -> List[dict]:
+    from app.crud.charges import total_charges
+    from app.models import TradeType, TradeStatus
+    from app.models.trade import TradeSegment
+    from app.models.types import round_money
+    from app.services.charges import DEFAULT_RATES
+
+    now = datetime.now(timezone.utc)
+    start = now - timedelta(days=config.days)
+    span = config.days * 86400
+    picks = rng.choices(symbols, weights=weights, k=config.trades_per_portfolio)
+    segments = [TradeSegment(name) for name in SEGMENT_MIX] + [TradeSegment.DELIVERY]
+    segment_weights = list(SEGMENT_MIX.values()) + [1 - sum(SEGMENT_MIX.values())]
+    rows = []
+    for symbol in picks:
+        entry_date = start + timedelta(seconds=rng.randrange(span))
+        entry_price = round(rng.uniform(50, 5000), 2)
+        quantity = float(rng.randint(1, 500))
+        trade_type = TradeType.LONG if rng.random() < 0.7 else TradeType.SHORT
+        row = {
+            "portfolio_id": portfolio_id,
+            "symbol": symbol,
+            "trade_type": trade_type,
+            "segment": rng.choices(segments, weights=segment_weights)[0],
+            "status": TradeStatus.OPEN,
+            "entry_price": entry_price,
+            "entry_date": entry_date,
+            "quantity": quantity,
+            "exit_price": None,
+            "exit_date": None,
+            "profit_loss": None,
+            "profit_loss_percentage": None,
+            "charges": None,
+            "net_profit_loss": None,
+            "created_at": entry_date,
+        }
+        if rng.random() >= config.open_ratio:
+            exit_price = round(entry_price * (1 + rng.gauss(0.002, 0.03)), 2)
+            direction = 1 if trade_type == TradeType.LONG else -1
+            pl = direction * (exit_price - entry_price) * quantity
+            row.update({
+                "status": TradeStatus.CLOSED,
+                "exit_price": exit_price,
+                "exit_date": min(entry_date + timedelta(minutes=rng.randint(5, 60 * 24 * 20)), now),
+                "profit_loss": round_money(pl),
+                "profit_loss_percentage": pl / (entry_price * quantity) * 100,
+            })
+        rows.append(row)
+
+    closed = [row for row in rows if row["status"] == TradeStatus.CLOSED]
+    if closed:
+        charges = total_charges([SimpleNamespace(open_quantity=None, **row) for row in closed], DEFAULT_RATES)
+        for row, value in zip(closed, charges.tolist()):
+            row["charges"] = value
+            row["net_profit_loss"] = round_money(row["profit_loss"] - value)
+    return rows
+
+
+def _state_value(value):
+    # What trade_event_crud.trade_state stores, without jsonable_encoder's per-value overhead
+    if isinstance(value, enum.Enum):
+        return value.value
+    if isinstance(value, datetime):
+        return value.astimezone(timezone.utc).isoformat()
+    return value
+
+
+def generate_events(trade_ids: List[int], rows: List[dict]) -> List[dict]:
+    """The ``created`` event of every trade and the ``closed`` event of closed ones, in time order"""
+    from app.crud import trade_event as trade_event_crud
+    from app.models import TradeStatus
+
+    events = []
+    for trade_id, row in zip(trade_ids, rows):
+        after = {field: _state_value(row.get(field)) for field in trade_event_crud.TRACKED_FIELDS}
+        if row["status"] == TradeStatus.CLOSED:
+            opened = {
+                **after, "status": "open", "exit_price": None, "exit_date": None, "profit_loss": None,
+                "profit_loss_percentage": None, "charges": None, "net_profit_loss": None,
+            }
+            events.append({
+                **trade_event_crud.event_values("created", trade_id, row["portfolio_id"], None, opened),
+                "created_at": row["entry_date"],
+            })
+            events.append({
+                **trade_event_crud.event_values("closed", trade_id, row["portfolio_id"], opened, after),
+                "created_at": row["exit_date"],
+            })
+        else:
+            events.append({
+                **trade_event_crud.event_values("created", trade_id, row["portfolio_id"], None, after),
+                "created_at": row["entry_date"],
+            })
+    events.sort(key=lambda event: event["created_at"])
+    return events
+
+
+async def _insert_trades(engine, batch: List[dict]) -> None:
+    """Insert trades and their events in one transaction"""
+    from sqlalchemy import func, insert, select
+    from app.models import Trade, TradeEvent
+
+    async with engine.begin() as conn:
+        # Ids are read back in insertion order, which is cheaper than RETURNING row by row
+        last_id = (await conn.execute(select(func.coalesce(func.max(Trade.id), 0)))).scalar_one()
+        await conn.execute(insert(Trade.__table__), batch)
+        trade_ids = list((await conn.execute(
+            select(Trade.id).where(Trade.id > last_id).order_by(Trade.id)
+        )).scalars())
+        await conn.execute(insert(TradeEvent.__table__), generate_events(trade_ids, batch))
+
+
+async def load_dataset(engine, config: DatasetConfig, verbose: bool = True) -> Dict[str, List[int]]:
+    """Create the schema and bulk-load a synthetic dataset; returns created ids"""
+    from sqlalchemy import insert, select
+    from app.migrate import upgrade_schema
+    from app.auth.utils import get_password_hash
+    from app.models import User, Portfolio, CostBasisMethod
+
+    rng = random.Random(config.seed)
+    symbols = symbol_universe(config.symbols)
+    weights = symbol_weights(len(symbols), config.symbol_skew)
+    hashed_password = get_password_hash(BENCH_PASSWORD)
+    started = time.perf_counter()
+
+    async with engine.connect() as conn:
+        await conn.run_sync(upgrade_schema)
+
+    async with engine.begin() as conn:
+        if conn.dialect.name == "sqlite":
+            await conn.exec_driver_sql("PRAGMA journal_mode=WAL")
+            await conn.exec_driver_sql("PRAGMA synchronous=OFF")
+
+        await conn.execute(insert(User.__table__), [
+            {
+                "email": f"bench{i}@example.com",
+                "username": f"bench{i}",
+                "hashed_password": hashed_password,
+                "full_name": f"Bench User {i}",
+                "is_active": True,
+                "is_admin": i == 0,
+            }
+            for i in range(config.users)
+        ])
+        user_ids = list((await conn.execute(
+            select(User.id).where(User.username.like("bench%")).order_by(User.id)
+        )).scalars())
+
+        await conn.execute(insert(Portfolio.__table__), [
+            {
+                "name": f"Bench Portfolio {u}-{p}",
+                "initial_balance": 1_000_000.0,
+                "user_id": user_id,
+                "cost_basis_method": CostBasisMethod.FIFO,
+            }
+            for u, user_id in enumerate(user_ids)
+            for p in range(config.portfolios_per_user)
+        ])
+        portfolio_ids = list((await conn.execute(
+            select(Portfolio.id).where(Portfolio.user_id.in_(user_ids)).order_by(Portfolio.id)
+        )).scalars())
+
+    # One transaction per batch keeps memory and lock time bounded
+    batch: List[dict] = []
+    loaded = 0
+    for portfolio_id in portfolio_ids:
+        batch.extend(generate_trades(portfolio_id, config, rng, symbols, weights))
+        if len(batch) >= BATCH_SIZE:
+            await _insert_trades(engine, batch)
+            loaded += len(batch)
+            batch = []
+            if verbose:
+                print(f"  loaded {loaded:,} trades ({time.perf_counter() - started:.1f}s)")
+    if batch:
+        await _insert_trades(engine, batch)
+        loaded += len(batch)
+
+    if verbose:
+        elapsed = time.perf_counter() - started
+        print(f"Loaded {len(user_ids)} users, {len(portfolio_ids)} portfolios, "
+              f"{loaded:,} trades in {elapsed:.1f}s ({loaded / max(elapsed, 1e-9):,.0f} trades/s)")
+    return {"user_ids": user_ids, "portfolio_ids": portfolio_ids}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic trade journal dataset")
+    parser.add_argument("--database-url", required=True)
+    parser.add_argument("--scale", choices=sorted(SCALES), help="Preset dataset size")
+    defaults = DatasetConfig()
+    for name, value in asdict(defaults).items():
+        parser.add_argument(f"--{name.replace('_', '-')}", type=type(value), default=None)
+    args = parser.parse_args()
+
+    config = SCALES[args.scale] if args.scale else DatasetConfig()
+    overrides = {k: v for k, v in vars(args).items() if k in asdict(defaults) and v is not None}
+    config = DatasetConfig(**{**asdict(config), **overrides})
+
+    os.environ.setdefault("SECRET_KEY", "benchmark-secret-key")
+    os.environ["DATABASE_URL"] = args.database_url
+    from app.database import get_engine
+
+    async def run():
+        engine = get_engine()
+        await load_dataset(engine, config)
+        await engine.dispose()
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
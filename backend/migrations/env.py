@@ -0,0 +1,60 @@
+import asyncio
+from logging.config import fileConfig
+
+from alembic import context
+from sqlalchemy.engine import Connection
+
+from app.database import Base, get_engine
+from app.migrate import foreign_keys_disabled
+import app.models  # noqa: F401  (registers every table on Base.metadata)
+
+config = context.config
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name, disable_existing_loggers=False)
+
+target_metadata = Base.metadata
+
+
+def run_on_connection(connection: Connection) -> None:
+    context.configure(
+        connection=connection,
+        target_metadata=target_metadata,
+        render_as_batch=True,  # SQLite can only alter tables by recreating them
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_and_commit(connection: Connection) -> None:
+    with foreign_keys_disabled(connection):
+        run_on_connection(connection)
+        connection.commit()
+
+
+async def run_online() -> None:
+    engine = get_engine()
+    async with engine.connect() as connection:
+        await connection.run_sync(run_and_commit)
+    await engine.dispose()
+
+
+def run_offline() -> None:
+    from app.config import get_settings
+
+    context.configure(
+        url=get_settings().DATABASE_URL,
+        target_metadata=target_metadata,
+        literal_binds=True,
+        render_as_batch=True,
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_offline()
+elif config.attributes.get("connection") is not None:
+    # Called from app.migrate with a connection the app already opened
+    run_on_connection(config.attributes["connection"])
+else:
+    asyncio.run(run_online())
@@ -0,0 +1,80 @@
+"""Baseline: users, portfolios and trades as originally created by create_all
+
+Revision ID: 0001_baseline
+Revises:
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0001_baseline"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "users",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("email", sa.String(), nullable=False),
+        sa.Column("username", sa.String(), nullable=False),
+        sa.Column("hashed_password", sa.String(), nullable=False),
+        sa.Column("full_name", sa.String(), nullable=True),
+        sa.Column("is_active", sa.Boolean(), nullable=True),
+        sa.Column("is_admin", sa.Boolean(), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_users_id", "users", ["id"])
+    op.create_index("ix_users_email", "users", ["email"], unique=True)
+    op.create_index("ix_users_username", "users", ["username"], unique=True)
+
+    op.create_table(
+        "portfolios",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("description", sa.String(), nullable=True),
+        sa.Column("initial_balance", sa.Float(), nullable=True),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_portfolios_id", "portfolios", ["id"])
+
+    op.create_table(
+        "trades",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("portfolio_id", sa.Integer(), nullable=False),
+        sa.Column("symbol", sa.String(), nullable=False),
+        sa.Column("trade_type", sa.Enum("LONG", "SHORT", name="tradetype"), nullable=False),
+        sa.Column("status", sa.Enum("OPEN", "CLOSED", name="tradestatus"), nullable=True),
+        sa.Column("entry_price", sa.Float(), nullable=False),
+        sa.Column("entry_date", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("quantity", sa.Float(), nullable=False),
+        sa.Column("exit_price", sa.Float(), nullable=True),
+        sa.Column("exit_date", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("profit_loss", sa.Float(), nullable=True),
+        sa.Column("profit_loss_percentage", sa.Float(), nullable=True),
+        sa.Column("notes", sa.Text(), nullable=True),
+        sa.Column("tags", sa.String(), nullable=True),
+        sa.Column("screenshot_path", sa.String(), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(["portfolio_id"], ["portfolios.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_trades_id", "trades", ["id"])
+    op.create_index("ix_trades_symbol", "trades", ["symbol"])
+
+
+def downgrade() -> None:
+    op.drop_table("trades")
+    op.drop_table("portfolios")
+    op.drop_table("users")
+    sa.Enum(name="tradestatus").drop(op.get_bind(), checkfirst=True)
+    sa.Enum(name="tradetype").drop(op.get_bind(), checkfirst=True)
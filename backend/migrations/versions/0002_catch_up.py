@@ -0,0 +1,176 @@
+"""Catch up with schema changes made while tables were still created by create_all
+
+Fills and lot matching, cost basis method, charges and segments, jobs,
+charge rates, foreign key indexes and ON DELETE CASCADE.
+
+Databases created with create_all may already have any subset of these
+changes, so every step checks the live schema first. Later revisions are
+plain, unconditional migrations.
+
+Revision ID: 0002_catch_up
+Revises: 0001_baseline
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+revision = "0002_catch_up"
+down_revision = "0001_baseline"
+branch_labels = None
+depends_on = None
+
+# Enum types are created up front (where the database has them), so the
+# tables and columns below must not try to create them again
+cost_basis_method = postgresql.ENUM("FIFO", "LIFO", "AVERAGE", name="costbasismethod", create_type=False)
+trade_segment = postgresql.ENUM("INTRADAY", "DELIVERY", "FUTURES", "OPTIONS", name="tradesegment", create_type=False)
+fill_side = postgresql.ENUM("BUY", "SELL", name="fillside", create_type=False)
+job_status = postgresql.ENUM(
+    "PENDING", "RUNNING", "SUCCEEDED", "FAILED", "CANCELLED", name="jobstatus", create_type=False
+)
+
+# Gives SQLite's unnamed foreign keys a name batch mode can drop them by
+NAMING_CONVENTION = {"fk": "fk_%(table_name)s_%(column_0_name)s_%(referred_table_name)s"}
+
+
+def _inspector():
+    return sa.inspect(op.get_bind())
+
+
+def _add_missing_columns(table, columns):
+    existing = {c["name"] for c in _inspector().get_columns(table)}
+    missing = [c for c in columns if c.name not in existing]
+    if missing:
+        with op.batch_alter_table(table) as batch:
+            for column in missing:
+                batch.add_column(column)
+
+
+def _create_missing_index(table, column):
+    name = f"ix_{table}_{column}"
+    if name not in {i["name"] for i in _inspector().get_indexes(table)}:
+        op.create_index(name, table, [column])
+
+
+def _cascade_foreign_key(table, column, referred):
+    """Recreate the foreign key on ``column`` with ON DELETE CASCADE unless it has it already"""
+    for fk in _inspector().get_foreign_keys(table):
+        if fk["constrained_columns"] == [column]:
+            if (fk.get("options") or {}).get("ondelete", "").upper() == "CASCADE":
+                return
+            existing = fk["name"]
+            break
+    else:
+        existing = None
+
+    name = f"fk_{table}_{column}_{referred}"
+    with op.batch_alter_table(table, naming_convention=NAMING_CONVENTION) as batch:
+        if existing is not None or op.get_bind().dialect.name == "sqlite":
+            batch.drop_constraint(existing or name, type_="foreignkey")
+        batch.create_foreign_key(name, referred, [column], ["id"], ondelete="CASCADE")
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    for enum in (cost_basis_method, trade_segment, fill_side, job_status):
+        enum.create(bind, checkfirst=True)
+
+    _add_missing_columns("portfolios", [
+        sa.Column("cost_basis_method", cost_basis_method, server_default="FIFO", nullable=False),
+    ])
+    _add_missing_columns("trades", [
+        sa.Column("segment", trade_segment, server_default="DELIVERY", nullable=False),
+        sa.Column("open_quantity", sa.Float(), nullable=True),
+        sa.Column("open_avg_price", sa.Float(), nullable=True),
+        sa.Column("charges", sa.Float(), nullable=True),
+        sa.Column("net_profit_loss", sa.Float(), nullable=True),
+    ])
+    _create_missing_index("portfolios", "user_id")
+    _create_missing_index("trades", "portfolio_id")
+    _cascade_foreign_key("portfolios", "user_id", "users")
+    _cascade_foreign_key("trades", "portfolio_id", "portfolios")
+
+    tables = set(_inspector().get_table_names())
+    if "fills" not in tables:
+        op.create_table(
+            "fills",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("trade_id", sa.Integer(), nullable=False),
+            sa.Column("side", fill_side, nullable=False),
+            sa.Column("price", sa.Float(), nullable=False),
+            sa.Column("quantity", sa.Float(), nullable=False),
+            sa.Column("executed_at", sa.DateTime(timezone=True), nullable=False),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+            sa.ForeignKeyConstraint(["trade_id"], ["trades.id"], name="fk_fills_trade_id_trades", ondelete="CASCADE"),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index("ix_fills_id", "fills", ["id"])
+        op.create_index("ix_fills_trade_id", "fills", ["trade_id"])
+    else:
+        _cascade_foreign_key("fills", "trade_id", "trades")
+
+    if "jobs" not in tables:
+        op.create_table(
+            "jobs",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("user_id", sa.Integer(), nullable=False),
+            sa.Column("kind", sa.String(), nullable=False),
+            sa.Column("params", sa.JSON(), nullable=False),
+            sa.Column("status", job_status, nullable=False),
+            sa.Column("progress", sa.Float(), nullable=False),
+            sa.Column("message", sa.String(), nullable=True),
+            sa.Column("cancel_requested", sa.Boolean(), nullable=False),
+            sa.Column("result", sa.JSON(), nullable=True),
+            sa.Column("result_path", sa.String(), nullable=True),
+            sa.Column("error", sa.Text(), nullable=True),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+            sa.Column("started_at", sa.DateTime(timezone=True), nullable=True),
+            sa.Column("finished_at", sa.DateTime(timezone=True), nullable=True),
+            sa.ForeignKeyConstraint(["user_id"], ["users.id"], name="fk_jobs_user_id_users", ondelete="CASCADE"),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index("ix_jobs_id", "jobs", ["id"])
+        op.create_index("ix_jobs_user_id", "jobs", ["user_id"])
+        op.create_index("ix_jobs_status", "jobs", ["status"])
+    else:
+        _cascade_foreign_key("jobs", "user_id", "users")
+
+    if "charge_rates" not in tables:
+        op.create_table(
+            "charge_rates",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("segment", trade_segment, nullable=False),
+            *(sa.Column(name, sa.Float(), nullable=False) for name in (
+                "brokerage_percentage",
+                "brokerage_flat_per_order",
+                "brokerage_max_per_order",
+                "stt_buy_percentage",
+                "stt_sell_percentage",
+                "exchange_percentage",
+                "sebi_percentage",
+                "stamp_duty_buy_percentage",
+                "dp_charge_per_sell",
+                "gst_percentage",
+            )),
+            sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+            sa.PrimaryKeyConstraint("id"),
+            sa.UniqueConstraint("segment"),
+        )
+        op.create_index("ix_charge_rates_id", "charge_rates", ["id"])
+
+
+def downgrade() -> None:
+    op.drop_table("charge_rates")
+    op.drop_table("jobs")
+    op.drop_table("fills")
+    with op.batch_alter_table("trades") as batch:
+        batch.drop_index("ix_trades_portfolio_id")
+        for column in ("net_profit_loss", "charges", "open_avg_price", "open_quantity", "segment"):
+            batch.drop_column(column)
+    with op.batch_alter_table("portfolios") as batch:
+        batch.drop_index("ix_portfolios_user_id")
+        batch.drop_column("cost_basis_method")
+    bind = op.get_bind()
+    for enum in (job_status, fill_side, trade_segment, cost_basis_method):
+        enum.drop(bind, checkfirst=True)
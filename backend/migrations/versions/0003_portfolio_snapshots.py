@@ -0,0 +1,38 @@
+"""Daily portfolio NAV snapshots
+
+Revision ID: 0003_portfolio_snapshots
+Revises: 0002_catch_up
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0003_portfolio_snapshots"
+down_revision = "0002_catch_up"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "portfolio_snapshots",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("portfolio_id", sa.Integer(), nullable=False),
+        sa.Column("day", sa.Date(), nullable=False),
+        sa.Column("realized_profit_loss", sa.Float(), nullable=False),
+        sa.Column("unrealized_profit_loss", sa.Float(), nullable=False),
+        sa.Column("open_positions", sa.Integer(), nullable=False),
+        sa.Column("cash", sa.Float(), nullable=False),
+        sa.Column("nav", sa.Float(), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["portfolio_id"], ["portfolios.id"], name="fk_portfolio_snapshots_portfolio_id_portfolios", ondelete="CASCADE"
+        ),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("portfolio_id", "day", name="uq_portfolio_snapshots_portfolio_day"),
+    )
+    op.create_index("ix_portfolio_snapshots_id", "portfolio_snapshots", ["id"])
+
+
+def downgrade() -> None:
+    op.drop_table("portfolio_snapshots")
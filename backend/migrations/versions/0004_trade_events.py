@@ -0,0 +1,47 @@
+"""Append-only trade event log and projection checkpoints
+
+Revision ID: 0004_trade_events
+Revises: 0003_portfolio_snapshots
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0004_trade_events"
+down_revision = "0003_portfolio_snapshots"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "trade_events",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("trade_id", sa.Integer(), nullable=False),
+        sa.Column("portfolio_id", sa.Integer(), nullable=False),
+        sa.Column("kind", sa.String(), nullable=False),
+        sa.Column("changes", sa.JSON(), nullable=True),
+        sa.Column("state", sa.JSON(), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.ForeignKeyConstraint(
+            ["portfolio_id"], ["portfolios.id"], name="fk_trade_events_portfolio_id_portfolios", ondelete="CASCADE"
+        ),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_trade_events_id", "trade_events", ["id"])
+    op.create_index("ix_trade_events_trade_id", "trade_events", ["trade_id"])
+    op.create_index("ix_trade_events_portfolio_id", "trade_events", ["portfolio_id"])
+
+    op.create_table(
+        "projection_checkpoints",
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("last_event_id", sa.Integer(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.PrimaryKeyConstraint("name"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("projection_checkpoints")
+    op.drop_table("trade_events")
@@ -0,0 +1,101 @@
+"""Store money and prices as scaled integers
+
+Money columns hold paise (scale 2) and price columns 1/10000 rupee (scale 4),
+see ``app.models.types``. Existing values are converted in chunks of rows by
+id, rounding half-up from the decimal each float was written as, so a large
+table is never held in memory or rewritten by one giant statement.
+
+Revision ID: 0005_scaled_money
+Revises: 0004_trade_events
+Create Date: 2026-10-19
+"""
+from decimal import Decimal, ROUND_HALF_UP
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0005_scaled_money"
+down_revision = "0004_trade_events"
+branch_labels = None
+depends_on = None
+
+CHUNK_SIZE = 5000
+
+# table -> [(column, scale, nullable)]
+COLUMNS = {
+    "portfolios": [("initial_balance", 2, True)],
+    "trades": [
+        ("entry_price", 4, False),
+        ("exit_price", 4, True),
+        ("open_avg_price", 4, True),
+        ("profit_loss", 2, True),
+        ("charges", 2, True),
+        ("net_profit_loss", 2, True),
+    ],
+    "fills": [("price", 4, False)],
+    "portfolio_snapshots": [
+        ("realized_profit_loss", 2, False),
+        ("unrealized_profit_loss", 2, False),
+        ("cash", 2, False),
+        ("nav", 2, False),
+    ],
+}
+
+
+def _to_scaled(value, scale):
+    if value is None:
+        return None
+    exact = Decimal(repr(float(value))).quantize(Decimal(1).scaleb(-scale), rounding=ROUND_HALF_UP)
+    return int(exact.scaleb(scale))
+
+
+def _from_scaled(value, scale):
+    return None if value is None else value / 10 ** scale
+
+
+def _convert(table_name, columns, new_type, convert):
+    """Add ``<column>_new`` columns, fill them chunk by chunk, then swap them in"""
+    connection = op.get_bind()
+    for column, _, _ in columns:
+        op.add_column(table_name, sa.Column(f"{column}_new", new_type(), nullable=True))
+
+    names = [column for column, _, _ in columns]
+    table = sa.table(
+        table_name, sa.column("id"), *(sa.column(c) for c in names), *(sa.column(f"{c}_new") for c in names)
+    )
+    update = (
+        sa.update(table)
+        .where(table.c.id == sa.bindparam("row_id"))
+        .values({f"{c}_new": sa.bindparam(f"v_{c}") for c in names})
+    )
+    last_id = 0
+    while True:
+        rows = connection.execute(
+            sa.select(table.c.id, *(table.c[c] for c in names))
+            .where(table.c.id > last_id)
+            .order_by(table.c.id)
+            .limit(CHUNK_SIZE)
+        ).all()
+        if not rows:
+            break
+        connection.execute(update, [
+            {"row_id": row.id, **{f"v_{c}": convert(row._mapping[c], scale) for c, scale, _ in columns}}
+            for row in rows
+        ])
+        last_id = rows[-1].id
+
+    with op.batch_alter_table(table_name) as batch_op:
+        for column, _, nullable in columns:
+            batch_op.drop_column(column)
+            batch_op.alter_column(f"{column}_new", new_column_name=column, nullable=nullable, existing_type=new_type())
+
+
+def upgrade() -> None:
+    for table_name, columns in COLUMNS.items():
+        _convert(table_name, columns, sa.BigInteger, _to_scaled)
+
+
+def downgrade() -> None:
+    for table_name, columns in COLUMNS.items():
+        _convert(table_name, columns, sa.Float, _from_scaled)
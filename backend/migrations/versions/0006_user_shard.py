@@ -0,0 +1,26 @@
+"""Shard assignment of users
+
+Revision ID: 0006_user_shard
+Revises: 0005_scaled_money
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0006_user_shard"
+down_revision = "0005_scaled_money"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("users") as batch_op:
+        batch_op.add_column(sa.Column("shard", sa.Integer(), nullable=True))
+        batch_op.create_index("ix_users_shard", ["shard"])
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("users") as batch_op:
+        batch_op.drop_index("ix_users_shard")
+        batch_op.drop_column("shard")
@@ -0,0 +1,45 @@
+"""Per-portfolio risk rules
+
+Revision ID: 0007_risk_rules
+Revises: 0006_user_shard
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0007_risk_rules"
+down_revision = "0006_user_shard"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "risk_rules",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("portfolio_id", sa.Integer(), nullable=False),
+        sa.Column(
+            "kind",
+            sa.Enum(
+                "MAX_DAILY_LOSS", "MAX_OPEN_POSITIONS", "MAX_SYMBOL_EXPOSURE", "MAX_TRADES_PER_DAY",
+                name="riskrulekind"
+            ),
+            nullable=False,
+        ),
+        sa.Column("limit", sa.Float(), nullable=False),
+        sa.Column("action", sa.Enum("WARN", "REJECT", name="riskaction"), nullable=False),
+        sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.ForeignKeyConstraint(
+            ["portfolio_id"], ["portfolios.id"], name="fk_risk_rules_portfolio_id_portfolios", ondelete="CASCADE"
+        ),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("portfolio_id", "kind", name="uq_risk_rules_portfolio_kind"),
+    )
+    op.create_index("ix_risk_rules_id", "risk_rules", ["id"])
+
+
+def downgrade() -> None:
+    op.drop_table("risk_rules")
+    sa.Enum(name="riskaction").drop(op.get_bind(), checkfirst=True)
+    sa.Enum(name="riskrulekind").drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,24 @@
+"""Indexes for case-insensitive user search
+
+Revision ID: 0010_user_search_indexes
+Revises: 0009_job_heartbeat
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0010_user_search_indexes"
+down_revision = "0009_job_heartbeat"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index("ix_users_username_lower", "users", [sa.text("lower(username)")])
+    op.create_index("ix_users_email_lower", "users", [sa.text("lower(email)")])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_users_email_lower", table_name="users")
+    op.drop_index("ix_users_username_lower", table_name="users")
@@ -0,0 +1,37 @@
+"""Never reuse trade ids on SQLite
+
+Trade history is kept after a trade is deleted, so a new trade must not get
+the id of a deleted one. PostgreSQL sequences never hand out an id twice;
+SQLite needs AUTOINCREMENT, which means rebuilding the table. The sequence
+starts past every id that still has history.
+
+Revision ID: 0011_trade_autoincrement
+Revises: 0010_user_search_indexes
+Create Date: 2026-10-19
+"""
+from alembic import op
+
+
+revision = "0011_trade_autoincrement"
+down_revision = "0010_user_search_indexes"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name != "sqlite":
+        return
+    with op.batch_alter_table("trades", recreate="always", table_kwargs={"sqlite_autoincrement": True}):
+        pass
+    op.execute("DELETE FROM sqlite_sequence WHERE name = 'trades'")
+    op.execute(
+        "INSERT INTO sqlite_sequence (name, seq) SELECT 'trades', max(coalesce(max_id, 0), coalesce(max_event, 0)) "
+        "FROM (SELECT (SELECT max(id) FROM trades) AS max_id, (SELECT max(trade_id) FROM trade_events) AS max_event)"
+    )
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != "sqlite":
+        return
+    with op.batch_alter_table("trades", recreate="always", table_kwargs={"sqlite_autoincrement": False}):
+        pass
@@ -0,0 +1,88 @@
+"""
+Shared fixtures: the app runs in-process against a throwaway SQLite database.
+
+Settings are read once at import time, so the environment is set up before
+``app`` is imported. Tests run from a temporary directory so uploads and
+other relative paths stay out of the checkout.
+"""
+import os
+import tempfile
+import uuid
+
+import pytest
+
+_TMP = tempfile.mkdtemp(prefix="trading-journal-tests-")
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{_TMP}/test.db"
+os.environ.setdefault("SECRET_KEY", "test-secret-key-" + "x" * 32)
+os.environ["CSRF_COOKIE_SECURE"] = "false"
+os.environ["PRICE_DATA_DIR"] = os.path.join(_TMP, "prices")
+os.environ["JOB_RESULTS_DIR"] = os.path.join(_TMP, "jobs")
+os.chdir(_TMP)
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app.main import app  # noqa: E402
+
+
+def _track_csrf(client: TestClient) -> None:
+    def hook(response):
+        token = response.headers.get("X-CSRF-Token")
+        if token:
+            client.headers["X-CSRF-Token"] = token
+
+    client.event_hooks["response"] = [hook]
+
+
+@pytest.fixture(scope="session")
+def app_client():
+    with TestClient(app) as client:
+        _track_csrf(client)
+        yield client
+
+
+def login_as_new_user(client: TestClient) -> str:
+    """Register a user with a unique name and send its token with every request"""
+    name = f"user{uuid.uuid4().hex[:10]}"
+    client.headers.pop("Authorization", None)
+    response = client.post(
+        "/api/auth/register",
+        json={"email": f"{name}@example.com", "username": name, "password": "password"},
+    )
+    assert response.status_code == 201, response.text
+    response = client.post("/api/auth/login", data={"username": name, "password": "password"})
+    assert response.status_code == 200, response.text
+    client.headers["Authorization"] = f"Bearer {response.json()['access_token']}"
+    return name
+
+
+@pytest.fixture
+def client(app_client):
+    """A client logged in as a fresh user"""
+    login_as_new_user(app_client)
+    return app_client
+
+
+@pytest.fixture
+def portfolio(client):
+    response = client.post("/api/portfolios", json={"name": "Test", "initial_balance": 100000})
+    assert response.status_code == 201, response.text
+    return response.json()
+
+
+@pytest.fixture
+def make_trade(client, portfolio):
+    def make(**fields):
+        body = {
+            "portfolio_id": portfolio["id"],
+            "symbol": "TCS",
+            "trade_type": "long",
+            "entry_price": 100,
+            "entry_date": "2024-01-01T04:00:00",
+            "quantity": 10,
+            **fields,
+        }
+        response = client.post("/api/trades/", json=body)
+        assert response.status_code == 201, response.text
+        return response.json()
+
+    return make
@@ -0,0 +1,50 @@
+import os
+
+
+def upload_screenshot(client, trade_id, name="chart.png", content_type="image/png"):
+    response = client.post(
+        f"/api/trades/{trade_id}/screenshot", files={"file": (name, b"\x89PNG\r\n\x1a\n", content_type)}
+    )
+    assert response.status_code == 200, response.text
+    path = response.json()["path"]
+    assert os.path.exists(path)
+    return path
+
+
+def test_deleting_a_trade_removes_its_screenshot(client, make_trade):
+    trade = make_trade()
+    path = upload_screenshot(client, trade["id"])
+    assert client.get(f"/api/trades/{trade['id']}").json()["screenshot_path"] == path
+
+    assert client.delete(f"/api/trades/{trade['id']}").status_code == 204
+
+    assert not os.path.exists(path)
+
+
+def test_a_new_upload_replaces_the_old_file(client, make_trade):
+    trade = make_trade()
+    old = upload_screenshot(client, trade["id"], "chart.png")
+    new = upload_screenshot(client, trade["id"], "chart.webp", "image/webp")
+
+    assert not os.path.exists(old)
+    assert client.get(f"/api/trades/{trade['id']}").json()["screenshot_path"] == new
+    assert client.delete(f"/api/trades/{trade['id']}").status_code == 204
+    assert not os.path.exists(new)
+
+
+def test_batch_delete_removes_screenshots(client, make_trade):
+    trade = make_trade()
+    path = upload_screenshot(client, trade["id"])
+
+    response = client.post("/api/trades/batch", json={"operations": [{"op": "delete", "trade_id": trade["id"]}]})
+
+    assert response.json()["succeeded"] == 1
+    assert not os.path.exists(path)
+
+
+def test_deleting_a_portfolio_removes_its_screenshots(client, portfolio, make_trade):
+    paths = [upload_screenshot(client, make_trade()["id"]) for _ in range(2)]
+
+    assert client.delete(f"/api/portfolios/{portfolio['id']}").status_code == 204
+
+    assert not any(os.path.exists(path) for path in paths)
@@ -0,0 +1,42 @@
+import asyncio
+import io
+
+from openpyxl import load_workbook
+
+from app.services import export
+
+
+def test_xlsx_rows_are_appended_off_the_event_loop(client, portfolio, make_trade, monkeypatch):
+    for symbol in ("TCS", "INFY", "SBIN"):
+        make_trade(symbol=symbol)
+    on_loop = []
+    append_rows = export._append_rows
+
+    def recording_append(sheet, rows):
+        try:
+            asyncio.get_running_loop()
+            on_loop.append(True)
+        except RuntimeError:
+            on_loop.append(False)
+        append_rows(sheet, rows)
+
+    monkeypatch.setattr(export, "_append_rows", recording_append)
+
+    response = client.get("/api/exports/trades", params={"format": "xlsx", "portfolio_id": portfolio["id"]})
+
+    assert response.status_code == 200
+    rows = list(load_workbook(io.BytesIO(response.content)).active.values)
+    assert rows[0] == tuple(export.HEADER)
+    assert sorted(row[3] for row in rows[1:]) == ["INFY", "SBIN", "TCS"]
+    assert on_loop == [False]
+
+
+def test_csv_export(client, portfolio, make_trade):
+    make_trade(symbol="TCS")
+
+    response = client.get("/api/exports/trades", params={"format": "csv", "portfolio_id": portfolio["id"]})
+
+    assert response.status_code == 200
+    lines = response.text.strip().splitlines()
+    assert lines[0].split(",") == export.HEADER
+    assert len(lines) == 2
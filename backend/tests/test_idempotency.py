@@ -0,0 +1,61 @@
+import uuid
+
+import pytest
+
+from app.middleware.idempotency import IDEMPOTENCY_HEADER, MAX_KEY_LENGTH, REPLAYED_HEADER
+from tests.conftest import login_as_new_user
+
+
+@pytest.fixture
+def key():
+    return {IDEMPOTENCY_HEADER: uuid.uuid4().hex}
+
+
+def test_retry_replays_the_first_response(client, key):
+    first = client.post("/api/portfolios", json={"name": "Once"}, headers=key)
+    retry = client.post("/api/portfolios", json={"name": "Once"}, headers=key)
+
+    assert first.status_code == retry.status_code == 201
+    assert retry.json() == first.json()
+    assert retry.headers[REPLAYED_HEADER] == "true"
+    assert REPLAYED_HEADER not in first.headers
+    assert [p["name"] for p in client.get("/api/portfolios").json()] == ["Once"]
+
+
+def test_key_reused_for_a_different_request(client, key):
+    assert client.post("/api/portfolios", json={"name": "A"}, headers=key).status_code == 201
+
+    response = client.post("/api/portfolios", json={"name": "B"}, headers=key)
+
+    assert response.status_code == 422
+    assert len(client.get("/api/portfolios").json()) == 1
+
+
+@pytest.mark.parametrize("value", ["", "k" * (MAX_KEY_LENGTH + 1)])
+def test_invalid_key(client, value):
+    response = client.post("/api/portfolios", json={"name": "A"}, headers={IDEMPOTENCY_HEADER: value})
+
+    assert response.status_code == 400
+    assert client.get("/api/portfolios").json() == []
+
+
+def test_client_errors_are_replayed(client, key):
+    body = {
+        "portfolio_id": 999999, "symbol": "TCS", "trade_type": "long",
+        "entry_price": 1, "entry_date": "2024-01-01T04:00:00", "quantity": 1,
+    }
+    first = client.post("/api/trades/", json=body, headers=key)
+    retry = client.post("/api/trades/", json=body, headers=key)
+
+    assert first.status_code == retry.status_code == 404
+    assert retry.headers[REPLAYED_HEADER] == "true"
+
+
+def test_keys_are_scoped_to_the_user(client, key):
+    assert client.post("/api/portfolios", json={"name": "Mine"}, headers=key).status_code == 201
+    login_as_new_user(client)
+
+    response = client.post("/api/portfolios", json={"name": "Mine"}, headers=key)
+
+    assert response.status_code == 201
+    assert REPLAYED_HEADER not in response.headers
@@ -0,0 +1,57 @@
+from types import SimpleNamespace
+
+import pytest
+
+from app.services.lot_matching import AVERAGE, FIFO, LIFO, OverfillError, match_fills
+
+
+def fill(fill_id, side, price, quantity):
+    return SimpleNamespace(id=fill_id, side=side, price=price, quantity=quantity)
+
+
+SCALE_IN_OUT = [fill(1, "buy", 100, 10), fill(2, "buy", 110, 10), fill(3, "sell", 120, 15)]
+
+
+@pytest.mark.parametrize("method, realized", [(FIFO, 250.0), (LIFO, 200.0), (AVERAGE, 225.0)])
+def test_realized_pl_by_method(method, realized):
+    result = match_fills(SCALE_IN_OUT, is_long=True, method=method)
+
+    assert result.realized_pl == pytest.approx(realized)
+    assert result.open_quantity == pytest.approx(5)
+    assert result.exit_quantity == pytest.approx(15)
+    assert result.avg_entry_price == pytest.approx(105)
+    assert not result.is_flat
+
+
+def test_fifo_lots_consume_oldest_first():
+    result = match_fills(SCALE_IN_OUT, is_long=True, method=FIFO)
+
+    assert [(lot.open_fill_id, lot.close_fill_id, lot.quantity) for lot in result.lots] == [(1, 3, 10), (2, 3, 5)]
+
+
+def test_short_position_opens_with_sells():
+    fills = [fill(1, "sell", 120, 10), fill(2, "buy", 100, 10)]
+
+    result = match_fills(fills, is_long=False)
+
+    assert result.realized_pl == pytest.approx(200)
+    assert result.is_flat
+
+
+def test_keep_lots_false_skips_lot_records():
+    result = match_fills(SCALE_IN_OUT, is_long=True, keep_lots=False)
+
+    assert result.lots == []
+    assert result.realized_pl == pytest.approx(250)
+
+
+def test_closing_more_than_open_raises():
+    fills = [fill(1, "buy", 100, 10), fill(2, "sell", 110, 11)]
+
+    with pytest.raises(OverfillError):
+        match_fills(fills, is_long=True)
+
+
+def test_unknown_method_raises():
+    with pytest.raises(ValueError):
+        match_fills(SCALE_IN_OUT, is_long=True, method="hifo")
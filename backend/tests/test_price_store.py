@@ -0,0 +1,57 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from app.services.price_store import PriceStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = PriceStore(tmp_path, refresh_seconds=0)
+    store.incoming_dir.mkdir(parents=True)
+    return store
+
+
+def write_csv(store, name, text):
+    (store.incoming_dir / name).write_text(text)
+
+
+def test_malformed_files_are_skipped_and_not_retried(store):
+    write_csv(store, "TCS.csv", "date,close\n2024-01-01,100\n2024-01-02,101\n")
+    write_csv(store, "BAD.csv", "date,close\nnot-a-date,1\n")
+    write_csv(store, "NOPRICE.csv", "date,volume\n2024-01-01,5\n")
+
+    result = store.ingest_directory()
+
+    assert (result["files"], result["rows"], result["symbols"]) == (1, 2, 1)
+    assert sorted(f["file"] for f in result["failed"]) == ["BAD.csv", "NOPRICE.csv"]
+    assert store.latest_price("tcs") == 101
+    assert store.ingest_directory()["failed"] == []
+
+
+def test_requests_only_read_the_cache(store, monkeypatch):
+    store.write_series("INFY", np.array([1, 2]), np.array([10.0, 11.0]))
+    store.refresh()
+    monkeypatch.setattr(store, "refresh", lambda: pytest.fail("refreshed on read"))
+
+    prices = store.latest_prices(["INFY", "TCS"])
+
+    assert prices[0] == 11.0
+    assert np.isnan(prices[1])
+
+
+def test_periodic_refresh_picks_up_other_writers(store, tmp_path):
+    other = PriceStore(tmp_path)
+
+    async def run():
+        refresher = asyncio.create_task(store.refresh_periodically())
+        other.write_series("SBIN", np.array([1]), np.array([500.0]))
+        for _ in range(100):
+            if store.latest_price("SBIN") is not None:
+                break
+            await asyncio.sleep(0.01)
+        refresher.cancel()
+        return store.latest_price("SBIN")
+
+    assert asyncio.run(run()) == 500.0
@@ -0,0 +1,94 @@
+"""
+Query budgets of the hot endpoints.
+
+Each budget includes the authenticated user lookup. The counts must not grow
+with the number of trades, so every endpoint is measured on a portfolio with
+a mix of open and closed trades across several symbols.
+"""
+import pytest
+
+from app.config import get_settings
+from app.main import query_summary_mode
+from app.query_log import query_budget
+
+CLOSE = {"exit_price": 110, "exit_date": "2024-01-05T04:00:00"}
+
+
+@pytest.fixture
+def journal(client, portfolio, make_trade):
+    for i in range(12):
+        trade = make_trade(symbol=f"SYM{i % 4}")
+        if i % 3:
+            response = client.post(f"/api/trades/{trade['id']}/close", json=CLOSE)
+            assert response.status_code == 200, response.text
+    return portfolio["id"]
+
+
+def test_trade_list(client, journal):
+    with query_budget(3):
+        response = client.get(f"/api/trades/portfolio/{journal}")
+    assert response.status_code == 200
+    assert len(response.json()) == 12
+
+
+def test_portfolio_analytics(client, journal):
+    with query_budget(7):
+        response = client.get(f"/api/analytics/portfolio/{journal}")
+    assert response.status_code == 200
+
+    # Unchanged portfolio: served from the result cache
+    with query_budget(3):
+        response = client.get(f"/api/analytics/portfolio/{journal}")
+    assert response.status_code == 200
+
+
+def test_analytics_by_symbol(client, journal):
+    with query_budget(5):
+        response = client.get(f"/api/analytics/portfolio/{journal}/by-symbol")
+    assert response.status_code == 200
+
+
+def test_create_trade(client, journal):
+    body = {
+        "portfolio_id": journal, "symbol": "NEW", "trade_type": "long",
+        "entry_price": 50, "entry_date": "2024-02-01T04:00:00", "quantity": 5,
+    }
+    with query_budget(7):
+        response = client.post("/api/trades/", json=body)
+    assert response.status_code == 201
+
+
+def test_close_trade(client, journal, make_trade):
+    trade = make_trade(symbol="SYM0")
+    with query_budget(10):
+        response = client.post(f"/api/trades/{trade['id']}/close", json=CLOSE)
+    assert response.status_code == 200
+    assert response.json()["status"] == "closed"
+
+
+def test_budgets_do_not_grow_with_trades(client, journal, make_trade):
+    for _ in range(20):
+        make_trade(symbol="SYM1")
+
+    with query_budget(3):
+        assert client.get(f"/api/trades/portfolio/{journal}").status_code == 200
+    with query_budget(7):
+        assert client.get(f"/api/analytics/portfolio/{journal}").status_code == 200
+    with query_budget(5):
+        assert client.get(f"/api/analytics/portfolio/{journal}/by-symbol").status_code == 200
+
+
+@pytest.mark.parametrize("environment, summary, mode", [
+    ("development", "log", "log"),
+    ("development", "header", "header"),
+    ("production", "header", "log"),
+])
+def test_query_summary_headers_are_opt_in(monkeypatch, environment, summary, mode):
+    monkeypatch.setattr(get_settings(), "ENVIRONMENT", environment)
+    monkeypatch.setattr(get_settings(), "QUERY_SUMMARY", summary)
+
+    assert query_summary_mode() == mode
+
+
+def test_query_count_header_is_off_by_default(client):
+    assert "X-DB-Query-Count" not in client.get("/api/portfolios").headers
@@ -0,0 +1,55 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, select
+
+from app.crud import snapshot as snapshot_crud
+from app.database import get_sessionmaker
+from app.models import PortfolioSnapshot
+from app.services.replay import replay
+
+
+def run(app_client, coroutine_function, *args, **kwargs):
+    async def call():
+        async with get_sessionmaker()() as db:
+            return await coroutine_function(db, *args, **kwargs)
+
+    return app_client.portal.call(call)
+
+
+async def stored_days(db, portfolio_id):
+    return await db.scalar(
+        select(func.count()).select_from(PortfolioSnapshot).where(PortfolioSnapshot.portfolio_id == portfolio_id)
+    )
+
+
+async def drop_snapshots(db, portfolio_id):
+    await snapshot_crud.invalidate_snapshots(db, [portfolio_id])
+    await db.commit()
+
+
+def test_replay_leaves_snapshots_built(client, portfolio, make_trade, app_client):
+    make_trade(entry_date=(datetime.utcnow() - timedelta(days=30)).isoformat())
+    run(app_client, replay, "snapshots")
+    built = run(app_client, stored_days, portfolio["id"])
+    assert built > 10
+
+    # An edit drops the snapshots from the affected day on; replay rebuilds them
+    trade = make_trade(entry_date=(datetime.utcnow() - timedelta(days=20)).isoformat())
+    assert run(app_client, stored_days, portfolio["id"]) < built
+    assert client.patch(f"/api/trades/{trade['id']}", json={"quantity": 5}).status_code == 200
+
+    result = run(app_client, replay, "snapshots")
+
+    assert result["events"] >= 2
+    assert run(app_client, stored_days, portfolio["id"]) == built
+
+
+def test_replay_from_start_rebuilds_every_portfolio(client, portfolio, make_trade, app_client):
+    make_trade(entry_date=(datetime.utcnow() - timedelta(days=15)).isoformat())
+    run(app_client, replay, "snapshots")
+    built = run(app_client, stored_days, portfolio["id"])
+    run(app_client, drop_snapshots, portfolio["id"])
+
+    run(app_client, replay, "snapshots", from_start=True)
+
+    assert run(app_client, stored_days, portfolio["id"]) == built > 0
@@ -0,0 +1,96 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.query_log import query_budget
+from app.routers.trades import RISK_WARNING_HEADER
+
+NOW = datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+@pytest.fixture
+def rules(client, portfolio):
+    def put(*rules):
+        response = client.put(f"/api/portfolios/{portfolio['id']}/risk-rules", json={"rules": list(rules)})
+        assert response.status_code == 200, response.text
+        return response.json()
+
+    return put
+
+
+def entry(portfolio, symbol="TCS", quantity=10, entry_date=NOW, **fields):
+    return {
+        "portfolio_id": portfolio["id"], "symbol": symbol, "trade_type": "long",
+        "entry_price": 100, "entry_date": entry_date.isoformat(), "quantity": quantity, **fields,
+    }
+
+
+def test_reject_rule_refuses_the_entry(client, portfolio, rules):
+    rules({"kind": "max_symbol_exposure", "limit": 2500})
+    assert client.post("/api/trades/", json=entry(portfolio, quantity=20)).status_code == 201
+
+    response = client.post("/api/trades/", json=entry(portfolio, quantity=10))
+
+    assert response.status_code == 422
+    detail = response.json()["detail"]
+    assert [v["kind"] for v in detail["violations"]] == ["max_symbol_exposure"]
+    assert len(client.get(f"/api/trades/portfolio/{portfolio['id']}").json()) == 1
+
+
+def test_warn_rule_lets_the_entry_through(client, portfolio, rules):
+    rules({"kind": "max_open_positions", "limit": 1, "action": "warn"})
+    assert RISK_WARNING_HEADER not in client.post("/api/trades/", json=entry(portfolio)).headers
+
+    response = client.post("/api/trades/", json=entry(portfolio, symbol="INFY"))
+
+    assert response.status_code == 201
+    assert response.headers[RISK_WARNING_HEADER].startswith("max_open_positions:")
+
+
+def test_trades_per_day_counts_only_todays_entries(client, portfolio, rules):
+    rules({"kind": "max_trades_per_day", "limit": 1})
+    assert client.post("/api/trades/", json=entry(portfolio)).status_code == 201
+
+    assert client.post("/api/trades/", json=entry(portfolio)).status_code == 422
+    backdated = entry(portfolio, entry_date=NOW - timedelta(days=10))
+    assert client.post("/api/trades/", json=backdated).status_code == 201
+
+
+def test_closes_are_never_refused(client, portfolio, rules):
+    trade = client.post("/api/trades/", json=entry(portfolio)).json()
+    rules({"kind": "max_daily_loss", "limit": 10})
+
+    response = client.post(
+        f"/api/trades/{trade['id']}/close", json={"exit_price": 80, "exit_date": NOW.isoformat()}
+    )
+
+    assert response.status_code == 200
+    assert response.headers[RISK_WARNING_HEADER].startswith("max_daily_loss:")
+    assert client.post("/api/trades/", json=entry(portfolio)).status_code == 422
+
+
+def test_edits_elsewhere_reseed_the_counters(client, portfolio, rules):
+    rules({"kind": "max_open_positions", "limit": 1})
+    trade = client.post("/api/trades/", json=entry(portfolio)).json()
+    assert client.post("/api/trades/", json=entry(portfolio)).status_code == 422
+
+    batch = {"operations": [{"op": "delete", "trade_id": trade["id"]}]}
+    assert client.post("/api/trades/batch", json=batch).status_code == 200
+
+    assert client.post("/api/trades/", json=entry(portfolio)).status_code == 201
+
+
+def test_checks_stay_within_the_create_budget(client, portfolio, rules):
+    rules(
+        {"kind": "max_trades_per_day", "limit": 100},
+        {"kind": "max_open_positions", "limit": 100},
+        {"kind": "max_symbol_exposure", "limit": 10 ** 9},
+        {"kind": "max_daily_loss", "limit": 10 ** 9},
+    )
+    # The first check seeds the counters
+    assert client.post("/api/trades/", json=entry(portfolio)).status_code == 201
+
+    # One more than without rules: the counters check for events they haven't seen
+    with query_budget(8):
+        response = client.post("/api/trades/", json=entry(portfolio))
+    assert response.status_code == 201
@@ -0,0 +1,44 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, select
+
+from app.crud import snapshot as snapshot_crud
+from app.database import get_sessionmaker
+from app.models import Portfolio, PortfolioSnapshot
+
+
+def test_concurrent_reads_store_each_day_once(client, portfolio, make_trade, app_client):
+    make_trade(entry_date=(datetime.utcnow() - timedelta(days=40)).isoformat())
+
+    async def read_nav():
+        async with get_sessionmaker()() as db:
+            loaded = await db.get(Portfolio, portfolio["id"])
+            return await snapshot_crud.get_nav_series(db, loaded)
+
+    async def read_concurrently():
+        return await asyncio.gather(*(read_nav() for _ in range(4)))
+
+    series = app_client.portal.call(read_concurrently)
+
+    assert all(points == series[0] for points in series)
+
+    async def count_days():
+        async with get_sessionmaker()() as db:
+            return (await db.execute(
+                select(func.count(), func.count(func.distinct(PortfolioSnapshot.day)))
+                .where(PortfolioSnapshot.portfolio_id == portfolio["id"])
+            )).one()
+
+    stored, distinct = app_client.portal.call(count_days)
+    assert stored == distinct > 20
+
+
+def test_nav_endpoint(client, portfolio, make_trade):
+    make_trade(entry_date=(datetime.utcnow() - timedelta(days=10)).isoformat())
+
+    first = client.get(f"/api/analytics/portfolio/{portfolio['id']}/nav")
+    second = client.get(f"/api/analytics/portfolio/{portfolio['id']}/nav")
+
+    assert first.status_code == second.status_code == 200
+    assert first.json() == second.json()
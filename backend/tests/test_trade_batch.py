@@ -0,0 +1,72 @@
+import pytest
+
+from app.query_log import query_budget
+
+from tests.conftest import login_as_new_user
+
+CLOSE = {"exit_price": 120, "exit_date": "2024-01-05T04:00:00"}
+
+
+def apply(client, operations):
+    response = client.post("/api/trades/batch", json={"operations": operations})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_update_then_delete_alongside_other_changes(client, make_trade):
+    first, second = make_trade(), make_trade()
+
+    result = apply(client, [
+        {"op": "update", "trade_id": first["id"], "changes": {"notes": "edited"}},
+        {"op": "delete", "trade_id": first["id"]},
+        {"op": "close", "trade_id": second["id"], **CLOSE},
+    ])
+
+    assert (result["succeeded"], result["failed"]) == (3, 0)
+    update, delete, close = result["results"]
+    assert update["status_code"] == 200
+    assert update["trade"] is None
+    assert update["detail"] == "Trade was deleted later in this batch"
+    assert delete["status_code"] == 204
+    assert close["trade"]["status"] == "closed"
+    assert client.get(f"/api/trades/{first['id']}").status_code == 404
+
+
+def test_failed_operations_do_not_stop_the_batch(client, make_trade):
+    trade = make_trade()
+
+    result = apply(client, [
+        {"op": "close", "trade_id": trade["id"], **CLOSE},
+        {"op": "close", "trade_id": trade["id"], **CLOSE},
+        {"op": "delete", "trade_id": 999999},
+    ])
+
+    assert (result["succeeded"], result["failed"]) == (1, 2)
+    assert [item["status_code"] for item in result["results"]] == [200, 400, 404]
+
+
+def test_other_users_trades_are_forbidden(client, make_trade):
+    trade = make_trade()
+    login_as_new_user(client)
+
+    result = apply(client, [{"op": "delete", "trade_id": trade["id"]}])
+
+    assert result["results"][0]["status_code"] == 403
+
+
+def test_empty_batch_is_rejected(client):
+    assert client.post("/api/trades/batch", json={"operations": []}).status_code == 422
+
+
+@pytest.mark.parametrize("size", [5, 40])
+def test_query_count_does_not_grow_with_batch_size(client, make_trade, size):
+    trades = [make_trade() for _ in range(size)]
+    operations = [
+        {"op": "close", "trade_id": trade["id"], **CLOSE} if i % 2 else
+        {"op": "update", "trade_id": trade["id"], "changes": {"notes": "n"}}
+        for i, trade in enumerate(trades)
+    ]
+
+    with query_budget(10):
+        result = apply(client, operations)
+    assert result["succeeded"] == size
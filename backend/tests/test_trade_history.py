@@ -0,0 +1,56 @@
+from app.crud import trade_event as trade_event_crud
+from app.database import get_sessionmaker
+from tests.conftest import login_as_new_user
+
+
+def test_deleted_trade_ids_are_not_reused(client, make_trade):
+    secret = make_trade(symbol="SECRET", notes="private note")
+    assert client.delete(f"/api/trades/{secret['id']}").status_code == 204
+
+    login_as_new_user(client)
+    portfolio = client.post("/api/portfolios", json={"name": "Other"}).json()
+    trade = client.post("/api/trades/", json={
+        "portfolio_id": portfolio["id"], "symbol": "TCS", "trade_type": "long",
+        "entry_price": 100, "entry_date": "2024-01-01T04:00:00", "quantity": 1,
+    }).json()
+
+    assert trade["id"] != secret["id"]
+    assert client.get(f"/api/trades/{secret['id']}/history").status_code == 403
+    history = client.get(f"/api/trades/{trade['id']}/history").json()
+    assert [event["kind"] for event in history] == ["created"]
+
+
+def test_history_only_shows_events_of_the_owned_trade(client, portfolio, make_trade, app_client):
+    # An event of another portfolio's trade with the same id, as databases
+    # that reused trade ids can hold
+    make_trade(symbol="SECRET", notes="private note")
+    login_as_new_user(client)
+    other = client.post("/api/portfolios", json={"name": "Other"}).json()
+    trade = client.post("/api/trades/", json={
+        "portfolio_id": other["id"], "symbol": "TCS", "trade_type": "long",
+        "entry_price": 100, "entry_date": "2024-01-01T04:00:00", "quantity": 1,
+    }).json()
+
+    async def record_stale_event():
+        async with get_sessionmaker()() as db:
+            await trade_event_crud.record_events(db, [
+                trade_event_crud.event_values("deleted", trade["id"], portfolio["id"], {"symbol": "SECRET"}, None)
+            ])
+            await db.commit()
+
+    app_client.portal.call(record_stale_event)
+
+    history = client.get(f"/api/trades/{trade['id']}/history").json()
+    assert [(event["kind"], event["state"]["symbol"]) for event in history] == [("created", "TCS")]
+
+
+def test_deleted_trade_history_stays_with_its_owner(client, make_trade):
+    trade = make_trade()
+    client.patch(f"/api/trades/{trade['id']}", json={"notes": "edited"})
+    assert client.delete(f"/api/trades/{trade['id']}").status_code == 204
+
+    history = client.get(f"/api/trades/{trade['id']}/history")
+
+    assert history.status_code == 200
+    assert [event["kind"] for event in history.json()] == ["created", "updated", "deleted"]
+    assert client.get("/api/trades/999999/history").status_code == 404